@@ -0,0 +1,63 @@
+"""
+Micro-benchmark of the dcm2niix output parser.
+
+Parses a synthetic verbose (``verbose = 2``) log and reports the throughput in lines per second.
+
+Usage: ``python -m benchmarks.bench_parse_output [n_lines]``
+"""
+import sys
+import timeit
+
+import dcm2niixpy
+
+
+def make_log(n_lines: int) -> list:
+    """
+    Make a synthetic dcm2niix log, resembling the output with verbose set to 2.
+
+    Args:
+        n_lines (int): Number of lines in the log.
+
+    Returns:
+        list: The lines of the log.
+    """
+    template = [
+        "Found 40000 DICOM file(s)\n",
+        " 0020,000E UI SeriesInstanceUID 1.2.840.113619.2.312.4120.8418826.12131.1501070812.2\n",
+        " 0028,0010 US Rows 256\n",
+        " 0028,0011 US Columns 256\n",
+        "dcm2niix: Compiled with GCC 9.3.0\n",
+        "Warning: Unable to determine slice direction: please check whether slices are flipped\n",
+        "Progress: 50%\n",
+        "Convert 20 DICOM as /output/patient/T1_3 (256x256x20x1)\n",
+    ]
+    return [template[i_line % len(template)] for i_line in range(n_lines)]
+
+
+def main(n_lines: int = 100000) -> float:
+    """
+    Run the benchmark.
+
+    Args:
+        n_lines (int, optional): Number of lines to parse. Defaults to 100000.
+
+    Returns:
+        float: Throughput in lines per second.
+    """
+    log = make_log(n_lines)
+    n_repeats = 5
+
+    timings = timeit.repeat(
+        lambda: dcm2niixpy.DCM2NIIX_OUTPUT().parse_output(log), number=1, repeat=n_repeats
+    )
+    lines_per_second = n_lines / min(timings)
+    print(
+        "Parsed {n_lines} lines: {lines_per_second:,.0f} lines/sec".format(
+            n_lines=n_lines, lines_per_second=lines_per_second
+        )
+    )
+    return lines_per_second
+
+
+if __name__ == "__main__":
+    main(*[int(i_arg) for i_arg in sys.argv[1:]])
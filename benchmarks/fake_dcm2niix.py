@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Stand-in for the dcm2niix executable, to benchmark dcm2niixpy without dcm2niix itself.
+
+Use it with the native backend::
+
+    dcm2niix = dcm2niixpy.DCM2NIIX(version, container_backend="native", executable="benchmarks/fake_dcm2niix.py")
+
+It accepts the same arguments as dcm2niix, prints output in the same format and writes dummy files.
+Its behaviour is set with environment variables:
+
+    - FAKE_DCM2NIIX_VERSION: version that is reported, defaults to 1.0.20211006
+    - FAKE_DCM2NIIX_SERIES: number of series that are converted, defaults to 1
+    - FAKE_DCM2NIIX_SIZE: size in bytes of every written image, defaults to 1024
+    - FAKE_DCM2NIIX_LATENCY: seconds to sleep per conversion, defaults to 0
+"""
+import os
+import re
+import sys
+import time
+
+
+def main(argv: list) -> int:
+    """
+    Imitate a dcm2niix run.
+
+    Args:
+        argv (list): The command line arguments, without the executable.
+
+    Returns:
+        int: The exit code.
+    """
+    if argv == ["--version"]:
+        print("v" + os.environ.get("FAKE_DCM2NIIX_VERSION", "1.0.20211006"))
+        # dcm2niix exits with 3 after reporting the version
+        return 3
+
+    start_time = time.time()
+    # The compression level, e.g. -6, is the only option without a value
+    arguments = [i_argument for i_argument in argv[:-1] if not re.fullmatch(r"-[1-9]", i_argument)]
+    options = dict(zip(arguments[::2], arguments[1::2]))
+    input_path = argv[-1]
+    output_path = options.get("-o", input_path)
+    file_name = options.get("-f", "%f_%p_%t_%s").replace("%", "")
+    extension = ".nii" if options.get("-z", "n") == "n" else ".nii.gz"
+
+    n_series = int(os.environ.get("FAKE_DCM2NIIX_SERIES", "1"))
+    image_size = int(os.environ.get("FAKE_DCM2NIIX_SIZE", "1024"))
+    latency = float(os.environ.get("FAKE_DCM2NIIX_LATENCY", "0"))
+
+    n_dicoms = sum(len(i_files) for _, _, i_files in os.walk(input_path))
+    print("Chris Rorden's dcm2niiX version v1.0.20211006 (fake)")
+    print("Found {n_dicoms} DICOM file(s)".format(n_dicoms=n_dicoms))
+    time.sleep(latency)
+
+    n_slices = max(n_dicoms // max(n_series, 1), 1)
+    for i_series in range(n_series):
+        output_base = os.path.join(
+            output_path, "{file_name}_{index}".format(file_name=file_name, index=i_series)
+        )
+        with open(output_base + extension, "wb") as image_file:
+            image_file.write(b"\0" * image_size)
+        if options.get("-b", "y") != "n":
+            with open(output_base + ".json", "w") as sidecar_file:
+                sidecar_file.write("{}")
+        print(
+            "Convert {n_slices} DICOM as {output_base} (64x64x{n_slices}x1)".format(
+                n_slices=n_slices, output_base=output_base
+            )
+        )
+
+    print(
+        "Conversion required {seconds:.6f} seconds (0.000000 for core code).".format(
+            seconds=time.time() - start_time
+        )
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
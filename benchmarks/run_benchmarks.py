@@ -0,0 +1,438 @@
+"""
+Benchmark suite of the dcm2niixpy wrapper, using a stand-in for dcm2niix.
+
+The benchmarks measure the overhead that dcm2niixpy adds around dcm2niix, using
+``fake_dcm2niix.py`` as native backend so that the numbers do not depend on containers or on
+dcm2niix itself. The results are compared with the baseline in ``baseline.json``, and the run fails
+if any benchmark is slower than the baseline by more than its tolerance.
+
+Usage::
+
+    python -m benchmarks.run_benchmarks                    # compare with benchmarks/baseline.json
+    python -m benchmarks.run_benchmarks --update-baseline  # store the median of 3 runs as baseline
+
+Benchmarks that depend on the speed of the machine are compared relative to a reference workload
+in plain Python, so that the committed baseline can be used on other machines. The tolerance of
+every benchmark is kept in the baseline, noisy benchmarks have a larger tolerance.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+
+from typing import Callable
+from typing import Dict
+from typing import List
+
+import dcm2niixpy
+
+from benchmarks.bench_parse_output import make_log
+
+
+BENCHMARK_FOLDER = os.path.dirname(os.path.abspath(__file__))
+FAKE_DCM2NIIX = os.path.join(BENCHMARK_FOLDER, "fake_dcm2niix.py")
+BASELINE_FILE = os.path.join(BENCHMARK_FOLDER, "baseline.json")
+VERSION = "1.0.20211006"
+
+
+def make_dcm2niix() -> dcm2niixpy.DCM2NIIX:
+    """
+    Make a DCM2NIIX object that runs the fake dcm2niix.
+
+    Returns:
+        dcm2niixpy.DCM2NIIX: The DCM2NIIX object.
+    """
+    return dcm2niixpy.DCM2NIIX(VERSION, container_backend="native", executable=FAKE_DCM2NIIX)
+
+
+def make_input(root: str, n_files: int = 10) -> str:
+    """
+    Make an input folder with dummy DICOM files.
+
+    Args:
+        root (str): Folder in which to make the input folder.
+        n_files (int, optional): Number of files. Defaults to 10.
+
+    Returns:
+        str: The input folder.
+    """
+    input_path = tempfile.mkdtemp(dir=root)
+    for i_file in range(n_files):
+        with open(os.path.join(input_path, "IM-{index:04d}.dcm".format(index=i_file)), "w") as f:
+            f.write("dicom")
+    return input_path
+
+
+######
+# Benchmarks
+######
+
+
+def bench_argument_building() -> float:
+    """
+    Time building the dcm2niix arguments from the options.
+
+    Returns:
+        float: Seconds per call.
+    """
+    dcm2niix = make_dcm2niix()
+    n_calls = 10000
+    return min(timeit.repeat(dcm2niix._convert_options_to_arg_list, number=n_calls, repeat=5)) / (
+        n_calls
+    )
+
+
+def bench_argument_building_after_change() -> float:
+    """
+    Time changing an option and building the dcm2niix arguments, which rebuilds the cached arguments.
+
+    Returns:
+        float: Seconds per call.
+    """
+    dcm2niix = make_dcm2niix()
+    n_calls = 10000
+
+    def change_and_build():
+        dcm2niix.filename = "%p_%s"
+        dcm2niix._convert_options_to_arg_list()
+
+    return min(timeit.repeat(change_and_build, number=n_calls, repeat=5)) / n_calls
+
+
+def bench_option_assignment() -> float:
+    """
+    Time setting every option that is set when a DCM2NIIX object is created.
+
+    Returns:
+        float: Seconds per set of options.
+    """
+    dcm2niix = make_dcm2niix()
+    n_calls = 2000
+
+    def assign_options():
+        dcm2niix.compression_level = 6
+        dcm2niix.adjacent_dicoms = False
+        dcm2niix.bids_sidecar = True
+        dcm2niix.anonymize_bids_sidecar = True
+        dcm2niix.directory_search_depth = 5
+        dcm2niix.export_as_nrrd = False
+        dcm2niix.filename = "%f_%p_%t_%s"
+        dcm2niix.generate_defaults = False
+        dcm2niix.ignore_derived = False
+        dcm2niix.losslessly_scale = False
+        dcm2niix.merge_2d_slices = "auto"
+        dcm2niix.rename = False
+        dcm2niix.single_file_mode = False
+        dcm2niix.private_text_notes = False
+        dcm2niix.verbose = 0
+        dcm2niix.conflict_write_behavior = 2
+        dcm2niix.crop_3D = False
+        dcm2niix.byte_order = "o"
+        dcm2niix.progress = False
+        dcm2niix.compress = False
+
+    return min(timeit.repeat(assign_options, number=n_calls, repeat=5)) / n_calls
+
+
+def bench_output_parsing() -> float:
+    """
+    Measure the throughput of the output parser.
+
+    Returns:
+        float: Lines per second.
+    """
+    log = make_log(100000)
+    timing = min(
+        timeit.repeat(lambda: dcm2niixpy.DCM2NIIX_OUTPUT().parse_output(log), number=1, repeat=5)
+    )
+    return len(log) / timing
+
+
+def bench_convert_overhead() -> float:
+    """
+    Time convert, relative to running the fake dcm2niix directly.
+
+    Returns:
+        float: Ratio of the time of convert to the time of running the command directly.
+    """
+    dcm2niix = make_dcm2niix()
+    n_calls = 20
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        input_path = make_input(tmp_dir)
+        output_path = tempfile.mkdtemp(dir=tmp_dir)
+        command = dcm2niix._make_command(
+            dcm2niix._convert_options_to_arg_list(), input_path, output_path
+        )
+
+        direct_time = min(
+            timeit.repeat(
+                lambda: subprocess.run(command, stdout=subprocess.PIPE, check=True),
+                number=n_calls,
+                repeat=3,
+            )
+        )
+        convert_time = min(
+            timeit.repeat(
+                lambda: dcm2niix.convert(input_path, output_path), number=n_calls, repeat=3
+            )
+        )
+    return convert_time / direct_time
+
+
+def bench_batch_throughput() -> float:
+    """
+    Measure the throughput of convert_many, with a conversion latency of 50 ms.
+
+    Returns:
+        float: Conversions per second.
+    """
+    dcm2niix = make_dcm2niix()
+    n_inputs = 32
+    os.environ["FAKE_DCM2NIIX_LATENCY"] = "0.05"
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            input_paths = [make_input(tmp_dir) for _ in range(n_inputs)]
+            start_time = time.perf_counter()
+            outputs = dcm2niix.convert_many(input_paths, max_workers=8)
+            duration = time.perf_counter() - start_time
+    finally:
+        del os.environ["FAKE_DCM2NIIX_LATENCY"]
+
+    errors = [i_output.error for i_output in outputs if i_output.error is not None]
+    if errors:
+        raise errors[0]
+    return n_inputs / duration
+
+
+def bench_import_time() -> float:
+    """
+    Time importing dcm2niixpy in a new interpreter, relative to starting the interpreter.
+
+    The start of the interpreter is timed in the same way, so that the result can be compared with
+    the baseline across machines. The median of several runs is used, as single runs are noisy.
+
+    Returns:
+        float: Import time as multiple of the start time of the interpreter.
+    """
+    n_runs = 15
+
+    def time_command(command: list) -> float:
+        durations = []
+        for _ in range(n_runs):
+            start_time = time.perf_counter()
+            subprocess.run(command, stdout=subprocess.DEVNULL, check=True)
+            durations.append(time.perf_counter() - start_time)
+        return statistics.median(durations)
+
+    startup_time = time_command([sys.executable, "-c", "pass"])
+    import_time = time_command([sys.executable, "-c", "import dcm2niixpy"])
+    return (import_time - startup_time) / startup_time
+
+
+def bench_instantiation() -> float:
+    """
+    Time creating a DCM2NIIX object, after the first one has been created.
+
+    Returns:
+        float: Seconds per instance.
+    """
+    make_dcm2niix()
+    n_calls = 200
+    return min(timeit.repeat(make_dcm2niix, number=n_calls, repeat=3)) / n_calls
+
+
+def bench_reference() -> float:
+    """
+    Time a fixed workload in plain Python, to correct the other benchmarks for the speed of the machine.
+
+    Returns:
+        float: Seconds per workload.
+    """
+
+    def workload():
+        sorted(str(i_value) for i_value in range(20000))
+
+    return min(timeit.repeat(workload, number=10, repeat=5)) / 10
+
+
+# Every benchmark with its unit, whether a higher value is better and whether its value depends on
+# the speed of the machine, in which case it is compared relative to the reference benchmark
+BENCHMARKS: Dict[str, tuple] = {
+    "reference": (bench_reference, "s", False, False),
+    "argument_building": (bench_argument_building, "s/call", False, True),
+    "argument_building_after_change": (bench_argument_building_after_change, "s/call", False, True),
+    "option_assignment": (bench_option_assignment, "s/call", False, True),
+    "output_parsing": (bench_output_parsing, "lines/s", True, True),
+    "convert_overhead": (bench_convert_overhead, "x", False, False),
+    "batch_throughput": (bench_batch_throughput, "conversions/s", True, False),
+    "import_time": (bench_import_time, "x startup", False, False),
+    "instantiation": (bench_instantiation, "s/instance", False, True),
+}
+
+
+######
+# Running
+######
+
+
+def run_benchmarks() -> Dict[str, float]:
+    """
+    Run all benchmarks.
+
+    Returns:
+        Dict[str, float]: The result of every benchmark.
+    """
+    results = {}
+    for i_name, (i_benchmark, i_unit, _, _) in BENCHMARKS.items():
+        benchmark: Callable[[], float] = i_benchmark
+        results[i_name] = benchmark()
+        print(
+            "{name:<32} {value:>14.6g} {unit}".format(
+                name=i_name, value=results[i_name], unit=i_unit
+            )
+        )
+    return results
+
+
+def median_results(runs: List[Dict[str, float]]) -> Dict[str, float]:
+    """
+    Take the median of every benchmark over several runs.
+
+    Args:
+        runs (List[Dict[str, float]]): The results of every run.
+
+    Returns:
+        Dict[str, float]: The median result of every benchmark.
+    """
+    return {i_name: statistics.median(i_run[i_name] for i_run in runs) for i_name in runs[0]}
+
+
+def make_baseline(results: Dict[str, float], tolerances: Dict[str, float]) -> dict:
+    """
+    Make a baseline of the results.
+
+    Args:
+        results (Dict[str, float]): The benchmark results.
+        tolerances (Dict[str, float]): Allowed relative slowdown of every benchmark.
+
+    Returns:
+        dict: The baseline, with the value and tolerance of every benchmark.
+    """
+    return {
+        i_name: {"value": i_value, "tolerance": tolerances[i_name]}
+        for i_name, i_value in results.items()
+        if i_name in tolerances
+    }
+
+
+def find_regressions(results: Dict[str, float], baseline: dict, tolerance: float) -> list:
+    """
+    Compare the results with the baseline.
+
+    Benchmarks that depend on the speed of the machine are compared after scaling the baseline with
+    the ratio of the reference benchmark, so that a baseline made on another machine can be used.
+
+    Args:
+        results (Dict[str, float]): The benchmark results.
+        baseline (dict): The baseline, with the value and tolerance of every benchmark.
+        tolerance (float): Allowed relative slowdown, e.g. 0.5 for 50%, of benchmarks without a tolerance in the baseline.
+
+    Returns:
+        list: Description of every benchmark that regressed.
+    """
+    speed_ratio = 1.0
+    if "reference" in results and "reference" in baseline:
+        speed_ratio = results["reference"] / baseline["reference"]["value"]
+
+    regressions = []
+    for i_name, i_value in results.items():
+        if i_name == "reference" or i_name not in baseline:
+            continue
+        baseline_value = baseline[i_name]["value"]
+        allowed_slowdown = 1 + baseline[i_name].get("tolerance", tolerance)
+        _, unit, higher_is_better, machine_dependent = BENCHMARKS[i_name]
+        if machine_dependent:
+            baseline_value = (
+                baseline_value / speed_ratio if higher_is_better else baseline_value * speed_ratio
+            )
+        if higher_is_better:
+            regressed = i_value < baseline_value / allowed_slowdown
+        else:
+            regressed = i_value > baseline_value * allowed_slowdown
+        if regressed:
+            regressions.append(
+                "{name}: {value:.6g} {unit}, baseline {baseline:.6g} {unit}".format(
+                    name=i_name, value=i_value, baseline=baseline_value, unit=unit
+                )
+            )
+    return regressions
+
+
+def main(argv: list = None) -> int:
+    """
+    Run the benchmarks and compare them with the baseline.
+
+    Args:
+        argv (list, optional): Command line arguments. Defaults to None, in which case sys.argv is used.
+
+    Returns:
+        int: Exit code, 1 if a benchmark regressed.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="Baseline file to compare with.")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.5,
+        help="Allowed relative slowdown of benchmarks without a tolerance in the baseline, default 0.5.",
+    )
+    parser.add_argument(
+        "--update-baseline", action="store_true", help="Store the results as new baseline."
+    )
+    parser.add_argument(
+        "--runs",
+        type=int,
+        default=3,
+        help="Number of runs of which the median is stored as baseline, default 3.",
+    )
+    arguments = parser.parse_args(argv)
+
+    baseline = {}
+    if os.path.exists(arguments.baseline):
+        with open(arguments.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+
+    if arguments.update_baseline:
+        results = median_results([run_benchmarks() for _ in range(arguments.runs)])
+        # The tolerances are set by hand, and are kept when the values are updated
+        tolerances = {
+            i_name: baseline.get(i_name, {}).get("tolerance", arguments.tolerance)
+            for i_name in results
+        }
+        with open(arguments.baseline, "w") as baseline_file:
+            json.dump(make_baseline(results, tolerances), baseline_file, indent=2, sort_keys=True)
+            baseline_file.write("\n")
+        return 0
+
+    results = run_benchmarks()
+    if not baseline:
+        print(
+            "No baseline found at {baseline}, skipping comparison".format(
+                baseline=arguments.baseline
+            )
+        )
+        return 0
+
+    regressions = find_regressions(results, baseline, arguments.tolerance)
+    for i_regression in regressions:
+        print("REGRESSION " + i_regression)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,38 @@
 # -*- coding: utf-8 -*-
 
+import importlib
+
 from dcm2niixpy.dcm2niix import *
+from dcm2niixpy.image_cache import DCM2NIIX_IMAGE_CACHE
+from dcm2niixpy.metrics import DCM2NIIX_METRICS
+from dcm2niixpy.resources import DCM2NIIX_ADMISSION
+from dcm2niixpy.resources import DCM2NIIX_LIMITS
+
+
+# The optional features are only imported when they are first used, as most callers only convert
+# and should not pay for importing e.g. sqlite3 for the work queue.
+_LAZY_ATTRIBUTES = {
+    "DCM2NIIX_CACHE": "dcm2niixpy.cache",
+    "DCM2NIIX_COMPRESSOR": "dcm2niixpy.compression",
+    "DCM2NIIX_IMAGE": "dcm2niixpy.image",
+    "DCM2NIIX_QUEUE": "dcm2niixpy.work_queue",
+    "DCM2NIIX_SCHEDULER": "dcm2niixpy.scheduler",
+    "DCM2NIIX_STAGING": "dcm2niixpy.staging",
+    "DCM2NIIX_WORKER": "dcm2niixpy.work_queue",
+    "DICOM_INDEX": "dcm2niixpy.scan",
+    "DICOM_SERIES": "dcm2niixpy.scan",
+}
+
+
+def __getattr__(name: str):
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(
+            "module {module!r} has no attribute {name!r}".format(module=__name__, name=name)
+        )
+    value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list:
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
@@ -0,0 +1,6 @@
+import sys
+
+from dcm2niixpy.cli import main
+
+
+sys.exit(main())
@@ -0,0 +1,325 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+from typing import List
+from typing import Optional
+
+
+class DCM2NIIX_CACHE:
+    def __init__(
+        self, cache_folder: str, max_size: int = None, hash_contents: bool = False
+    ) -> None:
+        """
+        Initialize the conversion cache.
+
+        The cache stores the result of every conversion, keyed by a fingerprint of the input folder,
+        the dcm2niix arguments and the dcm2niix version. When a conversion with the same key is
+        requested again, the result is rebuilt from the cache instead of running dcm2niix.
+
+        Args:
+            cache_folder (str): Folder in which the cache is stored.
+            max_size (int, optional): Maximum size of the cache in bytes, the least recently used entries are evicted when it is exceeded. Defaults to None, for no limit.
+            hash_contents (bool, optional): Whether to include a hash of the file contents in the fingerprint, instead of only the file sizes and modification times. Defaults to False.
+        """
+        self.cache_folder = cache_folder
+        self.max_size = max_size
+        self.hash_contents = hash_contents
+
+        self.MANIFEST_NAME = "manifest.json"
+        self.FILES_FOLDER = "files"
+        # Files with these extensions are written by dcm2niix, and are not part of the input
+        self.OUTPUT_EXTENSIONS = (
+            ".nii",
+            ".nii.gz",
+            ".nrrd",
+            ".nhdr",
+            ".mha",
+            ".mhd",
+            ".raw",
+            ".json",
+            ".bval",
+            ".bvec",
+        )
+        # Files that are written next to an image, with the same name
+        self.ASSOCIATED_EXTENSIONS = (".bval", ".bvec")
+
+        os.makedirs(self.cache_folder, exist_ok=True)
+
+    ######
+    # Keys
+    ######
+
+    def key(self, input_path: str, output_path: str, arg_list: list, version: str) -> str:
+        """
+        Compute the cache key of a conversion.
+
+        Args:
+            input_path (str): The DICOM folder to convert.
+            output_path (str): The output folder.
+            arg_list (list): The dcm2niix arguments, as made by _convert_options_to_arg_list.
+            version (str): The dcm2niix version.
+
+        Returns:
+            str: The cache key.
+        """
+        key_info = {
+            "input_path": os.path.abspath(input_path),
+            "output_path": os.path.abspath(output_path),
+            "arguments": arg_list,
+            "version": version,
+            "fingerprint": self.fingerprint(input_path, output_path),
+        }
+        return hashlib.sha256(json.dumps(key_info, sort_keys=True).encode()).hexdigest()
+
+    def fingerprint(self, input_path: str, output_path: str = None) -> List[list]:
+        """
+        Fingerprint the input folder.
+
+        Files written by dcm2niix are left out, so that converting into the input folder does not
+        change the fingerprint. An output folder inside the input folder is left out completely.
+
+        Args:
+            input_path (str): The folder to fingerprint.
+            output_path (str, optional): The output folder of the conversion. Defaults to None.
+
+        Returns:
+            List[list]: Relative path, size and modification time (and hash) of every file.
+        """
+        if output_path is not None:
+            output_path = os.path.abspath(output_path)
+
+        fingerprint = []
+        for i_root, i_dirs, i_files in os.walk(input_path):
+            i_dirs[:] = sorted(
+                i_dir
+                for i_dir in i_dirs
+                if os.path.abspath(os.path.join(i_root, i_dir)) != output_path
+            )
+            for i_file in sorted(i_files):
+                if i_file.endswith(self.OUTPUT_EXTENSIONS):
+                    continue
+                file_path = os.path.join(i_root, i_file)
+                file_stat = os.stat(file_path)
+                file_info = [
+                    os.path.relpath(file_path, input_path),
+                    file_stat.st_size,
+                    file_stat.st_mtime_ns,
+                ]
+                if self.hash_contents:
+                    file_info.append(self._hash_file(file_path))
+                fingerprint.append(file_info)
+        return fingerprint
+
+    ######
+    # Lookup and storage
+    ######
+
+    def get(self, key: str, output_path: str):
+        """
+        Get a cached conversion.
+
+        Output files that no longer exist in the output folder, or that were changed after they were
+        stored, are restored from the cache.
+
+        Args:
+            key (str): The cache key.
+            output_path (str): The output folder.
+
+        Returns:
+            Optional[DCM2NIIX_OUTPUT]: The cached output, or None if the conversion is not cached.
+        """
+        from dcm2niixpy.dcm2niix import DCM2NIIX_OUTPUT
+
+        manifest = self._read_manifest(key)
+        if manifest is None:
+            return None
+
+        entry_folder = os.path.join(self.cache_folder, key)
+        for i_file, i_file_info in manifest["files"].items():
+            file_path = os.path.join(output_path, i_file)
+            if self._file_info(file_path) == i_file_info:
+                continue
+            cached_file = os.path.join(entry_folder, self.FILES_FOLDER, i_file)
+            if not os.path.isfile(cached_file):
+                self._remove_entry(key)
+                return None
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            shutil.copy2(cached_file, file_path)
+
+        # Mark as recently used
+        os.utime(os.path.join(entry_folder, self.MANIFEST_NAME))
+
+        output_info = DCM2NIIX_OUTPUT.from_dict(manifest["output"])
+        output_info.set_output_folder(manifest["output_path"], output_path)
+        return output_info
+
+    def put(self, key: str, input_path: str, output_path: str, output_info) -> None:
+        """
+        Store a conversion in the cache.
+
+        The stored files are the files of the converted series, so that files written to the same
+        output folder by other conversions are not stored. The files are copied rather than linked,
+        so that changing an output file afterwards does not change the cached file.
+
+        Args:
+            key (str): The cache key.
+            input_path (str): The DICOM folder that was converted.
+            output_path (str): The output folder.
+            output_info (DCM2NIIX_OUTPUT): The output of the conversion.
+        """
+        produced_files = self._produced_files(output_path, output_info)
+
+        # Build the entry in a temporary folder so that it is never visible half-written
+        entry_folder = tempfile.mkdtemp(dir=self.cache_folder, prefix=".tmp_")
+        files = {}
+        for i_file in produced_files:
+            source_file = os.path.join(output_path, i_file)
+            cached_file = os.path.join(entry_folder, self.FILES_FOLDER, i_file)
+            os.makedirs(os.path.dirname(cached_file), exist_ok=True)
+            shutil.copy2(source_file, cached_file)
+            files[i_file] = self._file_info(source_file)
+
+        manifest = {
+            "input_path": os.path.abspath(input_path),
+            "output_path": output_path,
+            "files": files,
+            "output": output_info.to_dict(),
+        }
+        with open(os.path.join(entry_folder, self.MANIFEST_NAME), "w") as manifest_file:
+            json.dump(manifest, manifest_file)
+
+        self._remove_entry(key)
+        try:
+            os.rename(entry_folder, os.path.join(self.cache_folder, key))
+        except OSError:
+            # Another process stored the same conversion in the meantime
+            shutil.rmtree(entry_folder, ignore_errors=True)
+
+        self._evict()
+
+    ######
+    # Invalidation and eviction
+    ######
+
+    def invalidate(self, input_path: str = None) -> int:
+        """
+        Remove entries from the cache.
+
+        Args:
+            input_path (str, optional): Only remove the entries of this input folder. Defaults to None, in which case all entries are removed.
+
+        Returns:
+            int: The number of removed entries.
+        """
+        if input_path is not None:
+            input_path = os.path.abspath(input_path)
+
+        n_removed = 0
+        for i_key in self._keys():
+            if input_path is not None:
+                manifest = self._read_manifest(i_key)
+                if manifest is not None and manifest["input_path"] != input_path:
+                    continue
+            self._remove_entry(i_key)
+            n_removed += 1
+        return n_removed
+
+    @property
+    def size(self) -> int:
+        """
+        Total size of the cache.
+
+        Returns:
+            int: Size of the cache in bytes.
+        """
+        return sum(self._entry_size(i_key) for i_key in self._keys())
+
+    def _evict(self) -> None:
+        if self.max_size is None:
+            return
+
+        entries = []
+        for i_key in self._keys():
+            manifest_file = os.path.join(self.cache_folder, i_key, self.MANIFEST_NAME)
+            try:
+                last_used = os.stat(manifest_file).st_mtime
+            except OSError:
+                continue
+            entries.append((last_used, i_key, self._entry_size(i_key)))
+
+        total_size = sum(i_entry[2] for i_entry in entries)
+        for _, i_key, i_size in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            self._remove_entry(i_key)
+            total_size -= i_size
+
+    ######
+    # Helper functions
+    ######
+
+    def _produced_files(self, output_path: str, output_info) -> List[str]:
+        produced_files = []
+        for i_series in output_info.series:
+            series_files = [i_series.output_path, i_series.sidecar_path]
+            if i_series.output_path is not None and i_series.extension is not None:
+                image_stem = i_series.output_path[: -len(i_series.extension)]
+                series_files.extend(
+                    image_stem + i_extension for i_extension in self.ASSOCIATED_EXTENSIONS
+                )
+            for i_file in series_files:
+                if i_file is None or not os.path.isfile(i_file):
+                    continue
+                relative_file = os.path.relpath(i_file, output_path)
+                if relative_file not in produced_files:
+                    produced_files.append(relative_file)
+        return produced_files
+
+    def _keys(self) -> List[str]:
+        return [
+            i_entry
+            for i_entry in os.listdir(self.cache_folder)
+            if not i_entry.startswith(".")
+            and os.path.isdir(os.path.join(self.cache_folder, i_entry))
+        ]
+
+    def _read_manifest(self, key: str) -> Optional[dict]:
+        manifest_file = os.path.join(self.cache_folder, key, self.MANIFEST_NAME)
+        try:
+            with open(manifest_file) as manifest_file:
+                return json.load(manifest_file)
+        except (OSError, ValueError):
+            return None
+
+    def _remove_entry(self, key: str) -> None:
+        shutil.rmtree(os.path.join(self.cache_folder, key), ignore_errors=True)
+
+    def _entry_size(self, key: str) -> int:
+        size = 0
+        for i_root, _, i_files in os.walk(os.path.join(self.cache_folder, key)):
+            for i_file in i_files:
+                try:
+                    size += os.path.getsize(os.path.join(i_root, i_file))
+                except OSError:
+                    pass
+        return size
+
+    @staticmethod
+    def _file_info(file_path: str) -> Optional[list]:
+        # copy2 keeps the modification time, so an unchanged output matches its cached file
+        try:
+            file_stat = os.stat(file_path)
+        except OSError:
+            return None
+        return [file_stat.st_size, file_stat.st_mtime_ns]
+
+    @staticmethod
+    def _hash_file(file_path: str) -> str:
+        file_hash = hashlib.sha256()
+        with open(file_path, "rb") as input_file:
+            for i_chunk in iter(lambda: input_file.read(1024 * 1024), b""):
+                file_hash.update(i_chunk)
+        return file_hash.hexdigest()
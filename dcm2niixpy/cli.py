@@ -0,0 +1,381 @@
+"""Convert DICOM folders to NIfTI in parallel, with a journal to resume interrupted runs."""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from dcm2niixpy.dcm2niix import DCM2NIIX
+
+
+# Options of DCM2NIIX that can be set from the command line, with their help text
+CLI_OPTIONS = [
+    ("compression_level", "gz compression level, 1 (fastest) to 9 (smallest)."),
+    ("adjacent_dicoms", "Whether images from the same series are always in the same folder (y/n)."),
+    ("bids_sidecar", "Whether to write a BIDS sidecar (y/n/o, o = only the sidecar)."),
+    ("anonymize_bids_sidecar", "Whether to anonymize the BIDS sidecar (y/n)."),
+    ("comments_in_aux", "Text to store in the NIfTI aux_file field."),
+    ("directory_search_depth", "Directory search depth, 0 to 9."),
+    ("export_as_nrrd", "Whether to export NRRD instead of NIfTI (y/n)."),
+    ("filename", "Output file name format, e.g. %%f_%%p_%%t_%%s."),
+    ("ignore_derived", "Whether to ignore derived, localizer and 2D images (y/n)."),
+    ("losslessly_scale", "Losslessly scale 16-bit integers (y/n/o)."),
+    ("merge_2d_slices", "Merge 2D slices from the same series (y/n or 0/1/2)."),
+    ("philips_precise_float_scaling", "Philips precise float scaling (y/n)."),
+    ("single_file_mode", "Single file mode, do not convert other images in the folder (y/n)."),
+    ("private_text_notes", "Whether to write private text notes (y/n)."),
+    ("verbose", "Verbosity (y/n or 0/1/2)."),
+    (
+        "conflict_write_behavior",
+        "Behavior for name conflicts: 0 = skip, 1 = overwrite, 2 = suffix.",
+    ),
+    ("crop_3D", "Crop 3D acquisitions (y/n/o)."),
+    ("compress", "Compression (y/o/i/n/3)."),
+    ("byte_order", "Byte order (y = big endian, n = little endian, o = native)."),
+]
+
+# Status of a conversion in the journal
+CONVERTED = "converted"
+FAILED = "failed"
+
+
+def read_manifest(manifest_file: str) -> List[Tuple[str, Optional[str]]]:
+    """
+    Read the conversions from a manifest.
+
+    The manifest is either a CSV file with the columns "input_path" and, optionally,
+    "output_path", or a JSONL file (with extension ".jsonl") with these keys on every line.
+
+    Args:
+        manifest_file (str): Path to the manifest.
+
+    Raises:
+        ValueError: If an entry of the manifest has no input path.
+
+    Returns:
+        List[Tuple[str, Optional[str]]]: The input and output folder of every conversion.
+    """
+    with open(manifest_file, newline="") as input_file:
+        if manifest_file.endswith(".jsonl"):
+            entries = [json.loads(i_line) for i_line in input_file if i_line.strip()]
+        else:
+            entries = list(csv.DictReader(input_file))
+
+    conversions = []
+    for i_line, i_entry in enumerate(entries, start=1):
+        if not i_entry.get("input_path"):
+            raise ValueError(
+                "Entry {line} of '{manifest_file}' has no input_path".format(
+                    line=i_line, manifest_file=manifest_file
+                )
+            )
+        conversions.append((i_entry["input_path"], i_entry.get("output_path") or None))
+    return conversions
+
+
+def find_conversions(input_root: str, output_root: str = None) -> List[Tuple[str, Optional[str]]]:
+    """
+    Make a conversion for every folder in a root folder.
+
+    Args:
+        input_root (str): Folder of which every sub folder is converted.
+        output_root (str, optional): Folder in which the output of every sub folder is written to a folder with the same name. Defaults to None, in which case the output is written to the input folders.
+
+    Returns:
+        List[Tuple[str, Optional[str]]]: The input and output folder of every conversion.
+    """
+    conversions = []
+    for i_name in sorted(os.listdir(input_root)):
+        input_path = os.path.join(input_root, i_name)
+        if not os.path.isdir(input_path) or i_name.startswith("."):
+            continue
+        output_path = os.path.join(output_root, i_name) if output_root is not None else None
+        conversions.append((input_path, output_path))
+    return conversions
+
+
+def read_journal(journal_file: str) -> Dict[str, dict]:
+    """
+    Read the results of a previous run from a journal.
+
+    A line that was not completely written, because the run was interrupted, is ignored.
+
+    Args:
+        journal_file (str): Path to the journal.
+
+    Returns:
+        Dict[str, dict]: The most recent result of every input folder.
+    """
+    results = {}
+    if not os.path.isfile(journal_file):
+        return results
+    with open(journal_file) as input_file:
+        for i_line in input_file:
+            try:
+                result = json.loads(i_line)
+            except ValueError:
+                continue
+            results[result["input_path"]] = result
+    return results
+
+
+def remaining_conversions(
+    conversions: List[Tuple[str, Optional[str]]], journal_file: str = None
+) -> List[Tuple[str, Optional[str]]]:
+    """
+    Remove the conversions that were converted according to the journal.
+
+    Failed conversions are kept, so that they are tried again.
+
+    Args:
+        conversions (List[Tuple[str, Optional[str]]]): The input and output folder of every conversion.
+        journal_file (str, optional): Path to the journal. Defaults to None, for no journal.
+
+    Returns:
+        List[Tuple[str, Optional[str]]]: The conversions that still have to be run.
+    """
+    if journal_file is None:
+        return list(conversions)
+    converted = {
+        i_input_path
+        for i_input_path, i_result in read_journal(journal_file).items()
+        if i_result["status"] == CONVERTED
+    }
+    return [i_entry for i_entry in conversions if i_entry[0] not in converted]
+
+
+def convert_entry(dcm2niix: DCM2NIIX, input_path: str, output_path: Optional[str]) -> dict:
+    """
+    Convert a single DICOM folder, returning its journal entry.
+
+    Args:
+        dcm2niix (DCM2NIIX): The configured converter.
+        input_path (str): The DICOM folder.
+        output_path (Optional[str]): The output folder, or None to write to the input folder.
+
+    Returns:
+        dict: The result of the conversion.
+    """
+    start_time = time.perf_counter()
+    try:
+        if output_path is not None:
+            os.makedirs(output_path, exist_ok=True)
+        output_info = dcm2niix.convert(input_path, output_path)
+        # The images are complete when images that are compressed in the background are compressed
+        output_info.wait()
+    except Exception as error:
+        return {
+            "input_path": input_path,
+            "output_path": output_path,
+            "status": FAILED,
+            "error": "{name}: {error}".format(name=type(error).__name__, error=error),
+            "duration": time.perf_counter() - start_time,
+        }
+    return {
+        "input_path": input_path,
+        "output_path": output_path,
+        "status": CONVERTED,
+        "error": None,
+        "duration": time.perf_counter() - start_time,
+        "output": output_info.to_dict(),
+    }
+
+
+def run_conversions(
+    dcm2niix: DCM2NIIX,
+    conversions: List[Tuple[str, Optional[str]]],
+    journal_file: str = None,
+    jobs: int = 1,
+) -> Iterator[dict]:
+    """
+    Run conversions in parallel, appending every result to the journal as soon as it is done.
+
+    Args:
+        dcm2niix (DCM2NIIX): The configured converter.
+        conversions (List[Tuple[str, Optional[str]]]): The input and output folder of every conversion.
+        journal_file (str, optional): Path to the journal. Defaults to None, for no journal.
+        jobs (int, optional): Number of conversions to run at the same time. Defaults to 1.
+
+    Yields:
+        dict: The result of every conversion that was run, in the order in which they finish.
+    """
+    from concurrent.futures import FIRST_COMPLETED
+    from concurrent.futures import ThreadPoolExecutor
+    from concurrent.futures import wait
+
+    journal = None
+    if journal_file is not None:
+        cut_off = False
+        if os.path.isfile(journal_file) and os.path.getsize(journal_file) > 0:
+            with open(journal_file, "rb") as input_file:
+                input_file.seek(-1, os.SEEK_END)
+                cut_off = input_file.read(1) != b"\n"
+        journal = open(journal_file, "a")
+        # A line that was cut off by an interruption is ended, so that it is not joined with a new result
+        if cut_off:
+            journal.write("\n")
+
+    def write_result(result: dict):
+        if journal is not None:
+            journal.write(json.dumps(result) + "\n")
+            journal.flush()
+
+    pending_conversions = iter(conversions)
+    running = set()
+    try:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            try:
+                while True:
+                    # Only a few conversions are submitted ahead, so that huge manifests are not kept in memory as futures
+                    for i_input_path, i_output_path in pending_conversions:
+                        running.add(
+                            executor.submit(convert_entry, dcm2niix, i_input_path, i_output_path)
+                        )
+                        if len(running) >= 2 * jobs:
+                            break
+                    if len(running) == 0:
+                        break
+
+                    done, running = wait(running, return_when=FIRST_COMPLETED)
+                    # All finished results are journaled before the first is yielded, as the caller
+                    # can stop at any yield
+                    results = [i_future.result() for i_future in done]
+                    for i_result in results:
+                        write_result(i_result)
+                    yield from results
+            finally:
+                # When interrupted, conversions that did not start are cancelled before the executor
+                # waits for its threads. Conversions that did start are finished and journaled, so
+                # that they are not converted again when resuming.
+                started = [i_future for i_future in running if not i_future.cancel()]
+                for i_future in wait(started).done:
+                    write_result(i_future.result())
+    finally:
+        if journal is not None:
+            journal.close()
+
+
+def make_parser() -> argparse.ArgumentParser:
+    """
+    Make the parser of the command line arguments.
+
+    Returns:
+        argparse.ArgumentParser: The parser.
+    """
+    parser = argparse.ArgumentParser(prog="dcm2niixpy", description=__doc__.strip())
+    inputs = parser.add_mutually_exclusive_group(required=True)
+    inputs.add_argument(
+        "--manifest",
+        help="CSV or JSONL file with an input_path and optional output_path per conversion.",
+    )
+    inputs.add_argument("--input-root", help="Folder of which every sub folder is converted.")
+    parser.add_argument(
+        "--output-root",
+        help="With --input-root, folder in which the output of every sub folder is written.",
+    )
+    parser.add_argument(
+        "--journal",
+        help="JSONL file to which the results are appended; converted inputs in it are skipped.",
+    )
+    parser.add_argument(
+        "--jobs", type=int, default=1, help="Number of conversions to run at the same time."
+    )
+
+    backend = parser.add_argument_group("dcm2niix")
+    backend.add_argument(
+        "--dcm2niix-version", required=True, help="Version of dcm2niix to use, e.g. 1.0.20220720."
+    )
+    backend.add_argument(
+        "--backend",
+        default="singularity",
+        choices=["singularity", "docker", "native"],
+        help="How to run dcm2niix, default singularity.",
+    )
+    backend.add_argument("--executable", help="dcm2niix executable for the native backend.")
+    backend.add_argument(
+        "--download-folder", help="Download the singularity container to this folder."
+    )
+
+    options = parser.add_argument_group("conversion options")
+    for i_option, i_help in CLI_OPTIONS:
+        options.add_argument("--" + i_option.replace("_", "-"), dest=i_option, help=i_help)
+    options.add_argument("--terse", action="store_true", help="Omit the filename post-fixes.")
+    return parser
+
+
+def main(argv: list = None) -> int:
+    """
+    Run the conversions from the command line.
+
+    Args:
+        argv (list, optional): Command line arguments. Defaults to None, in which case sys.argv is used.
+
+    Returns:
+        int: Exit code, 1 if a conversion failed.
+    """
+    parser = make_parser()
+    arguments = parser.parse_args(argv)
+    if arguments.jobs < 1:
+        parser.error("--jobs should be at least 1")
+
+    dcm2niix = DCM2NIIX(
+        arguments.dcm2niix_version,
+        container_backend=arguments.backend,
+        download=arguments.download_folder is not None,
+        download_folder=arguments.download_folder,
+        executable=arguments.executable,
+    )
+    for i_option, _ in CLI_OPTIONS:
+        value = getattr(arguments, i_option)
+        if value is None:
+            continue
+        try:
+            setattr(dcm2niix, i_option, value)
+        except (TypeError, ValueError) as error:
+            parser.error(str(error))
+    if arguments.terse:
+        dcm2niix.terse = True
+
+    if arguments.manifest is not None:
+        conversions = read_manifest(arguments.manifest)
+    else:
+        conversions = find_conversions(arguments.input_root, arguments.output_root)
+    remaining = remaining_conversions(conversions, arguments.journal)
+
+    n_converted = 0
+    n_failed = 0
+    try:
+        for i_result in run_conversions(dcm2niix, remaining, arguments.journal, arguments.jobs):
+            if i_result["status"] == CONVERTED:
+                n_converted += 1
+            else:
+                n_failed += 1
+                print(
+                    "Failed to convert {input_path}: {error}".format(
+                        input_path=i_result["input_path"], error=i_result["error"]
+                    ),
+                    file=sys.stderr,
+                )
+    except KeyboardInterrupt:
+        print("Interrupted, run again with the same journal to resume", file=sys.stderr)
+        return 130
+    finally:
+        print(
+            "Converted {n_converted}, failed {n_failed}, skipped {n_skipped} already converted".format(
+                n_converted=n_converted,
+                n_failed=n_failed,
+                n_skipped=len(conversions) - len(remaining),
+            )
+        )
+    return 1 if n_failed > 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+import collections
+import os
+import threading
+import time
+import uuid
+import zlib
+
+
+class DCM2NIIX_COMPRESSOR:
+    def __init__(self, max_workers: int = None, block_size: int = 1024 * 1024) -> None:
+        """
+        Initialize gzip compression of converted images, separately from dcm2niix.
+
+        dcm2niix then writes uncompressed images, which are compressed in the background while
+        the next conversion is running. Every image is split in blocks that are compressed in
+        parallel, each block is written as a separate gzip member. The result is a standard gzip
+        file, similar to the output of pigz.
+
+        Args:
+            max_workers (int, optional): Number of blocks to compress at the same time. Defaults to None, in which case the number of CPUs is used.
+            block_size (int, optional): Size of the blocks in bytes. Defaults to 1 MiB.
+        """
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        self.max_workers = max_workers
+        self.block_size = block_size
+
+        self._file_executor = None
+        self._block_executor = None
+        self._lock = threading.Lock()
+
+    def submit(self, output_info, compression_level: int = 6, callback=None):
+        """
+        Compress the images of a conversion in the background.
+
+        The images are expected at the paths of the series without the ".gz" extension, and are
+        replaced by the compressed images.
+
+        Args:
+            output_info (DCM2NIIX_OUTPUT): The output of the conversion, with ".nii.gz" as extension.
+            compression_level (int, optional): The gzip compression level. Defaults to 6.
+            callback (Callable[[DCM2NIIX_OUTPUT], object], optional): Called with the output when the compression has finished, also when it failed, before the future is done. Defaults to None.
+
+        Returns:
+            concurrent.futures.Future: Future that is done when all images are compressed.
+        """
+        self._start()
+        # Files are compressed one at a time, every file uses all block workers
+        return self._file_executor.submit(
+            self._compress_output, output_info, compression_level, callback
+        )
+
+    def compress_file(
+        self, input_file: str, output_file: str = None, compression_level: int = 6
+    ) -> int:
+        """
+        Compress a file, removing the uncompressed file.
+
+        The compressed file is written to a temporary file that is renamed when it is complete.
+
+        Args:
+            input_file (str): The file to compress.
+            output_file (str, optional): The compressed file. Defaults to None, in which case ".gz" is appended to the input file.
+            compression_level (int, optional): The gzip compression level. Defaults to 6.
+
+        Returns:
+            int: Size of the compressed file in bytes.
+        """
+        self._start()
+        if output_file is None:
+            output_file = input_file + ".gz"
+
+        temporary_file = os.path.join(
+            os.path.dirname(output_file),
+            ".tmp_" + uuid.uuid4().hex + "_" + os.path.basename(output_file),
+        )
+        compressed_size = 0
+        # At most two blocks per worker are kept in memory
+        max_pending = 2 * self.max_workers
+        pending = collections.deque()
+        try:
+            with open(input_file, "rb") as uncompressed_file, open(
+                temporary_file, "wb"
+            ) as compressed_file:
+                n_blocks = 0
+                while True:
+                    block = uncompressed_file.read(self.block_size)
+                    if block or n_blocks == 0:
+                        pending.append(
+                            self._block_executor.submit(
+                                self._compress_block, block, compression_level
+                            )
+                        )
+                        n_blocks += 1
+                    if len(pending) == 0:
+                        break
+                    if not block or len(pending) >= max_pending:
+                        compressed_block = pending.popleft().result()
+                        compressed_file.write(compressed_block)
+                        compressed_size += len(compressed_block)
+            os.replace(temporary_file, output_file)
+        finally:
+            if os.path.exists(temporary_file):
+                os.remove(temporary_file)
+
+        os.remove(input_file)
+        return compressed_size
+
+    def shutdown(self) -> None:
+        """Wait for all compressions to finish and stop the workers."""
+        with self._lock:
+            if self._file_executor is not None:
+                self._file_executor.shutdown()
+                self._block_executor.shutdown()
+            self._file_executor = None
+            self._block_executor = None
+
+    ######
+    # Helper functions
+    ######
+
+    def _start(self) -> None:
+        from concurrent.futures import ThreadPoolExecutor
+
+        with self._lock:
+            if self._file_executor is None:
+                self._file_executor = ThreadPoolExecutor(max_workers=1)
+                self._block_executor = ThreadPoolExecutor(max_workers=self.max_workers)
+
+    def _compress_output(self, output_info, compression_level: int, callback=None):
+        start_time = time.perf_counter()
+        try:
+            for i_series in output_info.series:
+                if i_series.output_path is None or not i_series.output_path.endswith(".gz"):
+                    continue
+                i_series.compressed_size = self.compress_file(
+                    i_series.output_path[: -len(".gz")], i_series.output_path, compression_level
+                )
+            output_info.compression_time = time.perf_counter() - start_time
+
+            if output_info.metrics is not None:
+                output_info.metrics.add_time("compression", output_info.compression_time)
+                output_info.metrics.count(
+                    "bytes_compressed",
+                    sum(i_series.compressed_size or 0 for i_series in output_info.series),
+                )
+        finally:
+            if callback is not None:
+                callback(output_info)
+        return output_info
+
+    @staticmethod
+    def _compress_block(block: bytes, compression_level: int) -> bytes:
+        # zlib releases the GIL while compressing, so blocks are compressed in parallel
+        compressor = zlib.compressobj(compression_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        return compressor.compress(block) + compressor.flush()
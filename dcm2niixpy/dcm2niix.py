@@ -1,51 +1,180 @@
+import contextlib
+import functools
+import json
 import os
 import re
+import shlex
 import shutil
-
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+import warnings
+
+from typing import AsyncIterator
+from typing import Callable
 from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import TYPE_CHECKING
 from typing import Union
 
-import spython.utils
+from dcm2niixpy.image_cache import DCM2NIIX_IMAGE_CACHE
+from dcm2niixpy.metrics import DCM2NIIX_METRICS
+from dcm2niixpy.options import DCM2NIIX_OPTION
+from dcm2niixpy.options import read_yes_no
+from dcm2niixpy.resources import DCM2NIIX_ADMISSION
+from dcm2niixpy.resources import DCM2NIIX_LIMITS
+from dcm2niixpy.session import DCM2NIIX_SESSION
+from dcm2niixpy.session import to_container_path
+
+if TYPE_CHECKING:
+    from dcm2niixpy.cache import DCM2NIIX_CACHE
+    from dcm2niixpy.compression import DCM2NIIX_COMPRESSOR
+    from dcm2niixpy.image import DCM2NIIX_IMAGE
+    from dcm2niixpy.scan import DICOM_INDEX
+    from dcm2niixpy.scan import DICOM_SERIES
+    from dcm2niixpy.scheduler import DCM2NIIX_SCHEDULER
+    from dcm2niixpy.staging import DCM2NIIX_STAGING
+
+
+# The backends are probed at most once per process, as probing spawns subprocesses. spython,
+# asyncio, concurrent.futures and the optional features (caching, staging, compression, scheduling
+# and reading images) are only imported when they are used, to keep importing fast.
+
+
+@functools.lru_cache(maxsize=None)
+def _has_singularity() -> bool:
+    import spython.utils
+
+    return spython.utils.check_install()
+
 
-from spython.main import Client
+@functools.lru_cache(maxsize=None)
+def _which(executable: str) -> Optional[str]:
+    return shutil.which(executable)
+
+
+@functools.lru_cache(maxsize=None)
+def _native_version(executable: str, modification_time: int) -> Optional[str]:
+    # The modification time is part of the key, so that a replaced executable is probed again
+    result = subprocess.run(
+        [executable, "--version"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        universal_newlines=True,
+    )
+    native_version = re.search(r"v(\d+\.\d+\.\d+)", result.stdout)
+    return native_version.group(1) if native_version else None
 
 
 class DCM2NIIX:
+    # Instances are created for every job in large batches, so their attributes are fixed
+    __slots__ = (
+        "version",
+        "executable",
+        "metrics_sinks",
+        "download_metrics",
+        "_container_backend",
+        "container_url",
+        "download_container",
+        "download_folder",
+        "download_name",
+        "image_cache",
+        "options",
+        "_arg_list",
+        "_options_lock",
+        "_image_lock",
+        "_image_ready",
+        "_session",
+        "cache",
+        "staging",
+        "compressor",
+        "limits",
+        "admission",
+        "scheduler",
+        "__weakref__",
+    )
+
+    SINGULARITY_KEYWORD = "singularity"
+    DOCKER_KEYWORD = "docker"
+    NATIVE_KEYWORD = "native"
+    SINGULARITY_ROOT_URL = "docker://svdvoort/dcm2niix"
+    DOCKER_ROOT_URL = "svdvoort/dcm2niix"
+    CONTAINER_INPUT_PATH = "/input"
+    CONTAINER_OUTPUT_PATH = "/output"
+    CONTAINER_SCRIPT_PATH = "/script"
+    CONTAINER_EXECUTABLE = "dcm2niix"
+
     def __init__(
         self,
         version: str,
         container_backend="singularity",
         download: bool = False,
         download_folder: str = None,
+        executable: str = None,
+        metrics_sinks: List[Callable[[DCM2NIIX_METRICS], None]] = None,
+        image_cache: DCM2NIIX_IMAGE_CACHE = None,
     ) -> None:
         """
         Initialize the DCM2NIIX object.
 
         Args:
-            container_backend (str, optional): Either "docker" or "singularity". Defaults to "singularity".
+            container_backend (str, optional): Either "docker", "singularity" or "native". Defaults to "singularity".
             version (str): Docker tag of version to use. Defaults to None.
             download (bool, optional): Whether to download the container instead of pulling and running everytime. Defaults to False.
-            download_folder (str, optional): Location to download the container to. Defaults to None.
+            download_folder (str, optional): Location to download the container to, when no image cache is given. Defaults to None.
+            executable (str, optional): Path to the dcm2niix executable for the "native" backend. Defaults to None, in which case dcm2niix is searched on the PATH.
+            metrics_sinks (List[Callable[[DCM2NIIX_METRICS], None]], optional): Functions that are called with the metrics of every download and conversion. Defaults to None.
+            image_cache (DCM2NIIX_IMAGE_CACHE, optional): Image cache to download the container to. Defaults to None, in which case an image cache in the download folder is used.
+
+        A single object can be shared by multiple threads: the conversion methods can be called
+        at the same time, also while options are changed. Every conversion uses the options as
+        they were when it started, changing an option replaces the options instead of modifying
+        them. The downloaded container is checked and, if it has been removed from the image
+        cache, downloaded again by one thread at a time. Other attributes, such as ``cache``,
+        ``staging`` or ``limits``, should be set before the object is shared.
         """
 
-        self.SINGULARITY_KEYWORD = "singularity"
-        self.DOCKER_KEYWORD = "docker"
-        self.SINGULARITY_ROOT_URL = "docker://svdvoort/dcm2niix"
-        self.DOCKER_ROOT_URL = "svdvoort/dcm2niix"
-
         # TODO check whether the version is actually able for use
         self.version = version
 
+        self.executable = executable
+        self.metrics_sinks: List[Callable[[DCM2NIIX_METRICS], None]] = list(metrics_sinks or [])
+        self.download_metrics: Optional[DCM2NIIX_METRICS] = None
+        self._image_lock = threading.Lock()
+        self._image_ready = False
         self.container_backend = container_backend
         self.container_url = self._construct_container_url()
         self.download_container = download
+        if download_folder is None and image_cache is not None:
+            download_folder = image_cache.cache_folder
         self.download_folder = download_folder
         self.download_name = None
+        self.image_cache = image_cache
         if self.download_container:
+            if self.image_cache is None:
+                self.image_cache = DCM2NIIX_IMAGE_CACHE(self.download_folder)
             self.download_name = "dcm2niix_" + self.version + ".sif"
             self._download_container()
 
+        # The options are never modified, setting an option replaces them. They should be set
+        # through their properties.
         self.options: Dict[str, str] = {}
+        self._options_lock = threading.Lock()
+        # The arguments built from the options, together with the options they were built from
+        self._arg_list: Optional[Tuple[Dict[str, str], Tuple[str, ...]]] = None
+        self._session: "DCM2NIIX_SESSION" = None
+        self.cache: "DCM2NIIX_CACHE" = None
+        self.staging: "DCM2NIIX_STAGING" = None
+        self.compressor: "DCM2NIIX_COMPRESSOR" = None
+        self.limits: DCM2NIIX_LIMITS = None
+        self.admission: DCM2NIIX_ADMISSION = None
+        self.scheduler: "DCM2NIIX_SCHEDULER" = None
 
         self.compression_level = 6
         self.adjacent_dicoms = False
@@ -80,7 +209,7 @@ class DCM2NIIX:
         Returns:
             bool: True if singularity is installed
         """
-        return spython.utils.check_install()
+        return _has_singularity()
 
     def _construct_container_url(self) -> str:
         if self.container_backend == self.SINGULARITY_KEYWORD:
@@ -96,7 +225,7 @@ class DCM2NIIX:
         Get the container backend.
 
         Returns:
-            str: Either "docker" or "singularity".
+            str: Either "docker", "singularity" or "native".
         """
         return self._container_backend
 
@@ -106,15 +235,19 @@ class DCM2NIIX:
         Set the container backend.
 
         Args:
-            container_backend (str): Either "docker" or "singularity".
+            container_backend (str): Either "docker", "singularity" or "native".
 
         Raises:
-            NotImplementedError: If not docker or singularity.
+            NotImplementedError: If not docker, singularity or native.
             OSError: If using a backend that is not installed.
         """
-        if container_backend not in [self.DOCKER_KEYWORD, self.SINGULARITY_KEYWORD]:
+        if container_backend not in [
+            self.DOCKER_KEYWORD,
+            self.SINGULARITY_KEYWORD,
+            self.NATIVE_KEYWORD,
+        ]:
             raise NotImplementedError(
-                "Container backend should be either 'docker' or 'singularity'. You passed {input}".format(
+                "Container backend should be either 'docker', 'singularity' or 'native'. You passed {input}".format(
                     input=container_backend
                 )
             )
@@ -129,22 +262,99 @@ class DCM2NIIX:
             else:
                 self._container_backend = self.SINGULARITY_KEYWORD
         elif container_backend == self.DOCKER_KEYWORD:
-            has_docker = shutil.which(self.DOCKER_KEYWORD) is not None
+            has_docker = _which(self.DOCKER_KEYWORD) is not None
             if not has_docker:
                 raise OSError(
                     "You have attempted to run with 'docker' container backend, but docker is not installed"
                 )
             else:
                 self._container_backend = self.DOCKER_KEYWORD
+        elif container_backend == self.NATIVE_KEYWORD:
+            self.executable = self._find_native_executable()
+            self._check_native_version()
+            self._container_backend = self.NATIVE_KEYWORD
+
+    def _find_native_executable(self) -> str:
+        """
+        Find the dcm2niix executable for the native backend.
+
+        Raises:
+            OSError: If the executable cannot be found.
+
+        Returns:
+            str: Path to the dcm2niix executable.
+        """
+        if self.executable is not None:
+            executable = _which(self.executable)
+        else:
+            executable = _which(self.CONTAINER_EXECUTABLE)
+
+        if executable is None:
+            raise OSError(
+                "You have attempted to run with 'native' backend, but the dcm2niix executable '{executable}' could not be found".format(
+                    executable=self.executable or self.CONTAINER_EXECUTABLE
+                )
+            )
+        return executable
+
+    def _check_native_version(self) -> None:
+        """
+        Check whether the native dcm2niix executable matches the requested version.
+
+        Raises:
+            ValueError: If the version of the executable does not match.
+        """
+        native_version = _native_version(self.executable, os.stat(self.executable).st_mtime_ns)
+        if native_version != self.version:
+            raise ValueError(
+                "The native dcm2niix executable '{executable}' has version '{native_version}', but version '{version}' was requested".format(
+                    executable=self.executable,
+                    native_version=native_version or "unknown",
+                    version=self.version,
+                )
+            )
 
     def _download_container(self) -> None:
         if self.download_container:
-            if not os.path.exists(os.path.join(self.download_folder, self.download_name)):
-                Client.pull(
-                    image=self.container_url,
-                    pull_folder=self.download_folder,
-                    ext="sif",
-                    name=self.download_name,
+            # Threads download one at a time, the image cache makes sure that concurrent
+            # processes download the container only once
+            with self._image_lock:
+                metrics = DCM2NIIX_METRICS("download")
+                with metrics.span("download"):
+                    self.image_cache.get(self.container_url, self.download_name, metrics)
+                self.download_metrics = metrics
+                self._image_ready = True
+            self._emit_metrics(metrics)
+
+    def _ensure_container_image(self) -> None:
+        """Download the container again if it has been removed from the image cache."""
+        if not self.download_container:
+            return
+        if self._image_ready and os.path.isfile(self._container_image):
+            return
+        with self._image_lock:
+            # Another thread may have downloaded it while waiting for the lock
+            if os.path.isfile(self._container_image):
+                self._image_ready = True
+                return
+            self._image_ready = False
+        self._download_container()
+
+    def _emit_metrics(self, metrics: DCM2NIIX_METRICS) -> None:
+        """
+        Pass metrics to every metrics sink.
+
+        A failing sink does not fail the conversion, its error is given as a warning instead.
+
+        Args:
+            metrics (DCM2NIIX_METRICS): The measured metrics.
+        """
+        for i_sink in self.metrics_sinks:
+            try:
+                i_sink(metrics)
+            except Exception as error:
+                warnings.warn(
+                    "Metrics sink {sink!r} failed: {error!r}".format(sink=i_sink, error=error)
                 )
 
     ######
@@ -221,28 +431,11 @@ class DCM2NIIX:
     ## Options
     #########
 
-    @property
-    def compression_level(self) -> int:
-        """
-        gz compression level (1=fastest, 9=smallest).
-
-        Corresonds with '-1' through '-9' setting of dcm2niix.
-
-        Returns:
-            int: compression level. Defaults to 6
-        """
-        return int(self.options["compression_level"])
-
-    @compression_level.setter
-    def compression_level(self, setting: Union[str, int] = 6) -> None:
-        """
-        Set the gz compression level, (1=fastest, 9=smallest)
-
-        Args:
-            setting (Union[str, int], optional): The compression level. Defaults to 6.
-        """
-        setting_name = "Compression level"
-        settings_conversion = {
+    # Every option is declared once, the declarations generate the properties
+    compression_level = DCM2NIIX_OPTION(
+        "compression_level",
+        setting_name="Compression level",
+        settings_conversion={
             0: "0",
             1: "1",
             2: "2",
@@ -253,50 +446,43 @@ class DCM2NIIX:
             7: "7",
             8: "8",
             9: "9",
-        }
-        valid_setting_types = [str, int]
-
-        valid_settings = ["0", "1", "2", "3", "4", "5", "6", "7", "8", "9"]
-
-        self._check_valid_setting_type(setting_name, valid_setting_types, type(setting))
-
-        setting = self._convert_settings(settings_conversion, setting)
-
-        self._check_valid_setting(setting_name, valid_settings, setting)
+        },
+        valid_settings=["0", "1", "2", "3", "4", "5", "6", "7", "8", "9"],
+        valid_setting_types=[str, int],
+        read=int,
+        doc="""
+        gz compression level (1=fastest, 9=smallest).
 
-        self.options["compression_level"] = setting
+        Corresonds with '-1' through '-9' setting of dcm2niix.
 
-    @property
-    def adjacent_dicoms(self) -> bool:
-        """
+        Returns:
+            int: compression level. Defaults to 6
+        """,
+    )
+
+    adjacent_dicoms = DCM2NIIX_OPTION(
+        "-a",
+        setting_name="Adjacent DICOM",
+        settings_conversion={True: "y", False: "n"},
+        valid_settings=["y", "n"],
+        valid_setting_types=[str, bool],
+        read=read_yes_no,
+        doc="""
         Whether all DICOMs are adjacent (images from same series are always in same folder).
 
         Corresponds to '-a' setting of dcm2niix.
 
         Returns:
             bool: Whether all DICOMs are in same folder. Defaults to False
-        """
-        settings_conversion = {"y": True, "n": False}
-        return self._convert_settings(settings_conversion, self.options["-a"])
-
-    @adjacent_dicoms.setter
-    def adjacent_dicoms(self, setting: Union[str, bool]) -> None:
-        settings_conversion = {True: "y", False: "n"}
-        valid_settings = ["y", "n"]
-        valid_setting_types = [str, bool]
-        setting_name = "Adjacent DICOM"
-
-        self._check_valid_setting_type(setting_name, valid_setting_types, type(setting))
-
-        setting = self._convert_settings(settings_conversion, setting)
-
-        self._check_valid_setting(setting_name, valid_settings, setting)
-
-        self.options["-a"] = setting
-
-    @property
-    def bids_sidecar(self) -> str:
-        """
+        """,
+    )
+
+    bids_sidecar = DCM2NIIX_OPTION(
+        "-b",
+        setting_name="BIDS sidecar",
+        settings_conversion={True: "y", False: "n"},
+        valid_settings=["y", "n", "o"],
+        doc="""
         Whether to generate a bids sidecar.
 
         y = yes, o = only bids sidecar, no nifti, n = no.
@@ -305,23 +491,15 @@ class DCM2NIIX:
 
         Returns:
             str: the bids sidecar setting. Defaults to y
-        """
-        return self.options["-b"]
-
-    @bids_sidecar.setter
-    def bids_sidecar(self, setting: Union[str, bool]):
-        settings_conversion = {True: "y", False: "n"}
-        valid_settings = ["y", "n", "o"]
-
-        setting = self._convert_settings(settings_conversion, setting)
-
-        self._check_valid_setting("BIDS sidecar", valid_settings, setting)
-
-        self.options["-b"] = setting
-
-    @property
-    def anonymize_bids_sidecar(self) -> str:
-        """
+        """,
+    )
+
+    anonymize_bids_sidecar = DCM2NIIX_OPTION(
+        "-ba",
+        setting_name="Anonymize BIDS sidecar",
+        settings_conversion={True: "y", False: "n"},
+        valid_settings=["y", "n"],
+        doc="""
         Whether to anonymize the bids sidecar.
 
         y = yes, n = no.
@@ -330,23 +508,13 @@ class DCM2NIIX:
 
         Returns:
             str: the bids sidecar anonymization setting. Defaults to y
-        """
-        return self.options["-ba"]
-
-    @anonymize_bids_sidecar.setter
-    def anonymize_bids_sidecar(self, setting: Union[str, bool]) -> None:
-        settings_conversion = {True: "y", False: "n"}
-        valid_settings = ["y", "n"]
+        """,
+    )
 
-        setting = self._convert_settings(settings_conversion, setting)
-
-        self._check_valid_setting("Anonymize BIDS sidecar", valid_settings, setting)
-
-        self.options["-ba"] = setting
-
-    @property
-    def comments_in_aux(self) -> str:
-        """
+    comments_in_aux = DCM2NIIX_OPTION(
+        "-c",
+        optional=True,
+        doc="""
         Whether to store comments in a NIfTI aux_file.
 
         Provide up to 24 characters, e.g. first_visit.
@@ -355,33 +523,13 @@ class DCM2NIIX:
 
         Returns:
             str: the aux setting. No default
-        """
-        if "-c" in self.options:
-            return self.options["-c"]
-        else:
-            return None
-
-    @comments_in_aux.setter
-    def comments_in_aux(self, setting: str) -> None:
-        self.options["-c"] = setting
-
-    @property
-    def directory_search_depth(self) -> str:
-        """
-        Set the directory search depth.
-
-        Value can range from 0 to 9.
-
-        Corresponds to '-d' setting of dcm2niix
-
-        Returns:
-            str: The directory search depth. Defaults to 5
-        """
-        return self.options["-d"]
+        """,
+    )
 
-    @directory_search_depth.setter
-    def directory_search_depth(self, setting: Union[str, int]) -> None:
-        settings_conversion = {
+    directory_search_depth = DCM2NIIX_OPTION(
+        "-d",
+        setting_name="Directory search depth",
+        settings_conversion={
             0: "0",
             1: "1",
             2: "2",
@@ -392,18 +540,26 @@ class DCM2NIIX:
             7: "7",
             8: "8",
             9: "9",
-        }
-        valid_settings = ["0", "1", "2", "3", "4", "5", "6", "7", "8", "9"]
-
-        setting = self._convert_settings(settings_conversion, setting)
+        },
+        valid_settings=["0", "1", "2", "3", "4", "5", "6", "7", "8", "9"],
+        doc="""
+        Set the directory search depth.
 
-        self._check_valid_setting("Directory search depth", valid_settings, setting)
+        Value can range from 0 to 9.
 
-        self.options["-d"] = setting
+        Corresponds to '-d' setting of dcm2niix
 
-    @property
-    def export_as_nrrd(self) -> str:
-        """
+        Returns:
+            str: The directory search depth. Defaults to 5
+        """,
+    )
+
+    export_as_nrrd = DCM2NIIX_OPTION(
+        "-e",
+        setting_name="Export as NRRD",
+        settings_conversion={True: "y", False: "n"},
+        valid_settings=["y", "n"],
+        doc="""
         Whether to save the file as NRRD instead of NIfTI.
 
         y = yes, n = no.
@@ -412,23 +568,12 @@ class DCM2NIIX:
 
         Returns:
             str: Whether to save as NRRD. Defaults to n.
-        """
-        return self.options["-e"]
-
-    @export_as_nrrd.setter
-    def export_as_nrrd(self, setting: Union[str, bool]) -> None:
-        settings_conversion = {True: "y", False: "n"}
-        valid_settings = ["y", "n"]
+        """,
+    )
 
-        setting = self._convert_settings(settings_conversion, setting)
-
-        self._check_valid_setting("Export as NRRD", valid_settings, setting)
-
-        self.options["-e"] = setting
-
-    @property
-    def filename(self) -> str:
-        """
+    filename = DCM2NIIX_OPTION(
+        "-f",
+        doc="""
         The filename used to save the file.
 
         The following parameters can be used and will be replaced in the string:
@@ -458,351 +603,1865 @@ class DCM2NIIX:
 
         Returns:
             str: The filename. Defaults to %f_%p_%t_%s
-        """
-        return self.options["-f"]
-
-    @filename.setter
-    def filename(self, setting: str) -> None:
-        self.options["-f"] = setting
+        """,
+    )
+
+    generate_defaults = DCM2NIIX_OPTION(
+        "-g",
+        setting_name="Generate defaults",
+        settings_conversion={True: "y", False: "n"},
+        valid_settings=["y", "n", "o", "i"],
+        doc="generate defaults file (y/n/o/i [o=only: reset and write defaults; i=ignore: reset defaults], default n)",
+    )
+
+    ignore_derived = DCM2NIIX_OPTION(
+        "-i",
+        setting_name="Ignore derived",
+        settings_conversion={True: "y", False: "n"},
+        valid_settings=["y", "n"],
+        doc="ignore derived, localizer and 2D images (y/n, default n)",
+    )
+
+    losslessly_scale = DCM2NIIX_OPTION(
+        "-l",
+        setting_name="Losslessly scale",
+        settings_conversion={True: "y", False: "n"},
+        valid_settings=["y", "n", "o"],
+        doc="losslessly scale 16-bit integers to use dynamic range (y/n/o [yes=scale, no=no, but uint16->int16, o=original], default n)",
+    )
+
+    merge_2d_slices = DCM2NIIX_OPTION(
+        "-m",
+        setting_name="Merge 2D slices",
+        settings_conversion={True: "y", False: "n", 0: "0", 1: "1", 2: "2", "auto": "2"},
+        valid_settings=["y", "n", "0", "1", "2"],
+        doc="merge 2D slices from same series regardless of echo, exposure, etc. (n/y or 0/1/2, default 2) [no, yes, auto]",
+    )
+
+    convert_only_this_crc = DCM2NIIX_OPTION(
+        "-n",
+        optional=True,
+        doc="only convert this series CRC number - can be used up to 16 times (default convert all)",
+    )
 
     @property
-    def generate_defaults(self) -> str:
-        "generate defaults file (y/n/o/i [o=only: reset and write defaults; i=ignore: reset defaults], default n)"
-        return self.options["-g"]
-
-    @generate_defaults.setter
-    def generate_defaults(self, setting) -> str:
-        settings_conversion = {True: "y", False: "n"}
-        valid_settings = ["y", "n", "o", "i"]
+    def output_directory(self) -> None:
+        "output directory (omit to save to input folder)"
+        if "-o" in self.options:
+            return self.options["-o"]
+        else:
+            return None
 
-        setting = self._convert_settings(settings_conversion, setting)
+    @output_directory.setter
+    def output_directory(self, setting: str) -> None:
+        if not os.path.exists(setting):
+            os.makedirs(setting)
+        self._set_option("-o", setting)
+
+    philips_precise_float_scaling = DCM2NIIX_OPTION(
+        "-p",
+        setting_name="Philips precise float scaling",
+        settings_conversion={True: "y", False: "n"},
+        valid_settings=["y", "n"],
+        doc="Philips precise float (not display) scaling (y/n, default y)",
+    )
+
+    rename = DCM2NIIX_OPTION(
+        "-r",
+        setting_name="Rename",
+        settings_conversion={True: "y", False: "n"},
+        valid_settings=["y", "n"],
+        doc="rename instead of convert DICOMs (y/n, default n)",
+    )
+
+    single_file_mode = DCM2NIIX_OPTION(
+        "-s",
+        setting_name="Single file mode",
+        settings_conversion={True: "y", False: "n"},
+        valid_settings=["y", "n"],
+        doc="single file mode, do not convert other images in folder (y/n, default n)",
+    )
+
+    private_text_notes = DCM2NIIX_OPTION(
+        "-t",
+        setting_name="Private text notes",
+        settings_conversion={True: "y", False: "n"},
+        valid_settings=["y", "n"],
+        doc="text notes includes private patient details (y/n, default n)",
+    )
+
+    verbose = DCM2NIIX_OPTION(
+        "-v",
+        setting_name="Verbose",
+        settings_conversion={True: "y", False: "n", 0: "0", 1: "1", 2: "2"},
+        valid_settings=["y", "n", "0", "1", "2"],
+        doc="verbose (n/y or 0/1/2, default 0) [no, yes, logorrheic]",
+    )
+
+    conflict_write_behavior = DCM2NIIX_OPTION(
+        "-w",
+        setting_name="Conflict write behavior",
+        settings_conversion={0: "0", 1: "1", 2: "2"},
+        valid_settings=["0", "1", "2"],
+        doc="write behavior for name conflicts (0,1,2, default 2: 0=skip duplicates, 1=overwrite, 2=add suffix)",
+    )
+
+    crop_3D = DCM2NIIX_OPTION(
+        "-x",
+        setting_name="Crop 3D acquisitions",
+        settings_conversion={True: "y", False: "n"},
+        valid_settings=["y", "n", "o"],
+        doc="crop 3D acquisitions (y/n/i, default n, use 'i'gnore to neither crop nor rotate 3D acquistions)",
+    )
+
+    compress = DCM2NIIX_OPTION(
+        "-z",
+        setting_name="Compression",
+        settings_conversion={True: "y", False: "n", 3: "3"},
+        valid_settings=["y", "o", "i", "n", "3"],
+    )
+
+    byte_order = DCM2NIIX_OPTION(
+        "--big-endian",
+        setting_name="Byte order",
+        settings_conversion={True: "y", False: "n"},
+        valid_settings=["y", "n", "o"],
+    )
+
+    progress = DCM2NIIX_OPTION(
+        "--progress",
+        setting_name="Progress",
+        settings_conversion={True: "y", False: "n"},
+        valid_settings=["y", "n"],
+    )
+
+    terse = DCM2NIIX_OPTION("terse", setting_name="Terse", valid_settings=[True, False])
+
+    def _set_option(self, key: str, setting) -> None:
+        """
+        Store the value of an option, by replacing the options with a copy that has the value.
 
-        self._check_valid_setting("Generate defaults", valid_settings, setting)
+        Conversions that have already read the options keep using the options they read, and the
+        cached arguments are rebuilt as they no longer belong to the current options.
 
-        self.options["-g"] = setting
+        Args:
+            key (str): Key of the option in ``options``.
+            setting: The converted and validated value.
+        """
+        with self._options_lock:
+            options = dict(self.options)
+            options[key] = setting
+            self.options = options
 
-    @property
-    def ignore_derived(self) -> str:
-        "ignore derived, localizer and 2D images (y/n, default n)"
-        return self.options["-i"]
+    def _option_overrides(self, options: Dict[str, object]) -> Dict[str, str]:
+        """
+        Check options that are used for a single conversion instead of the options of this object.
 
-    @ignore_derived.setter
-    def ignore_derived(self, setting) -> None:
-        settings_conversion = {True: "y", False: "n"}
-        valid_settings = ["y", "n"]
+        Args:
+            options (Dict[str, object]): The settings by option name, e.g. {"filename": "%p_%s"}.
 
-        setting = self._convert_settings(settings_conversion, setting)
+        Raises:
+            ValueError: If an option does not exist, or a setting is not valid.
 
-        self._check_valid_setting("Ignore derived", valid_settings, setting)
+        Returns:
+            Dict[str, str]: The values by key in ``options``.
+        """
+        overrides = {}
+        for i_name, i_setting in options.items():
+            option = getattr(type(self), i_name, None)
+            if not isinstance(option, DCM2NIIX_OPTION):
+                raise ValueError(
+                    "'{name}' is not an option that can be set for a single conversion".format(
+                        name=i_name
+                    )
+                )
+            overrides[option.key] = option.validate(self, i_setting)
+        return overrides
 
-        self.options["-i"] = setting
+    def _convert_options_to_arg_list(
+        self, overrides: Dict[str, str] = None, options: Dict[str, str] = None
+    ) -> list:
+        """
+        Build the dcm2niix arguments from the options.
 
-    @property
-    def losslessly_scale(self) -> str:
-        "losslessly scale 16-bit integers to use dynamic range (y/n/o [yes=scale, no=no, but uint16->int16, o=original], default n)"
-        return self.options["-l"]
+        Args:
+            overrides (Dict[str, str], optional): Values to use instead of the options, by key in ``options``, as made by _option_overrides. Defaults to None.
+            options (Dict[str, str], optional): The options, as read from ``options`` before. Defaults to None, in which case the current options are used.
 
-    @losslessly_scale.setter
-    def losslessly_scale(self, setting) -> None:
-        settings_conversion = {True: "y", False: "n"}
-        valid_settings = ["y", "n", "o"]
+        Returns:
+            list: The dcm2niix arguments, without input and output.
+        """
+        if options is None:
+            options = self.options
+        if overrides:
+            # The options of this object are not changed, overrides are applied to a copy
+            return list(self._build_arg_list({**options, **overrides}))
+
+        # The arguments are built once for every version of the options
+        cached_arg_list = self._arg_list
+        if cached_arg_list is not None and cached_arg_list[0] is options:
+            return list(cached_arg_list[1])
+        arg_list = self._build_arg_list(options)
+        self._arg_list = (options, arg_list)
+        return list(arg_list)
+
+    @staticmethod
+    def _build_arg_list(options: Dict[str, str]) -> Tuple[str, ...]:
+        arg_list = []
+        for i_key, i_val in options.items():
+            if i_key[0] == "-":
+                arg_list.append(i_key)
+                arg_list.append(i_val)
+            elif i_key == "compression_level":
+                arg_list.append("-" + i_val)
+            elif i_key == "terse" and i_val:
+                arg_list.append("--terse")
+        return tuple(arg_list)
 
-        setting = self._convert_settings(settings_conversion, setting)
+    def convert(
+        self,
+        input_path: str,
+        output_path: str = None,
+        options: Dict[str, object] = None,
+        limits: DCM2NIIX_LIMITS = None,
+    ) -> "DCM2NIIX_OUTPUT":
+        """
+        Convert a DICOM folder.
 
-        self._check_valid_setting("Losslessly scale", valid_settings, setting)
+        Options given for the conversion are used instead of the options of this object, without
+        changing them, so a single object can be used by multiple threads with different options::
 
-        self.options["-l"] = setting
+            dcm2niix.convert("/path/to/dicom/folder", options={"filename": "%p_%s", "compress": "y"})
 
-    @property
-    def merge_2d_slices(self) -> str:
-        "merge 2D slices from same series regardless of echo, exposure, etc. (n/y or 0/1/2, default 2) [no, yes, auto]"
-        return self.options["-m"]
+        Args:
+            input_path (str): The DICOM folder to convert.
+            output_path (str, optional): The output folder. Defaults to None, in which case the ``output_directory`` option, or else the input folder, is used.
+            options (Dict[str, object], optional): Settings by option name, used for this conversion only. Defaults to None.
+            limits (DCM2NIIX_LIMITS, optional): Resource limits of the conversion. Defaults to None.
 
-    @merge_2d_slices.setter
-    def merge_2d_slices(self, setting) -> None:
-        settings_conversion = {True: "y", False: "n", 0: "0", 1: "1", 2: "2", "auto": "2"}
-        valid_settings = ["y", "n", "0", "1", "2"]
+        Raises:
+            ValueError: If an option does not exist or a setting is not valid, or if both the output path and the ``output_directory`` option are given.
 
-        setting = self._convert_settings(settings_conversion, setting)
+        Returns:
+            DCM2NIIX_OUTPUT: The output of the conversion.
+        """
+        option_overrides = None
+        if options:
+            options = dict(options)
+            output_directory = options.pop("output_directory", None)
+            if output_directory is not None:
+                if output_path is not None:
+                    raise ValueError(
+                        "Pass either an output path or the output_directory option, not both"
+                    )
+                os.makedirs(output_directory, exist_ok=True)
+                output_path = output_directory
+            option_overrides = self._option_overrides(options)
 
-        self._check_valid_setting("Merge 2D slices", valid_settings, setting)
+        if output_path is None:
+            output_path = input_path
 
-        self.options["-m"] = setting
+        return self._convert(
+            input_path, output_path, limits=limits, option_overrides=option_overrides
+        )
 
-    @property
-    def convert_only_this_crc(self) -> str:
-        "only convert this series CRC number - can be used up to 16 times (default convert all)"
-        if "-n" in self.options:
-            return self.options["-n"]
-        else:
-            return None
+    def _convert(
+        self,
+        input_path: str,
+        output_path: str,
+        argument_overrides: Dict[str, str] = None,
+        use_cache: bool = True,
+        limits: DCM2NIIX_LIMITS = None,
+        option_overrides: Dict[str, str] = None,
+    ) -> "DCM2NIIX_OUTPUT":
+        """
+        Convert a DICOM folder.
 
-    @convert_only_this_crc.setter
-    def convert_only_this_crc(self, setting) -> None:
-        self.options["-n"] = setting
+        Args:
+            input_path (str): The DICOM folder to convert.
+            output_path (str): The output folder.
+            argument_overrides (Dict[str, str], optional): Values of dcm2niix arguments to use instead of the settings, e.g. {"-z": "n"}. Defaults to None.
+            use_cache (bool, optional): Whether to use the cache, if it is set. Defaults to True.
+            limits (DCM2NIIX_LIMITS, optional): Resource limits of the conversion, limits that are not set are taken from ``limits``. Defaults to None.
+            option_overrides (Dict[str, str], optional): Option values to use instead of the options, as made by _option_overrides. Defaults to None.
 
-    @property
-    def output_directory(self) -> None:
-        "output directory (omit to save to input folder)"
-        if "-o" in self.options:
-            return self.options["-o"]
+        Returns:
+            DCM2NIIX_OUTPUT: The output of the conversion.
+        """
+        metrics = DCM2NIIX_METRICS("convert")
+        start_time = time.perf_counter()
+
+        # Read the options once, so that the conversion is not affected by options that change
+        options = self.options
+        arg_list = self._convert_options_to_arg_list(option_overrides, options)
+        for i_argument, i_value in (argument_overrides or {}).items():
+            arg_list = self._replace_argument(arg_list, i_argument, i_value)
+        output_info = self._make_output_info(arg_list)
+
+        use_cache = use_cache and self.cache is not None
+        if use_cache:
+            with metrics.span("cache_lookup"):
+                cache_key = self.cache.key(input_path, output_path, arg_list, self.version)
+                cached_output_info = self.cache.get(cache_key, output_path)
+            if cached_output_info is not None:
+                metrics.count("cache_hits")
+                return self._finish_metrics(metrics, start_time, cached_output_info, input_path)
+
+        # Let dcm2niix write uncompressed images, which are compressed by the compressor instead.
+        # Only NIfTI images are compressed by the compressor, dcm2niix compresses NRRD images itself.
+        post_compress = self.compressor is not None and output_info.extension == ".nii.gz"
+        if post_compress:
+            arg_list = self._replace_argument(arg_list, "-z", "n")
+
+        limits = self.limits if limits is None else limits.with_defaults(self.limits)
+
+        if self.admission is not None:
+            with metrics.span("admission"):
+                input_size = self.admission.input_size(input_path)
+            admission = self._admit(self.admission, input_size, metrics)
         else:
-            return None
-
-    @output_directory.setter
-    def output_directory(self, setting: str) -> None:
-        if not os.path.exists(setting):
-            os.makedirs(setting)
-        self.options["-o"] = setting
+            admission = contextlib.nullcontext()
+
+        if self.staging is not None:
+            staging = self.staging.stage(
+                input_path,
+                output_path,
+                metrics,
+                int(self._argument_value(arg_list, "-w") or 2),
+            )
+        else:
+            staging = contextlib.nullcontext()
 
-    @property
-    def philips_precise_float_scaling(self) -> str:
-        "Philips precise float (not display) scaling (y/n, default y)"
-        return self.options["-p"]
+        # Wait for admission before staging, so that waiting conversions do not use scratch space
+        with admission, staging as staged_paths:
+            if staged_paths is not None:
+                run_input_path, run_output_path = staged_paths
+            else:
+                run_input_path, run_output_path = input_path, output_path
 
-    @philips_precise_float_scaling.setter
-    def philips_precise_float_scaling(self, setting: Union[str, bool]) -> None:
-        settings_conversion = {True: "y", False: "n"}
-        valid_settings = ["y", "n"]
+            output, reported_output_path = self._start_dcm2niix(
+                arg_list, run_input_path, run_output_path, metrics, limits
+            )
+            output_info.parse_output(output, metrics)
+        output_info.set_output_folder(reported_output_path, output_path)
 
-        setting = self._convert_settings(settings_conversion, setting)
+        if post_compress:
+            output_info.metrics = metrics
+            compression_level = int(
+                (option_overrides or {}).get("compression_level", options["compression_level"])
+            )
+            # The metrics are finished when the images are compressed, so that they include the
+            # compression and the compressed images
+            output_info._compression = self.compressor.submit(
+                output_info,
+                compression_level,
+                functools.partial(self._finish_metrics, metrics, start_time, input_path=input_path),
+            )
 
-        self._check_valid_setting("Philips precise float scaling", valid_settings, setting)
+        if use_cache:
+            # The compressed images are stored in the cache
+            output_info.wait()
+            with metrics.span("cache_store"):
+                self.cache.put(cache_key, input_path, output_path, output_info)
 
-        self.options["-p"] = setting
+        if post_compress:
+            return output_info
+        return self._finish_metrics(metrics, start_time, output_info, input_path)
 
-    @property
-    def rename(self) -> str:
-        "rename instead of convert DICOMs (y/n, default n)"
-        return self.options["-r"]
+    def _start_dcm2niix(
+        self,
+        arg_list: list,
+        input_path: str,
+        output_path: str,
+        metrics: DCM2NIIX_METRICS = None,
+        limits: DCM2NIIX_LIMITS = None,
+    ) -> Tuple[Iterable[str], str]:
+        """
+        Start dcm2niix with the current backend.
 
-    @rename.setter
-    def rename(self, setting: Union[str, bool]) -> None:
-        settings_conversion = {True: "y", False: "n"}
-        valid_settings = ["y", "n"]
+        A running session is started with the ``limits`` of this object, so conversions in a
+        session are not started with their own limits.
 
-        setting = self._convert_settings(settings_conversion, setting)
+        Args:
+            arg_list (list): The dcm2niix options, without input and output.
+            input_path (str): The DICOM folder to convert.
+            output_path (str): The output folder.
+            metrics (DCM2NIIX_METRICS, optional): Metrics to record the run in, when it is not streamed. Defaults to None.
+            limits (DCM2NIIX_LIMITS, optional): Resource limits of the conversion. Defaults to None.
 
-        self._check_valid_setting("Rename", valid_settings, setting)
+        Returns:
+            Tuple[Iterable[str], str]: The output lines of dcm2niix, and the output folder as passed to dcm2niix.
+        """
+        if self.container_backend == self.NATIVE_KEYWORD:
+            command_line_args = [*arg_list, "-o", output_path, input_path]
+            return self._run_native(command_line_args, limits), output_path
+
+        if self._session is not None and self._session.can_convert(input_path, output_path):
+            # The session runs dcm2niix to completion before returning the output
+            if metrics is not None:
+                with metrics.span("dcm2niix"):
+                    output = self._session.run(arg_list, input_path, output_path)
+            else:
+                output = self._session.run(arg_list, input_path, output_path)
+            return output, self._session.container_output_path(output_path)
+
+        command_line_args = [
+            *arg_list,
+            "-o",
+            self.CONTAINER_OUTPUT_PATH,
+            self.CONTAINER_INPUT_PATH,
+        ]
+        bindings = self._make_input_output_binding(input_path, output_path)
+        return (
+            self._run_container(command_line_args, bindings, limits),
+            self.CONTAINER_OUTPUT_PATH,
+        )
+
+    @staticmethod
+    @contextlib.contextmanager
+    def _admit(
+        admission: DCM2NIIX_ADMISSION, input_size: int, metrics: DCM2NIIX_METRICS
+    ) -> Iterator[None]:
+        """
+        Wait for admission of a conversion, recording the time that was waited.
 
-        self.options["-r"] = setting
+        Args:
+            admission (DCM2NIIX_ADMISSION): The admission control.
+            input_size (int): Input size of the conversion in bytes.
+            metrics (DCM2NIIX_METRICS): Metrics to record the waiting time in.
+        """
+        start_time = time.perf_counter()
+        with admission.admit(input_size):
+            metrics.add_time("admission_wait", time.perf_counter() - start_time)
+            yield
 
-    @property
-    def single_file_mode(self) -> str:
-        "single file mode, do not convert other images in folder (y/n, default n)"
-        return self.options["-s"]
+    @staticmethod
+    def _argument_value(arg_list: list, argument: str) -> Optional[str]:
+        """
+        Get the value of an argument in an argument list.
 
-    @single_file_mode.setter
-    def single_file_mode(self, setting: Union[str, bool]) -> None:
-        settings_conversion = {True: "y", False: "n"}
-        valid_settings = ["y", "n"]
+        Args:
+            arg_list (list): The arguments, as made by _convert_options_to_arg_list.
+            argument (str): The argument, e.g. "-z".
 
-        setting = self._convert_settings(settings_conversion, setting)
+        Returns:
+            Optional[str]: The value, or None if the argument is not in the list.
+        """
+        if argument not in arg_list:
+            return None
+        return arg_list[arg_list.index(argument) + 1]
 
-        self._check_valid_setting("Single file mode", valid_settings, setting)
+    @staticmethod
+    def _replace_argument(arg_list: list, argument: str, value: str) -> list:
+        """
+        Replace the value of an argument in an argument list.
 
-        self.options["-s"] = setting
+        Args:
+            arg_list (list): The arguments, as made by _convert_options_to_arg_list.
+            argument (str): The argument of which to replace the value, e.g. "-z".
+            value (str): The new value.
 
-    @property
-    def private_text_notes(self) -> str:
-        "text notes includes private patient details (y/n, default n)"
-        return self.options["-t"]
+        Returns:
+            list: A copy of the arguments with the value replaced.
+        """
+        arg_list = list(arg_list)
+        arg_list[arg_list.index(argument) + 1] = value
+        return arg_list
 
-    @private_text_notes.setter
-    def private_text_notes(self, setting: Union[str, bool]) -> None:
-        settings_conversion = {True: "y", False: "n"}
-        valid_settings = ["y", "n"]
+    def _finish_metrics(
+        self,
+        metrics: DCM2NIIX_METRICS,
+        start_time: float,
+        output_info: "DCM2NIIX_OUTPUT",
+        input_path: str,
+    ) -> "DCM2NIIX_OUTPUT":
+        """
+        Count the results of a conversion, attach the metrics to the output and emit them.
 
-        setting = self._convert_settings(settings_conversion, setting)
+        The size of the input folder is only determined when there are metrics sinks, as it
+        requires walking the input folder.
 
-        self._check_valid_setting("Private text notes", valid_settings, setting)
+        Args:
+            metrics (DCM2NIIX_METRICS): The metrics of the conversion.
+            start_time (float): The time at which the conversion started.
+            output_info (DCM2NIIX_OUTPUT): The output of the conversion.
+            input_path (str): The DICOM folder that was converted.
 
-        self.options["-t"] = setting
+        Returns:
+            DCM2NIIX_OUTPUT: The output, with the metrics set.
+        """
+        metrics.count("n_dicoms", output_info.n_dicoms or 0)
+        metrics.count("n_series", len(output_info.series))
+        metrics.count("n_warnings", len(output_info.warnings))
+        metrics.count("n_errors", len(output_info.errors))
+
+        bytes_out = 0
+        for i_series in output_info.series:
+            for i_file in [i_series.output_path, i_series.sidecar_path]:
+                if i_file is not None and os.path.isfile(i_file):
+                    bytes_out += os.path.getsize(i_file)
+        metrics.count("bytes_out", bytes_out)
+
+        if self.metrics_sinks:
+            bytes_in = 0
+            for i_root, _, i_files in os.walk(input_path):
+                for i_file in i_files:
+                    bytes_in += os.path.getsize(os.path.join(i_root, i_file))
+            metrics.count("bytes_in", bytes_in)
+
+        metrics.add_time("total", time.perf_counter() - start_time)
+        output_info.metrics = metrics
+        self._emit_metrics(metrics)
+        return output_info
 
-    @property
-    def verbose(self) -> str:
-        "verbose (n/y or 0/1/2, default 0) [no, yes, logorrheic]"
-        return self.options["-v"]
+    def iter_convert(self, input_path: str, output_path: str = None) -> Iterator["DCM2NIIX_SERIES"]:
+        """
+        Convert a DICOM folder, yielding every series as soon as it has been written.
 
-    @verbose.setter
-    def verbose(self, setting: Union[str, bool, int]) -> None:
-        settings_conversion = {True: "y", False: "n", 0: "0", 1: "1", 2: "2"}
-        valid_settings = ["y", "n", "0", "1", "2"]
+        dcm2niix reports a series before writing it, so a series is yielded when dcm2niix writes
+        its next line of output or exits. This allows processing the first series while the other
+        series are still being converted.
 
-        setting = self._convert_settings(settings_conversion, setting)
+        For example::
 
-        self._check_valid_setting("Verbose", valid_settings, setting)
+            for series in dcm2niix.iter_convert("/path/to/dicom/folder", "/path/to/output"):
+                print(series.output_path)
 
-        self.options["-v"] = setting
+        The cache, staging and compressor are not used. Within a session, the series are only
+        yielded when dcm2niix has finished. When iterating is stopped early, dcm2niix is stopped,
+        including the container it runs in; within a session, dcm2niix has already finished.
 
-    @property
-    def conflict_write_behavior(self) -> str:
-        "write behavior for name conflicts (0,1,2, default 2: 0=skip duplicates, 1=overwrite, 2=add suffix)"
-        return self.options["-w"]
+        Args:
+            input_path (str): The DICOM folder to convert.
+            output_path (str, optional): The output folder. Defaults to None, in which case the input folder is used.
 
-    @conflict_write_behavior.setter
-    def conflict_write_behavior(self, setting: Union[str, int]) -> None:
-        settings_conversion = {0: "0", 1: "1", 2: "2"}
-        valid_settings = ["0", "1", "2"]
+        Raises:
+            subprocess.CalledProcessError: If dcm2niix exits with an error.
 
-        setting = self._convert_settings(settings_conversion, setting)
+        Yields:
+            DCM2NIIX_SERIES: The converted series, with the paths in the output folder.
+        """
+        if output_path is None:
+            output_path = input_path
 
-        self._check_valid_setting("Conflict write behavior", valid_settings, setting)
+        arg_list = self._convert_options_to_arg_list()
+        output_info = self._make_output_info(arg_list)
+        if self.container_backend == self.NATIVE_KEYWORD:
+            output = self._stream_command(
+                self._make_command(arg_list, input_path, output_path), self.limits
+            )
+            reported_output_path = output_path
+        elif self._session is not None and self._session.can_convert(input_path, output_path):
+            output, reported_output_path = self._start_dcm2niix(
+                arg_list, input_path, output_path, limits=self.limits
+            )
+        else:
+            # The container is run with its command line, so that it can be stopped
+            output = self._stream_command(
+                self._make_command(arg_list, input_path, output_path, self.limits)
+            )
+            reported_output_path = self.CONTAINER_OUTPUT_PATH
+
+        try:
+            written_series = None
+            for i_line in output:
+                if written_series is not None:
+                    yield written_series
+                    written_series = None
+                event = output_info.parse_line(i_line)
+                if event is not None and event.kind == DCM2NIIX_EVENT.CONVERTED:
+                    written_series = event.series
+                    output_info.set_series_output_folder(
+                        written_series, reported_output_path, output_path
+                    )
+            if written_series is not None:
+                yield written_series
+        finally:
+            # Stops dcm2niix if the output was not read to the end
+            if hasattr(output, "close"):
+                output.close()
+
+    @contextlib.contextmanager
+    def convert_in_memory(
+        self, input_path: str, temporary_folder: str = None
+    ) -> Iterator["DCM2NIIX_OUTPUT"]:
+        """
+        Convert a DICOM folder, giving access to the images as memory-mapped arrays.
 
-        self.options["-w"] = setting
+        dcm2niix writes uncompressed NIfTI files to a temporary folder, which is removed when the
+        context exits. The ``image`` of every series gives lazy access to the header, affine,
+        shape, data and sidecar, so that the images do not have to be decompressed and read again.
 
-    @property
-    def crop_3D(self) -> str:
-        "crop 3D acquisitions (y/n/i, default n, use 'i'gnore to neither crop nor rotate 3D acquistions)"
-        return self.options["-x"]
+        For example::
 
-    @crop_3D.setter
-    def crop_3D(self, setting: Union[str, bool]) -> None:
-        settings_conversion = {True: "y", False: "n"}
-        valid_settings = ["y", "n", "o"]
+            with dcm2niix.convert_in_memory("/path/to/dicom/folder", "/dev/shm") as output:
+                data = output.series[0].image.data
 
-        setting = self._convert_settings(settings_conversion, setting)
+        Use the data within the context, and copy the arrays that are needed afterwards.
 
-        self._check_valid_setting("Crop 3D acquisitions", valid_settings, setting)
+        Args:
+            input_path (str): The DICOM folder to convert.
+            temporary_folder (str, optional): Folder in which the temporary folder is made, e.g. a tmpfs. Defaults to None, in which case the default temporary folder is used.
 
-        self.options["-x"] = setting
+        Yields:
+            DCM2NIIX_OUTPUT: The output of the conversion, with the ``image`` of every series set.
+        """
+        from dcm2niixpy.image import DCM2NIIX_IMAGE
+
+        argument_overrides = {"-z": "n", "-e": "n"}
+        if self.bids_sidecar == "o":
+            # The images are needed, also when only sidecars would be written
+            argument_overrides["-b"] = "y"
+        output_path = tempfile.mkdtemp(prefix="dcm2niixpy_", dir=temporary_folder)
+        try:
+            output_info = self._convert(
+                input_path, output_path, argument_overrides, use_cache=False
+            )
+            for i_series in output_info.series:
+                i_series.image = DCM2NIIX_IMAGE(i_series.output_path, i_series.sidecar_path)
+            yield output_info
+        finally:
+            shutil.rmtree(output_path, ignore_errors=True)
+
+    async def aconvert(
+        self, input_path: str, output_path: str = None
+    ) -> AsyncIterator["DCM2NIIX_EVENT"]:
+        """
+        Convert a DICOM folder asynchronously, yielding events while dcm2niix is running.
 
-    @property
-    def compress(self) -> str:
-        return self.options["-z"]
+        Every line that dcm2niix outputs is parsed as soon as it is written. For converted series,
+        warnings and progress (when ``progress`` is enabled) an event is yielded. When dcm2niix
+        has finished a final event of kind "finished" is yielded, which contains the complete
+        :py:class:`DCM2NIIX_OUTPUT` as ``output``.
 
-    @compress.setter
-    def compress(self, setting: Union[bool, str, int]) -> None:
-        settings_conversion = {True: "y", False: "n", 3: "3"}
-        valid_settings = ["y", "o", "i", "n", "3"]
+        For example::
 
-        setting = self._convert_settings(settings_conversion, setting)
+            async for event in dcm2niix.aconvert("/path/to/dicom/folder"):
+                print(event.kind)
 
-        self._check_valid_setting("Compression", valid_settings, setting)
+        Args:
+            input_path (str): The DICOM folder to convert.
+            output_path (str, optional): The output folder. Defaults to None, in which case the input folder is used.
 
-        self.options["-z"] = setting
+        Raises:
+            subprocess.CalledProcessError: If dcm2niix exits with an error.
 
-    @property
-    def byte_order(self) -> str:
-        return self.options["--big-endian"]
+        Yields:
+            DCM2NIIX_EVENT: The parsed events.
+        """
+        if output_path is None:
+            output_path = input_path
 
-    @byte_order.setter
-    def byte_order(self, setting: Union[bool, str]) -> None:
-        settings_conversion = {True: "y", False: "n"}
-        valid_settings = ["y", "n", "o"]
+        import asyncio
 
-        setting = self._convert_settings(settings_conversion, setting)
+        # A removed container image is downloaded in a thread, so that the event loop is not blocked
+        await asyncio.get_running_loop().run_in_executor(None, self._ensure_container_image)
 
-        self._check_valid_setting("Byte order", valid_settings, setting)
+        arg_list = self._convert_options_to_arg_list()
+        command = self._make_command(arg_list, input_path, output_path, self.limits)
+
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+        )
+        if self.limits is not None and self.container_backend == self.NATIVE_KEYWORD:
+            self.limits.apply_to_process(process.pid)
+        output_info = self._make_output_info(arg_list)
+        try:
+            async for i_line in process.stdout:
+                event = output_info.parse_line(i_line.decode(errors="replace"))
+                if event is not None:
+                    yield event
+            return_code = await process.wait()
+        finally:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+
+        if return_code != 0:
+            raise subprocess.CalledProcessError(return_code, command)
+
+        if self.container_backend == self.NATIVE_KEYWORD:
+            output_info.set_output_folder(output_path, output_path)
+        else:
+            output_info.set_output_folder(self.CONTAINER_OUTPUT_PATH, output_path)
+        yield DCM2NIIX_EVENT(DCM2NIIX_EVENT.FINISHED, "", output=output_info)
 
-        self.options["--big-endian"] = setting
+    def _make_output_info(self, arg_list: list = None) -> "DCM2NIIX_OUTPUT":
+        """
+        Make the output object that parses the dcm2niix output.
 
-    @property
-    def progress(self) -> str:
-        return self.options["--progress"]
+        Args:
+            arg_list (list, optional): The dcm2niix arguments that are used. Defaults to None, in which case the current settings are used.
 
-    @progress.setter
-    def progress(self, setting: Union[bool, str]) -> None:
-        settings_conversion = {True: "y", False: "n"}
-        valid_settings = ["y", "n"]
+        Returns:
+            DCM2NIIX_OUTPUT: The output object.
+        """
+        if arg_list is None:
+            arg_list = self._convert_options_to_arg_list()
+
+        if self._argument_value(arg_list, "-b") == "o":
+            # Only the sidecars are written
+            extension = None
+        elif self._argument_value(arg_list, "-e") == "y":
+            extension = ".nrrd"
+        elif self._argument_value(arg_list, "-z") in ["n", "3"]:
+            # "3" writes uncompressed 3D images
+            extension = ".nii"
+        else:
+            extension = ".nii.gz"
 
-        setting = self._convert_settings(settings_conversion, setting)
+        if self._argument_value(arg_list, "-b") == "n":
+            sidecar_extension = None
+        else:
+            sidecar_extension = ".json"
 
-        self._check_valid_setting("Progress", valid_settings, setting)
+        return DCM2NIIX_OUTPUT(extension=extension, sidecar_extension=sidecar_extension)
 
-        self.options["--progress"] = setting
+    def _make_command(
+        self, arg_list: list, input_path: str, output_path: str, limits: DCM2NIIX_LIMITS = None
+    ) -> list:
+        """
+        Make the complete command to run dcm2niix with the current backend.
 
-    @property
-    def terse(self) -> str:
-        return self.options["terse"]
+        Args:
+            arg_list (list): The dcm2niix options, without input and output.
+            input_path (str): The DICOM folder to convert.
+            output_path (str): The output folder.
+            limits (DCM2NIIX_LIMITS, optional): Resource limits of the container, not used for the native backend. Defaults to None.
 
-    @terse.setter
-    def terse(self, setting: bool) -> None:
-        valid_settings = [True, False]
-        self._check_valid_setting("Terse", valid_settings, setting)
-        self.options["terse"] = setting
+        Returns:
+            list: The command, including the container runtime.
+        """
+        if self.container_backend == self.NATIVE_KEYWORD:
+            return [self.executable, *arg_list, "-o", output_path, input_path]
+
+        command_line_args = [
+            *arg_list,
+            "-o",
+            self.CONTAINER_OUTPUT_PATH,
+            self.CONTAINER_INPUT_PATH,
+        ]
+        bindings = self._make_input_output_binding(input_path, output_path)
+        limit_options = limits.container_options() if limits is not None else []
+        if self.container_backend == self.DOCKER_KEYWORD:
+            command = [self.DOCKER_KEYWORD, "run", "--rm", *limit_options]
+            for i_binding in bindings:
+                command.extend(["--volume", i_binding])
+            return [*command, self.container_url, *command_line_args]
+        else:
+            self._ensure_container_image()
+            command = [self.SINGULARITY_KEYWORD, "run", *limit_options]
+            for i_binding in bindings:
+                command.extend(["--bind", i_binding])
+            return [*command, self._container_image, *command_line_args]
 
-    def _convert_options_to_arg_list(self) -> list:
-        arg_list = []
-        for i_key, i_val in self.options.items():
-            if i_key[0] == "-":
-                arg_list.append(i_key)
-                arg_list.append(i_val)
-            elif i_key == "compression_level":
-                arg_list.append("-" + i_val)
-            elif i_key == "terse" and i_val:
-                arg_list.append("--terse")
+    def convert_many(
+        self,
+        input_paths: List[str],
+        output_paths: List[str] = None,
+        max_workers: int = None,
+        batch_size: int = None,
+        options: Dict[str, object] = None,
+    ) -> List["DCM2NIIX_OUTPUT"]:
+        """
+        Convert multiple DICOM folders in parallel.
 
-        return arg_list
+        Every input is converted by a separate call to :py:meth:`convert`, which are spread out
+        over a pool of workers. A failing conversion does not affect the other conversions, instead
+        the exception is stored in the ``error`` attribute of the output of that input.
 
-    def convert(self, input_path: str, output_path: str = None, options: list = None):
-        if output_path is None:
-            output_path = input_path
-        if options is None:
-            options = []
+        When ``scheduler`` is set, the conversions are started from the longest to the shortest
+        estimated duration, and their durations are recorded to improve later estimates.
 
-        arg_list = self._convert_options_to_arg_list()
+        With a batch size, the inputs are converted in batches, and every batch is converted by a
+        single run of the container instead of a container run for every input. This is faster
+        for many small inputs, for which starting the container takes longer than converting.
+        Batches are converted with the options and ``limits`` of this object only, the
+        ``cache``, ``staging``, ``compressor``, ``admission`` and ``scheduler`` are not used.
 
-        command_line_args = [*arg_list, "-o", "/output", "/input"]
+        Args:
+            input_paths (List[str]): The DICOM folders to convert.
+            output_paths (List[str], optional): The output folder for every input. Defaults to None, in which case the output is saved in the input folder.
+            max_workers (int, optional): Number of conversions to run at the same time. Defaults to None, in which case the number of CPUs is used.
+            batch_size (int, optional): Number of inputs to convert in a single run of the container. Defaults to None, in which case every input is converted separately.
+            options (Dict[str, object], optional): Settings by option name, used for these conversions only, as for :py:meth:`convert`. Defaults to None.
 
-        bindings = self._make_input_output_binding(input_path, output_path)
+        Raises:
+            ValueError: If the number of output paths does not match the number of input paths, if the batch size is smaller than 1, or if an option does not exist, is not valid or is ``output_directory``.
 
-        if not self.download_container:
-            output = Client.run(self.container_url, command_line_args, bind=bindings, stream=True)
+        Returns:
+            List[DCM2NIIX_OUTPUT]: The output of every conversion, in the same order as the input paths.
+        """
+        input_paths = list(input_paths)
+        if output_paths is None:
+            output_paths = [None] * len(input_paths)
         else:
-            output = Client.run(
-                os.path.join(self.download_folder, self.download_name),
+            output_paths = list(output_paths)
+
+        if len(output_paths) != len(input_paths):
+            raise ValueError(
+                "Number of output paths should match the number of input paths, you passed {n_output} output paths for {n_input} input paths".format(
+                    n_output=len(output_paths), n_input=len(input_paths)
+                )
+            )
+
+        if batch_size is not None and batch_size < 1:
+            raise ValueError(
+                "Batch size should be at least 1, you passed {batch_size}".format(
+                    batch_size=batch_size
+                )
+            )
+
+        option_overrides = None
+        if options:
+            if "output_directory" in options:
+                raise ValueError("Pass the output folders as output paths instead of as an option")
+            # Checked once here, instead of failing every conversion
+            option_overrides = self._option_overrides(options)
+
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+
+        if len(input_paths) == 0:
+            return []
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            if batch_size is not None:
+                outputs = self._convert_batches(
+                    executor, input_paths, output_paths, batch_size, option_overrides
+                )
+            elif self.scheduler is None:
+                outputs = list(
+                    executor.map(
+                        functools.partial(self._convert_isolated, options=options),
+                        input_paths,
+                        output_paths,
+                    )
+                )
+            else:
+                outputs = self._convert_scheduled(executor, input_paths, output_paths, options)
+
+        # Images that are compressed in the background are compressed while the next conversions run
+        for i_output in outputs:
+            try:
+                i_output.wait()
+            except Exception as error:
+                i_output.error = error
+        return outputs
+
+    def _convert_scheduled(
+        self,
+        executor,
+        input_paths: List[str],
+        output_paths: List[Optional[str]],
+        options: Dict[str, object] = None,
+    ) -> List["DCM2NIIX_OUTPUT"]:
+        """
+        Convert multiple DICOM folders, longest estimated duration first.
+
+        Args:
+            executor (concurrent.futures.Executor): The workers to run the conversions on.
+            input_paths (List[str]): The DICOM folders to convert.
+            output_paths (List[Optional[str]]): The output folder for every input.
+            options (Dict[str, object], optional): Settings by option name, used for these conversions only. Defaults to None.
+
+        Returns:
+            List[DCM2NIIX_OUTPUT]: The output of every conversion, in the same order as the input paths.
+        """
+        measurements = list(executor.map(self.scheduler.measure, input_paths))
+        # The workers take the conversions in the order in which they are submitted
+        futures = {
+            i_index: executor.submit(
+                self._convert_isolated, input_paths[i_index], output_paths[i_index], options
+            )
+            for i_index in self.scheduler.order(input_paths, measurements)
+        }
+        outputs = [futures[i_index].result() for i_index in range(len(input_paths))]
+
+        for i_input_path, i_measurement, i_output in zip(input_paths, measurements, outputs):
+            # The metrics of images that are compressed in the background are finished afterwards
+            try:
+                i_output.wait()
+            except Exception:
+                continue
+            if i_output.error is not None or i_output.metrics is None:
+                continue
+            timings = i_output.metrics.timings
+            if i_output.metrics.counters.get("cache_hits", 0) > 0 or "total" not in timings:
+                continue
+            # Waiting for admission is not part of the duration of the conversion itself
+            duration = timings["total"] - timings.get("admission_wait", 0.0)
+            self.scheduler.record(i_input_path, *i_measurement, duration)
+        self.scheduler.save()
+        return outputs
+
+    def _convert_batches(
+        self,
+        executor,
+        input_paths: List[str],
+        output_paths: List[Optional[str]],
+        batch_size: int,
+        option_overrides: Dict[str, str] = None,
+    ) -> List["DCM2NIIX_OUTPUT"]:
+        """
+        Convert multiple DICOM folders in batches, converting every batch in a single run.
+
+        Args:
+            executor (concurrent.futures.Executor): The workers to run the batches on.
+            input_paths (List[str]): The DICOM folders to convert.
+            output_paths (List[Optional[str]]): The output folder for every input.
+            batch_size (int): Maximum number of inputs in a batch.
+            option_overrides (Dict[str, str], optional): Option values to use instead of the options, as made by _option_overrides. Defaults to None.
+
+        Returns:
+            List[DCM2NIIX_OUTPUT]: The output of every conversion, in the same order as the input paths.
+        """
+        # Neighbouring folders are put in the same batch, so that the folders that are bound for a
+        # batch contain as few other folders as possible
+        order = sorted(
+            range(len(input_paths)), key=lambda i_index: os.path.abspath(input_paths[i_index])
+        )
+        batches = [
+            order[i_start : i_start + batch_size] for i_start in range(0, len(order), batch_size)
+        ]
+        batch_outputs = executor.map(
+            lambda batch: self._convert_batch(
+                [input_paths[i_index] for i_index in batch],
+                [output_paths[i_index] for i_index in batch],
+                option_overrides,
+            ),
+            batches,
+        )
+
+        outputs: List[Optional["DCM2NIIX_OUTPUT"]] = [None] * len(input_paths)
+        for i_batch, i_batch_outputs in zip(batches, batch_outputs):
+            for i_index, i_output in zip(i_batch, i_batch_outputs):
+                outputs[i_index] = i_output
+        return outputs
+
+    def _convert_batch(
+        self,
+        input_paths: List[str],
+        output_paths: List[Optional[str]],
+        option_overrides: Dict[str, str] = None,
+    ) -> List["DCM2NIIX_OUTPUT"]:
+        """
+        Convert multiple DICOM folders with a single run of the container.
+
+        Every input and output folder is bound in the container, and a script in a temporary folder
+        runs dcm2niix for every input in turn. The script prints a
+        marker line before and after every conversion, with which the output of dcm2niix is split
+        per input. A failing conversion does not stop the batch, instead the exception is stored in
+        the ``error`` attribute of the output of that input.
+
+        Args:
+            input_paths (List[str]): The DICOM folders to convert.
+            output_paths (List[Optional[str]]): The output folder for every input, None to save the output in the input folder.
+            option_overrides (Dict[str, str], optional): Option values to use instead of the options, as made by _option_overrides. Defaults to None.
+
+        Returns:
+            List[DCM2NIIX_OUTPUT]: The output of every conversion, in the same order as the input paths.
+        """
+        input_paths = [os.path.abspath(i_input_path) for i_input_path in input_paths]
+        output_paths = [
+            i_input_path if i_output_path is None else os.path.abspath(i_output_path)
+            for i_input_path, i_output_path in zip(input_paths, output_paths)
+        ]
+        arg_list = self._convert_options_to_arg_list(option_overrides)
+        output_infos = [self._make_output_info(arg_list) for _ in input_paths]
+        finished = [False] * len(input_paths)
+
+        script_folder = tempfile.mkdtemp(prefix="dcm2niixpy_batch_")
+        try:
+            for i_output_path in set(output_paths):
+                os.makedirs(i_output_path, exist_ok=True)
+
+            marker = "dcm2niixpy-batch-" + uuid.uuid4().hex
+            script_path = os.path.join(script_folder, marker + ".sh")
+
+            if self.container_backend == self.NATIVE_KEYWORD:
+                executable = self.executable
+                run_input_paths = input_paths
+                run_output_paths = output_paths
+            else:
+                executable = self.CONTAINER_EXECUTABLE
+                # Every folder is bound by itself, as the common folder of unrelated folders can be
+                # as broad as the root folder
+                container_input_paths = self._number_folders(input_paths, self.CONTAINER_INPUT_PATH)
+                container_output_paths = self._number_folders(
+                    output_paths, self.CONTAINER_OUTPUT_PATH
+                )
+                run_input_paths = [container_input_paths[i_path] for i_path in input_paths]
+                run_output_paths = [container_output_paths[i_path] for i_path in output_paths]
+                bindings = [
+                    i_path + ":" + i_container_path
+                    for i_folders in [container_input_paths, container_output_paths]
+                    for i_path, i_container_path in i_folders.items()
+                ]
+                bindings.append(script_folder + ":" + self.CONTAINER_SCRIPT_PATH)
+            commands = [
+                [executable, *arg_list, "-o", i_run_output_path, i_run_input_path]
+                for i_run_input_path, i_run_output_path in zip(run_input_paths, run_output_paths)
+            ]
+
+            with open(script_path, "w") as script_file:
+                script_file.write(self._make_batch_script(marker, commands))
+
+            if self.container_backend == self.NATIVE_KEYWORD:
+                output = self._stream_command(["sh", script_path], self.limits)
+            else:
+                output = self._run_container_script(
+                    to_container_path(script_path, script_folder, self.CONTAINER_SCRIPT_PATH),
+                    bindings,
+                    self.limits,
+                )
+
+            index = None
+            for i_line in output:
+                if not i_line.startswith(marker):
+                    if index is not None:
+                        output_infos[index].parse_line(i_line)
+                    continue
+
+                marker_fields = i_line.split()
+                index = int(marker_fields[2])
+                if marker_fields[1] == "start":
+                    metrics = DCM2NIIX_METRICS("convert")
+                    start_time = time.perf_counter()
+                    continue
+
+                return_code = int(marker_fields[3])
+                if return_code != 0:
+                    output_infos[index].error = subprocess.CalledProcessError(
+                        return_code, commands[index]
+                    )
+                output_infos[index].set_output_folder(run_output_paths[index], output_paths[index])
+                metrics.add_time("dcm2niix", time.perf_counter() - start_time)
+                self._finish_metrics(metrics, start_time, output_infos[index], input_paths[index])
+                finished[index] = True
+                index = None
+        except Exception as error:
+            for i_output_info, i_finished in zip(output_infos, finished):
+                if not i_finished:
+                    i_output_info.error = error
+        finally:
+            shutil.rmtree(script_folder, ignore_errors=True)
+
+        for i_output_info, i_finished in zip(output_infos, finished):
+            if not i_finished and i_output_info.error is None:
+                i_output_info.error = RuntimeError("The batch ended before the input was converted")
+        return output_infos
+
+    @staticmethod
+    def _number_folders(folders: List[str], container_root: str) -> Dict[str, str]:
+        """
+        Give every distinct folder a numbered folder inside the container.
+
+        Args:
+            folders (List[str]): The folders on the host, which can contain duplicates.
+            container_root (str): The folder inside the container in which the folders are bound.
+
+        Returns:
+            Dict[str, str]: The folder inside the container of every folder on the host.
+        """
+        container_folders = {}
+        for i_folder in folders:
+            if i_folder not in container_folders:
+                container_folders[i_folder] = container_root + "/" + str(len(container_folders))
+        return container_folders
+
+    @staticmethod
+    def _make_batch_script(marker: str, commands: List[List[str]]) -> str:
+        """
+        Make the script that runs the conversions of a batch.
+
+        Args:
+            marker (str): Start of the lines that mark the start and end of every conversion.
+            commands (List[List[str]]): The dcm2niix command of every conversion.
+
+        Returns:
+            str: The shell script.
+        """
+        script_lines = []
+        for i_index, i_command in enumerate(commands):
+            script_lines.extend(
+                [
+                    "echo '{marker} start {index}'".format(marker=marker, index=i_index),
+                    " ".join(shlex.quote(i_argument) for i_argument in i_command) + " 2>&1",
+                    'echo "{marker} end {index} $?"'.format(marker=marker, index=i_index),
+                ]
+            )
+        return "\n".join(script_lines) + "\n"
+
+    def convert_index(
+        self,
+        index: "DICOM_INDEX",
+        output_path: str,
+        staging_folder: str = None,
+        max_workers: int = None,
+        skip_up_to_date: bool = False,
+    ) -> Dict[str, "DCM2NIIX_OUTPUT"]:
+        """
+        Convert every series of a DICOM index separately, in parallel.
+
+        The files of every series are staged in a folder of their own (using hard links when
+        possible), so that dcm2niix only has to search and sort the files of a single series.
+
+        When skipping up-to-date series, a series is not converted again if the output folder
+        contains sidecars with its SeriesInstanceUID that are newer than all its files, and the
+        images of these sidecars exist. This requires sidecars that are not anonymized. Series that
+        are converted again overwrite their previous output.
+
+        Args:
+            index (DICOM_INDEX): The scanned DICOM files.
+            output_path (str): The output folder for all series.
+            staging_folder (str, optional): Folder in which the series are staged. Defaults to None, in which case a temporary folder in the output folder is used, which is removed afterwards.
+            max_workers (int, optional): Number of conversions to run at the same time. Defaults to None, in which case the number of CPUs is used.
+            skip_up_to_date (bool, optional): Whether to skip series that have already been converted. Defaults to False.
+
+        Returns:
+            Dict[str, DCM2NIIX_OUTPUT]: The output of every series, by SeriesInstanceUID. Outputs of skipped series have ``up_to_date`` set.
+        """
+        all_series = index.series
+
+        up_to_date_outputs = {}
+        if skip_up_to_date:
+            up_to_date_outputs = self._find_up_to_date_series(all_series, output_path)
+        series = {
+            i_uid: i_series
+            for i_uid, i_series in all_series.items()
+            if i_uid not in up_to_date_outputs
+        }
+
+        remove_staging_folder = staging_folder is None
+        if remove_staging_folder:
+            os.makedirs(output_path, exist_ok=True)
+            staging_folder = tempfile.mkdtemp(prefix=".dcm2niixpy_staging_", dir=output_path)
+
+        # A series that is converted again overwrites its previous output, otherwise the old
+        # output would be kept next to the new output, and the series would never be up to date
+        options = {"conflict_write_behavior": 1} if skip_up_to_date else None
+        try:
+            input_paths = [i_series.stage(staging_folder) for i_series in series.values()]
+            outputs = self.convert_many(
+                input_paths,
+                [output_path] * len(input_paths),
+                max_workers=max_workers,
+                options=options,
+            )
+        finally:
+            if remove_staging_folder:
+                shutil.rmtree(staging_folder, ignore_errors=True)
+
+        outputs = dict(zip(series.keys(), outputs), **up_to_date_outputs)
+        return {i_uid: outputs[i_uid] for i_uid in all_series}
+
+    def _find_up_to_date_series(
+        self, series: Dict[str, "DICOM_SERIES"], output_path: str
+    ) -> Dict[str, "DCM2NIIX_OUTPUT"]:
+        """
+        Find the series that have already been converted to the output folder.
+
+        Args:
+            series (Dict[str, DICOM_SERIES]): The series, by SeriesInstanceUID.
+            output_path (str): The output folder.
+
+        Returns:
+            Dict[str, DCM2NIIX_OUTPUT]: The output of every up-to-date series, by SeriesInstanceUID.
+        """
+        if self.bids_sidecar == "n" or self.anonymize_bids_sidecar == "y":
+            warnings.warn(
+                "Up-to-date series can only be found with sidecars that contain the SeriesInstanceUID, set bids_sidecar to True and anonymize_bids_sidecar to False"
+            )
+            return {}
+
+        sidecars: Dict[str, List[Tuple[str, int]]] = {}
+        for i_root, i_dirs, i_files in os.walk(output_path):
+            i_dirs[:] = [i_dir for i_dir in i_dirs if not i_dir.startswith(".dcm2niixpy_staging_")]
+            for i_file in i_files:
+                if not i_file.endswith(".json"):
+                    continue
+                sidecar_path = os.path.join(i_root, i_file)
+                try:
+                    with open(sidecar_path) as sidecar_file:
+                        sidecar = json.load(sidecar_file)
+                    modification_time = os.stat(sidecar_path).st_mtime_ns
+                except (OSError, ValueError):
+                    continue
+                if isinstance(sidecar, dict) and "SeriesInstanceUID" in sidecar:
+                    sidecars.setdefault(sidecar["SeriesInstanceUID"], []).append(
+                        (sidecar_path, modification_time)
+                    )
+
+        outputs = {}
+        for i_uid, i_series in series.items():
+            series_sidecars = sidecars.get(i_uid)
+            if series_sidecars is None:
+                continue
+            output_info = self._make_output_info()
+            for i_sidecar_path, i_modification_time in sorted(series_sidecars):
+                if output_info.extension is None:
+                    image_path = None
+                else:
+                    image_path = i_sidecar_path[: -len(".json")] + output_info.extension
+                if i_modification_time < i_series.modification_time or (
+                    image_path is not None and not os.path.isfile(image_path)
+                ):
+                    break
+                output_info.series.append(
+                    DCM2NIIX_SERIES(
+                        len(i_series.files),
+                        image_path,
+                        None,
+                        output_info.extension,
+                        i_sidecar_path,
+                    )
+                )
+            else:
+                output_info.up_to_date = True
+                output_info.output_path = output_info.series[-1].output_path
+                output_info.file_name = output_info.series[-1].file_name
+                outputs[i_uid] = output_info
+        return outputs
+
+    def _convert_isolated(
+        self, input_path: str, output_path: str = None, options: Dict[str, object] = None
+    ) -> "DCM2NIIX_OUTPUT":
+        """
+        Convert a DICOM folder, catching any error that occurs during conversion.
+
+        Args:
+            input_path (str): The DICOM folder to convert.
+            output_path (str, optional): The output folder. Defaults to None.
+            options (Dict[str, object], optional): Settings by option name, used for this conversion only. Defaults to None.
+
+        Returns:
+            DCM2NIIX_OUTPUT: The output of the conversion, with the error set if the conversion failed.
+        """
+        try:
+            return self.convert(input_path, output_path, options=options)
+        except Exception as error:
+            output_info = DCM2NIIX_OUTPUT()
+            output_info.error = error
+            return output_info
+
+    def _make_input_output_binding(self, input_path: str, output_path: str) -> list:
+        return [
+            input_path + ":" + self.CONTAINER_INPUT_PATH,
+            output_path + ":" + self.CONTAINER_OUTPUT_PATH,
+        ]
+
+    def _run_container(
+        self, command_line_args: list, bindings: list, limits: DCM2NIIX_LIMITS = None
+    ):
+        """
+        Run dcm2niix in a new container.
+
+        Docker is run with the docker command line, so that the limits can be passed to it.
+
+        Args:
+            command_line_args (list): The arguments to pass to dcm2niix.
+            bindings (list): The bind paths for the container.
+            limits (DCM2NIIX_LIMITS, optional): Resource limits of the container. Defaults to None.
+
+        Returns:
+            Iterable[str]: The output lines of dcm2niix.
+        """
+        if self.container_backend == self.DOCKER_KEYWORD:
+            command = [self.DOCKER_KEYWORD, "run", "--rm"]
+            if limits is not None:
+                command.extend(limits.container_options())
+            for i_binding in bindings:
+                command.extend(["--volume", i_binding])
+            return self._stream_command([*command, self.container_url, *command_line_args])
+
+        from spython.main import Client
+
+        self._ensure_container_image()
+        if limits is not None:
+            return Client.run(
+                self._container_image,
                 command_line_args,
                 bind=bindings,
                 stream=True,
+                options=limits.container_options(),
             )
+        return Client.run(self._container_image, command_line_args, bind=bindings, stream=True)
 
-        output_info = DCM2NIIX_OUTPUT()
-        output_info.parse_output(output)
-        output_info.output_path = os.path.join(output_path, output_info.file_name)
+    def _run_container_script(
+        self, script_path: str, bindings: list, limits: DCM2NIIX_LIMITS = None
+    ):
+        """
+        Run a shell script in a new container.
 
-        return output_info
+        Args:
+            script_path (str): The script inside the container.
+            bindings (list): The bind paths for the container.
+            limits (DCM2NIIX_LIMITS, optional): Resource limits of the container. Defaults to None.
 
-    def _make_input_output_binding(self, input_path: str, output_path: str) -> list:
-        return [input_path + ":/input", output_path + ":/output"]
+        Returns:
+            Iterable[str]: The output lines of the script.
+        """
+        if self.container_backend == self.DOCKER_KEYWORD:
+            command = [self.DOCKER_KEYWORD, "run", "--rm"]
+            if limits is not None:
+                command.extend(limits.container_options())
+            for i_binding in bindings:
+                command.extend(["--volume", i_binding])
+            command.extend(["--entrypoint", "sh", self.container_url, script_path])
+            return self._stream_command(command)
+
+        from spython.main import Client
+
+        self._ensure_container_image()
+        if limits is not None:
+            return Client.execute(
+                self._container_image,
+                ["sh", script_path],
+                bind=bindings,
+                stream=True,
+                options=limits.container_options(),
+            )
+        return Client.execute(
+            self._container_image, ["sh", script_path], bind=bindings, stream=True
+        )
+
+    def _run_native(self, command_line_args: list, limits: DCM2NIIX_LIMITS = None):
+        """
+        Run the native dcm2niix executable.
+
+        Args:
+            command_line_args (list): The arguments to pass to dcm2niix.
+            limits (DCM2NIIX_LIMITS, optional): Resource limits of the process. Defaults to None.
+
+        Returns:
+            Iterable[str]: The output lines of dcm2niix.
+        """
+        return self._stream_command([self.executable, *command_line_args], limits)
+
+    @staticmethod
+    def _stream_command(command: list, limits: DCM2NIIX_LIMITS = None):
+        """
+        Run a command, yielding its output lines.
+
+        The command is stopped if its output is not read to the end.
+
+        Args:
+            command (list): The command to run.
+            limits (DCM2NIIX_LIMITS, optional): Resource limits to apply to the process. Defaults to None.
+
+        Raises:
+            subprocess.CalledProcessError: If the command exits with an error.
+
+        Yields:
+            str: The output lines of the command.
+        """
+        process = subprocess.Popen(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            universal_newlines=True,
+        )
+        if limits is not None:
+            try:
+                limits.apply_to_process(process.pid)
+            except OSError:
+                process.kill()
+                process.wait()
+                raise
+        finished = False
+        try:
+            for i_line in process.stdout:
+                yield i_line
+            finished = True
+        finally:
+            process.stdout.close()
+            if not finished:
+                # Docker and singularity pass SIGTERM on to the container, which they do not do
+                # for SIGKILL
+                process.terminate()
+                try:
+                    process.wait(timeout=5)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+                    process.wait()
+        return_code = process.wait()
+        if return_code != 0:
+            raise subprocess.CalledProcessError(return_code, command)
+
+    def session(self, input_root: str, output_root: str = None) -> "DCM2NIIX_SESSION":
+        """
+        Create a session that keeps a single container running for multiple conversions.
+
+        The input and output roots are bound into the container once. Every conversion of
+        which the input and output are located within these roots is sent to the running
+        container, other conversions start a new container as usual.
+
+        For example::
+
+            with dcm2niix.session("/data/dicom", "/data/nifti"):
+                dcm2niix.convert("/data/dicom/patient_1", "/data/nifti/patient_1")
+
+        Args:
+            input_root (str): Folder containing all inputs that will be converted.
+            output_root (str, optional): Folder containing all outputs. Defaults to None, in which case the input root is used.
+
+        Returns:
+            DCM2NIIX_SESSION: The session, to be used as a context manager.
+        """
+        if output_root is None:
+            output_root = input_root
+        return DCM2NIIX_SESSION(self, input_root, output_root)
+
+    @property
+    def _container_image(self) -> str:
+        """
+        The image that is run, either the container url or the downloaded container.
+
+        Returns:
+            str: Location of the image.
+        """
+        if self.download_container:
+            return os.path.join(self.image_cache.cache_folder, self.download_name)
+        else:
+            return self.container_url
+
+
+class DCM2NIIX_EVENT:
+    CONVERTED = "converted"
+    WARNING = "warning"
+    ERROR = "error"
+    FOUND = "found"
+    SKIPPED = "skipped"
+    TIMING = "timing"
+    PROGRESS = "progress"
+    FINISHED = "finished"
+
+    def __init__(self, kind: str, line: str, **data) -> None:
+        """
+        An event parsed from a single line of dcm2niix output.
+
+        Args:
+            kind (str): Kind of event, one of "converted", "warning", "error", "found", "skipped", "timing", "progress" or "finished".
+            line (str): The line of output from which the event was parsed.
+            **data: The parsed information, available as attributes of the event.
+        """
+        self.kind = kind
+        self.line = line
+        self.__dict__.update(data)
+
+    def __repr__(self) -> str:
+        return "DCM2NIIX_EVENT(kind={kind!r}, line={line!r})".format(kind=self.kind, line=self.line)
+
+
+class DCM2NIIX_SERIES:
+    def __init__(
+        self,
+        n_slices: int,
+        output_path: Optional[str],
+        image_shape: List[int],
+        extension: Optional[str],
+        sidecar_path: Optional[str] = None,
+        warnings: List[str] = None,
+    ) -> None:
+        """
+        A single series that was converted by dcm2niix.
+
+        Args:
+            n_slices (int): Number of DICOM files in the series.
+            output_path (Optional[str]): Path of the converted file, None if no image was written.
+            image_shape (List[int]): Shape of the converted image.
+            extension (Optional[str]): Extension of the converted file, None if no image was written.
+            sidecar_path (Optional[str], optional): Path of the BIDS sidecar. Defaults to None, if no sidecar is written.
+            warnings (List[str], optional): Warnings that were given while converting the series. Defaults to None.
+        """
+        self.n_slices = n_slices
+        self.output_path = output_path
+        self.image_shape = image_shape
+        self.extension = extension
+        self.sidecar_path = sidecar_path
+        self.warnings = [] if warnings is None else warnings
+        self.compressed_size: Optional[int] = None
+        self.image: Optional["DCM2NIIX_IMAGE"] = None
+
+    @property
+    def file_name(self) -> Optional[str]:
+        """
+        The file name of the converted file.
+
+        Returns:
+            Optional[str]: The file name, including extension, or None if no image was written.
+        """
+        if self.output_path is None:
+            return None
+        return os.path.basename(self.output_path)
+
+    def to_dict(self) -> dict:
+        """
+        Convert the series to a dictionary that can be stored as JSON.
+
+        Returns:
+            dict: The series.
+        """
+        return {
+            "n_slices": self.n_slices,
+            "output_path": self.output_path,
+            "image_shape": self.image_shape,
+            "extension": self.extension,
+            "sidecar_path": self.sidecar_path,
+            "warnings": self.warnings,
+            "compressed_size": self.compressed_size,
+        }
+
+    @classmethod
+    def from_dict(cls, series_dict: dict) -> "DCM2NIIX_SERIES":
+        """
+        Create the series from a dictionary made by to_dict.
+
+        Args:
+            series_dict (dict): The series.
+
+        Returns:
+            DCM2NIIX_SERIES: The series.
+        """
+        series = cls(
+            series_dict["n_slices"],
+            series_dict["output_path"],
+            series_dict["image_shape"],
+            series_dict["extension"],
+            series_dict["sidecar_path"],
+            list(series_dict["warnings"]),
+        )
+        series.compressed_size = series_dict.get("compressed_size")
+        return series
+
+    def __repr__(self) -> str:
+        return "DCM2NIIX_SERIES(output_path={output_path!r}, image_shape={image_shape!r})".format(
+            output_path=self.output_path, image_shape=self.image_shape
+        )
 
 
 class DCM2NIIX_OUTPUT:
-    def __init__(self):
-        self.converted_regex = "Convert (\d+) DICOM as ([^\s]+) \((\d+x\d+x\d+x\d+)\)"
-        self.warning_regex = "Warning: (.*)"
+    converted_regex = re.compile(r"Convert (\d+) DICOM as (.+) \((\d+x\d+x\d+x\d+)\)$")
+    warning_regex = re.compile(r"Warning: (.*)")
+    error_regex = re.compile(r"Error: (.*)")
+    found_regex = re.compile(r"Found (\d+) DICOM file")
+    skipped_regex = re.compile(r"(?:Skipping|Ignoring) (.*)")
+    timing_regex = re.compile(r"Conversion required (\d+(?:\.\d+)?) seconds")
+    progress_regex = re.compile(r"[Pp]rogress:? *(\d+(?:\.\d+)?) *(%?)")
+
+    # Lines are dispatched on their first word, so that every line is matched against at most a
+    # single pattern. Each entry maps the first word to the pattern and the method handling a match.
+    LINE_PARSERS = {
+        "Convert": (converted_regex, "_parse_converted_info"),
+        "Warning:": (warning_regex, "_parse_warning"),
+        "Error:": (error_regex, "_parse_error"),
+        "Found": (found_regex, "_parse_found"),
+        "Skipping": (skipped_regex, "_parse_skipped"),
+        "Ignoring": (skipped_regex, "_parse_skipped"),
+        "Conversion": (timing_regex, "_parse_timing"),
+        "Progress:": (progress_regex, "_parse_progress"),
+        "Progress": (progress_regex, "_parse_progress"),
+        "progress:": (progress_regex, "_parse_progress"),
+    }
+
+    __slots__ = (
+        "extension",
+        "sidecar_extension",
+        "image_shape",
+        "warnings",
+        "errors",
+        "skipped",
+        "n_dicoms",
+        "conversion_time",
+        "file_name",
+        "output_path",
+        "n_slices",
+        "no_direction",
+        "progress",
+        "error",
+        "metrics",
+        "compression_time",
+        "up_to_date",
+        "series",
+        "_compression",
+        "_pending_warnings",
+    )
+
+    def __init__(
+        self, extension: Optional[str] = ".nii.gz", sidecar_extension: Optional[str] = ".json"
+    ):
+        """
+        Parsed output of a dcm2niix conversion.
+
+        A conversion can produce multiple series, which are available in ``series``.
+        The ``file_name``, ``output_path``, ``image_shape`` and ``n_slices`` attributes refer to
+        the last converted series. The timings and counters of the conversion are available in
+        ``metrics``. When the images are compressed in the background, :py:meth:`wait` waits
+        until they are compressed, after which ``compression_time`` and the ``compressed_size`` of
+        every series are set.
+
+        Args:
+            extension (Optional[str], optional): Extension of the converted files. Defaults to ".nii.gz", use None if only sidecars are written.
+            sidecar_extension (Optional[str], optional): Extension of the BIDS sidecars. Defaults to ".json", use None if no sidecars are written.
+        """
+        self.extension = extension
+        self.sidecar_extension = sidecar_extension
 
         self.image_shape = None
         self.warnings = []
+        self.errors = []
+        self.skipped = []
+        self.n_dicoms = None
+        self.conversion_time = None
         self.file_name = None
         self.output_path = None
         self.n_slices = None
         self.no_direction = False
+        self.progress = None
+        self.error = None
+        self.metrics: Optional[DCM2NIIX_METRICS] = None
+        self.compression_time = None
+        self.up_to_date = False
+        self.series: List[DCM2NIIX_SERIES] = []
+        self._compression = None
+        self._pending_warnings: List[str] = []
+
+    def to_dict(self) -> dict:
+        """
+        Convert the parsed output to a dictionary that can be stored as JSON.
+
+        Only what was parsed from the output of dcm2niix is included. The state of the run, such as
+        ``progress``, ``error``, ``metrics`` and the background compression, is left out.
+
+        Returns:
+            dict: The parsed output.
+        """
+        return {
+            "extension": self.extension,
+            "sidecar_extension": self.sidecar_extension,
+            "image_shape": self.image_shape,
+            "warnings": self.warnings,
+            "errors": self.errors,
+            "skipped": self.skipped,
+            "n_dicoms": self.n_dicoms,
+            "conversion_time": self.conversion_time,
+            "file_name": self.file_name,
+            "n_slices": self.n_slices,
+            "no_direction": self.no_direction,
+            "series": [i_series.to_dict() for i_series in self.series],
+        }
+
+    @classmethod
+    def from_dict(cls, output_dict: dict) -> "DCM2NIIX_OUTPUT":
+        """
+        Create the output from a dictionary made by to_dict.
+
+        Args:
+            output_dict (dict): The parsed output.
+
+        Returns:
+            DCM2NIIX_OUTPUT: The output.
+        """
+        output_info = cls(output_dict["extension"], output_dict["sidecar_extension"])
+        output_info.image_shape = output_dict["image_shape"]
+        output_info.warnings = list(output_dict["warnings"])
+        # Dictionaries made by earlier versions do not have these
+        output_info.errors = list(output_dict.get("errors", []))
+        output_info.skipped = list(output_dict.get("skipped", []))
+        output_info.n_dicoms = output_dict.get("n_dicoms")
+        output_info.conversion_time = output_dict.get("conversion_time")
+        output_info.file_name = output_dict["file_name"]
+        output_info.n_slices = output_dict["n_slices"]
+        output_info.no_direction = output_dict["no_direction"]
+        output_info.series = [
+            DCM2NIIX_SERIES.from_dict(i_series) for i_series in output_dict["series"]
+        ]
+        return output_info
+
+    def wait(self) -> "DCM2NIIX_OUTPUT":
+        """
+        Wait until the images are compressed, when they are compressed in the background.
+
+        Raises:
+            Exception: The error that occurred while compressing.
+
+        Returns:
+            DCM2NIIX_OUTPUT: The output itself.
+        """
+        if self._compression is not None:
+            self._compression.result()
+        return self
+
+    def set_output_folder(self, reported_output_path: str, output_path: str) -> None:
+        """
+        Translate the paths reported by dcm2niix to paths in the output folder on the host.
+
+        Args:
+            reported_output_path (str): The output folder as passed to dcm2niix, e.g. inside the container.
+            output_path (str): The output folder on the host.
+        """
+        for i_series in self.series:
+            self.set_series_output_folder(i_series, reported_output_path, output_path)
+
+    def set_series_output_folder(
+        self, series: DCM2NIIX_SERIES, reported_output_path: str, output_path: str
+    ) -> None:
+        """
+        Translate the paths of a single series reported by dcm2niix to paths on the host.
+
+        Args:
+            series (DCM2NIIX_SERIES): The series, of which the paths are still as reported by dcm2niix.
+            reported_output_path (str): The output folder as passed to dcm2niix, e.g. inside the container.
+            output_path (str): The output folder on the host.
+        """
+        reported_output_path = os.path.normpath(reported_output_path)
+        if series.output_path is not None:
+            series.output_path = self._translate_path(
+                series.output_path, reported_output_path, output_path
+            )
+        if series.sidecar_path is not None:
+            series.sidecar_path = self._translate_path(
+                series.sidecar_path, reported_output_path, output_path
+            )
+
+        if len(self.series) > 0:
+            self.output_path = self.series[-1].output_path
+
+    @staticmethod
+    def _translate_path(path: str, reported_output_path: str, output_path: str) -> str:
+        if path.startswith(reported_output_path.rstrip("/") + "/"):
+            return os.path.join(output_path, os.path.relpath(path, reported_output_path))
+        return os.path.join(output_path, os.path.basename(path))
 
-    def parse_output(self, output):
+    def parse_output(self, output, metrics: DCM2NIIX_METRICS = None) -> None:
+        """
+        Parse all lines of dcm2niix output.
+
+        When metrics are given the time until the first line is recorded as "startup", the time
+        spent waiting for the remaining lines as "dcm2niix" and the time spent parsing as "parse".
+        As the output is streamed, the startup includes starting the container.
+
+        Args:
+            output (Iterable[str]): The lines of dcm2niix output.
+            metrics (DCM2NIIX_METRICS, optional): Metrics to record the timings in. Defaults to None.
+        """
+        if metrics is None:
+            for i_line in output:
+                self.parse_line(i_line)
+            return
+
+        wait_stage = "startup"
+        parse_time = 0.0
+        wait_start_time = time.perf_counter()
         for i_line in output:
-            i_line = i_line.strip()
+            parse_start_time = time.perf_counter()
+            metrics.add_time(wait_stage, parse_start_time - wait_start_time)
+            wait_stage = "dcm2niix"
+            self.parse_line(i_line)
+            wait_start_time = time.perf_counter()
+            parse_time += wait_start_time - parse_start_time
+        # Waiting for the process to exit after the last line
+        metrics.add_time(wait_stage, time.perf_counter() - wait_start_time)
+        metrics.add_time("parse", parse_time)
+
+    def parse_line(self, info_line: str) -> Optional[DCM2NIIX_EVENT]:
+        """
+        Parse a single line of dcm2niix output.
+
+        Args:
+            info_line (str): The line to parse.
 
-            self._parse_converted_info(i_line)
-            self._parse_warning(i_line)
+        Returns:
+            Optional[DCM2NIIX_EVENT]: The parsed event, or None if the line contains no information.
+        """
+        info_line = info_line.strip()
+
+        first_word, _, _ = info_line.partition(" ")
+        line_parser = self.LINE_PARSERS.get(first_word)
+        if line_parser is None:
+            return None
 
-    def _parse_converted_info(self, info_line):
-        converted_info = re.search(self.converted_regex, info_line)
-        if converted_info:
-            self.n_slices = converted_info.group(1)
-            self.output_path = os.path.normpath(converted_info.group(2) + ".nii.gz")
+        line_regex, parse_method = line_parser
+        match = line_regex.match(info_line)
+        if match is None:
+            return None
+        return getattr(self, parse_method)(info_line, match)
+
+    def _parse_converted_info(self, info_line: str, match: re.Match) -> DCM2NIIX_EVENT:
+        self.n_slices = match.group(1)
+        output_base = os.path.normpath(match.group(2))
+        if self.extension is not None:
+            self.output_path = output_base + self.extension
             self.file_name = os.path.basename(self.output_path)
-            image_shape = converted_info.group(3).split("x")
-            image_shape = [int(i_image_shape) for i_image_shape in image_shape]
-            self.image_shape = image_shape
-
-    def _parse_warning(self, info_line):
-        warnings = re.search(self.warning_regex, info_line)
-        if warnings:
-            warning = warnings.group(1)
-            if (
-                warning
-                == "Unable to determine slice direction: please check whether slices are flipped"
-            ):
-                self.no_direction = True
-            self.warnings.append(warning)
+        else:
+            self.output_path = None
+            self.file_name = None
+        image_shape = match.group(3).split("x")
+        image_shape = [int(i_image_shape) for i_image_shape in image_shape]
+        self.image_shape = image_shape
+
+        if self.sidecar_extension is not None:
+            sidecar_path = output_base + self.sidecar_extension
+        else:
+            sidecar_path = None
+        series = DCM2NIIX_SERIES(
+            int(self.n_slices),
+            self.output_path,
+            image_shape,
+            self.extension,
+            sidecar_path,
+            self._pending_warnings,
+        )
+        self._pending_warnings = []
+        self.series.append(series)
+
+        return DCM2NIIX_EVENT(
+            DCM2NIIX_EVENT.CONVERTED,
+            info_line,
+            n_slices=self.n_slices,
+            file_name=self.file_name,
+            image_shape=self.image_shape,
+            series=series,
+        )
+
+    def _parse_warning(self, info_line: str, match: re.Match) -> DCM2NIIX_EVENT:
+        warning = match.group(1)
+        if (
+            warning
+            == "Unable to determine slice direction: please check whether slices are flipped"
+        ):
+            self.no_direction = True
+        self.warnings.append(warning)
+        # dcm2niix reports warnings before the series they belong to is converted
+        self._pending_warnings.append(warning)
+        return DCM2NIIX_EVENT(DCM2NIIX_EVENT.WARNING, info_line, warning=warning)
+
+    def _parse_error(self, info_line: str, match: re.Match) -> DCM2NIIX_EVENT:
+        error = match.group(1)
+        self.errors.append(error)
+        return DCM2NIIX_EVENT(DCM2NIIX_EVENT.ERROR, info_line, error=error)
+
+    def _parse_found(self, info_line: str, match: re.Match) -> DCM2NIIX_EVENT:
+        self.n_dicoms = int(match.group(1))
+        return DCM2NIIX_EVENT(DCM2NIIX_EVENT.FOUND, info_line, n_dicoms=self.n_dicoms)
+
+    def _parse_skipped(self, info_line: str, match: re.Match) -> DCM2NIIX_EVENT:
+        self.skipped.append(match.group(1))
+        return DCM2NIIX_EVENT(DCM2NIIX_EVENT.SKIPPED, info_line, reason=match.group(1))
+
+    def _parse_timing(self, info_line: str, match: re.Match) -> DCM2NIIX_EVENT:
+        self.conversion_time = float(match.group(1))
+        return DCM2NIIX_EVENT(DCM2NIIX_EVENT.TIMING, info_line, seconds=self.conversion_time)
+
+    def _parse_progress(self, info_line: str, match: re.Match) -> DCM2NIIX_EVENT:
+        percentage = float(match.group(1))
+        if match.group(2) != "%" and percentage <= 1:
+            # Progress is reported as a fraction
+            percentage = percentage * 100
+        self.progress = percentage
+        return DCM2NIIX_EVENT(DCM2NIIX_EVENT.PROGRESS, info_line, percentage=percentage)
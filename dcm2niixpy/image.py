@@ -0,0 +1,234 @@
+import json
+import math
+import struct
+
+from typing import Dict
+from typing import Optional
+from typing import Tuple
+
+
+NIFTI1_HEADER_SIZE = 348
+
+# Fields of the NIfTI-1 header that are read: name, offset and struct format
+NIFTI1_HEADER_FIELDS = [
+    ("dim", 40, "8h"),
+    ("datatype", 70, "h"),
+    ("bitpix", 72, "h"),
+    ("pixdim", 76, "8f"),
+    ("vox_offset", 108, "f"),
+    ("scl_slope", 112, "f"),
+    ("scl_inter", 116, "f"),
+    ("qform_code", 252, "h"),
+    ("sform_code", 254, "h"),
+    ("quatern_b", 256, "f"),
+    ("quatern_c", 260, "f"),
+    ("quatern_d", 264, "f"),
+    ("qoffset_x", 268, "f"),
+    ("qoffset_y", 272, "f"),
+    ("qoffset_z", 276, "f"),
+    ("srow_x", 280, "4f"),
+    ("srow_y", 296, "4f"),
+    ("srow_z", 312, "4f"),
+    ("magic", 344, "4s"),
+]
+
+# NIfTI datatype codes and the corresponding numpy types
+NIFTI1_DATATYPES = {
+    2: "u1",
+    4: "i2",
+    8: "i4",
+    16: "f4",
+    32: "c8",
+    64: "f8",
+    128: [("R", "u1"), ("G", "u1"), ("B", "u1")],
+    256: "i1",
+    512: "u2",
+    768: "u4",
+    1024: "i8",
+    1280: "u8",
+    1792: "c16",
+}
+
+
+def read_nifti_header(file_path: str) -> Dict[str, object]:
+    """
+    Read the header of an uncompressed NIfTI-1 file.
+
+    Args:
+        file_path (str): Path to the NIfTI file.
+
+    Raises:
+        ValueError: If the file is not a single file NIfTI-1 file.
+
+    Returns:
+        Dict[str, object]: The header fields, and the byte order of the file as "endian".
+    """
+    with open(file_path, "rb") as nifti_file:
+        header_data = nifti_file.read(NIFTI1_HEADER_SIZE)
+
+    if len(header_data) < NIFTI1_HEADER_SIZE:
+        raise ValueError("'{file_path}' is not a NIfTI-1 file".format(file_path=file_path))
+
+    # The byte order is determined from the header size, which is always 348
+    for i_endian in ["<", ">"]:
+        if struct.unpack_from(i_endian + "i", header_data)[0] == NIFTI1_HEADER_SIZE:
+            endian = i_endian
+            break
+    else:
+        raise ValueError("'{file_path}' is not a NIfTI-1 file".format(file_path=file_path))
+
+    header: Dict[str, object] = {"endian": endian}
+    for i_name, i_offset, i_format in NIFTI1_HEADER_FIELDS:
+        value = struct.unpack_from(endian + i_format, header_data, i_offset)
+        header[i_name] = value if len(value) > 1 else value[0]
+
+    if header["magic"] != b"n+1\x00":
+        raise ValueError(
+            "'{file_path}' is not a single file NIfTI-1 file".format(file_path=file_path)
+        )
+    return header
+
+
+class DCM2NIIX_IMAGE:
+    def __init__(self, image_path: str, sidecar_path: Optional[str] = None) -> None:
+        """
+        A converted image, of which the header, data and sidecar are read when they are first used.
+
+        The data is memory-mapped, so it is only read from disk when it is accessed. Reading the
+        data and the affine requires numpy, which can be installed with ``pip install
+        dcm2niixpy[arrays]``.
+
+        Args:
+            image_path (str): Path of the uncompressed NIfTI-1 file.
+            sidecar_path (Optional[str], optional): Path of the BIDS sidecar. Defaults to None.
+        """
+        self.image_path = image_path
+        self.sidecar_path = sidecar_path
+
+        self._header: Optional[Dict[str, object]] = None
+        self._data = None
+        self._sidecar: Optional[dict] = None
+
+    @property
+    def header(self) -> Dict[str, object]:
+        """
+        The NIfTI header.
+
+        Returns:
+            Dict[str, object]: The header fields.
+        """
+        if self._header is None:
+            self._header = read_nifti_header(self.image_path)
+        return self._header
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        """
+        The shape of the image.
+
+        Returns:
+            Tuple[int, ...]: The size of every dimension.
+        """
+        dim = self.header["dim"]
+        return tuple(dim[1 : dim[0] + 1])
+
+    @property
+    def affine(self):
+        """
+        The affine from voxel indices to world coordinates.
+
+        The sform is used if it is set, otherwise the qform, otherwise only the voxel sizes.
+
+        Returns:
+            numpy.ndarray: The 4x4 affine.
+        """
+        numpy = _import_numpy()
+        header = self.header
+        pixdim = header["pixdim"]
+
+        if header["sform_code"] > 0:
+            return numpy.array(
+                [header["srow_x"], header["srow_y"], header["srow_z"], [0, 0, 0, 1]],
+                dtype=float,
+            )
+
+        affine = numpy.eye(4)
+        if header["qform_code"] > 0:
+            b, c, d = header["quatern_b"], header["quatern_c"], header["quatern_d"]
+            a = math.sqrt(max(0.0, 1.0 - (b * b + c * c + d * d)))
+            rotation = numpy.array(
+                [
+                    [a * a + b * b - c * c - d * d, 2 * (b * c - a * d), 2 * (b * d + a * c)],
+                    [2 * (b * c + a * d), a * a + c * c - b * b - d * d, 2 * (c * d - a * b)],
+                    [2 * (b * d - a * c), 2 * (c * d + a * b), a * a + d * d - c * c - b * b],
+                ]
+            )
+            # pixdim[0] holds the handedness of the qform
+            qfac = -1.0 if pixdim[0] < 0 else 1.0
+            affine[:3, :3] = rotation * [pixdim[1], pixdim[2], pixdim[3] * qfac]
+            affine[:3, 3] = [header["qoffset_x"], header["qoffset_y"], header["qoffset_z"]]
+        else:
+            affine[:3, :3] = numpy.diag(pixdim[1:4])
+        return affine
+
+    @property
+    def data(self):
+        """
+        The image data, memory-mapped from the NIfTI file.
+
+        The stored values are returned, the scaling in ``scl_slope`` and ``scl_inter`` is not
+        applied.
+
+        Raises:
+            ValueError: If the datatype of the image is not supported.
+
+        Returns:
+            numpy.memmap: The read-only image data, in the shape of the image.
+        """
+        if self._data is None:
+            numpy = _import_numpy()
+            header = self.header
+            datatype = NIFTI1_DATATYPES.get(header["datatype"])
+            if datatype is None:
+                raise ValueError(
+                    "NIfTI datatype {datatype} is not supported".format(datatype=header["datatype"])
+                )
+            if isinstance(datatype, str):
+                dtype = numpy.dtype(header["endian"] + datatype)
+            else:
+                dtype = numpy.dtype(datatype)
+            self._data = numpy.memmap(
+                self.image_path,
+                dtype=dtype,
+                mode="r",
+                offset=int(header["vox_offset"]),
+                shape=self.shape,
+                order="F",
+            )
+        return self._data
+
+    @property
+    def sidecar(self) -> Optional[dict]:
+        """
+        The BIDS sidecar.
+
+        Returns:
+            Optional[dict]: The sidecar, or None if there is no sidecar.
+        """
+        if self._sidecar is None and self.sidecar_path is not None:
+            with open(self.sidecar_path) as sidecar_file:
+                self._sidecar = json.load(sidecar_file)
+        return self._sidecar
+
+    def __repr__(self) -> str:
+        return "DCM2NIIX_IMAGE(image_path={image_path!r})".format(image_path=self.image_path)
+
+
+def _import_numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError(
+            "numpy is required to read image data, install it with 'pip install dcm2niixpy[arrays]'"
+        )
+    return numpy
@@ -0,0 +1,270 @@
+import contextlib
+import hashlib
+import json
+import os
+import uuid
+
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    # File locks are not available on Windows, downloads are then not protected against races
+    fcntl = None
+
+
+class DCM2NIIX_IMAGE_CACHE:
+    def __init__(
+        self, cache_folder: str, max_size: int = None, digests: Dict[str, str] = None
+    ) -> None:
+        """
+        Initialize a container image cache that can be shared by multiple processes.
+
+        Every image is downloaded at most once: a process that needs an image that is being
+        downloaded by another process waits for that download instead of starting its own.
+        Images are downloaded to a temporary file that is renamed when the download is complete,
+        and the SHA-256 digest of every image is recorded next to it.
+
+        Args:
+            cache_folder (str): Folder in which the images are stored.
+            max_size (int, optional): Maximum total size of the images in bytes, the least recently used images are removed when it is exceeded. Defaults to None, for no limit.
+            digests (Dict[str, str], optional): Expected SHA-256 digest of images, by image name. Defaults to None.
+        """
+        self.cache_folder = cache_folder
+        self.max_size = max_size
+        self.digests = dict(digests or {})
+
+        self.METADATA_EXTENSION = ".json"
+        self.LOCK_EXTENSION = ".lock"
+        self.TEMPORARY_PREFIX = ".tmp_"
+
+        os.makedirs(self.cache_folder, exist_ok=True)
+
+    ######
+    # Images
+    ######
+
+    def get(self, image_url: str, name: str, metrics=None) -> str:
+        """
+        Get an image, downloading it if it is not in the cache.
+
+        Args:
+            image_url (str): URL of the image, as passed to ``singularity pull``.
+            name (str): File name of the image in the cache.
+            metrics (DCM2NIIX_METRICS, optional): Metrics to record the download in. Defaults to None.
+
+        Raises:
+            ValueError: If the downloaded image does not have the expected digest.
+
+        Returns:
+            str: Path to the image.
+        """
+        image_file = os.path.join(self.cache_folder, name)
+
+        with self._lock(name):
+            if self._is_valid(name):
+                # Mark as recently used
+                os.utime(self._metadata_file(name))
+                if metrics is not None:
+                    metrics.count("cache_hits")
+            else:
+                self._pull_image(image_url, name, metrics)
+
+        self._evict(keep=name)
+        return image_file
+
+    def verify(self, name: str) -> bool:
+        """
+        Verify an image against its recorded digest, by reading the complete image.
+
+        Args:
+            name (str): File name of the image in the cache.
+
+        Returns:
+            bool: True if the image exists and matches its recorded digest.
+        """
+        metadata = self._read_metadata(name)
+        if metadata is None:
+            return False
+        try:
+            return self._hash_file(os.path.join(self.cache_folder, name)) == metadata["sha256"]
+        except OSError:
+            return False
+
+    @property
+    def images(self) -> List[str]:
+        """
+        The names of the images in the cache.
+
+        Returns:
+            List[str]: The file names of the images.
+        """
+        return sorted(
+            i_file[: -len(self.METADATA_EXTENSION)]
+            for i_file in os.listdir(self.cache_folder)
+            if i_file.endswith(self.METADATA_EXTENSION)
+            and os.path.isfile(
+                os.path.join(self.cache_folder, i_file[: -len(self.METADATA_EXTENSION)])
+            )
+        )
+
+    @property
+    def size(self) -> int:
+        """
+        Total size of the images in the cache.
+
+        Returns:
+            int: Size of the cache in bytes.
+        """
+        return sum(
+            os.path.getsize(os.path.join(self.cache_folder, i_name)) for i_name in self.images
+        )
+
+    ######
+    # Downloading
+    ######
+
+    def _pull_image(self, image_url: str, name: str, metrics=None) -> None:
+        image_file = os.path.join(self.cache_folder, name)
+        # Pull to a temporary file, so that an image is never visible half-written
+        temporary_name = self.TEMPORARY_PREFIX + uuid.uuid4().hex + "_" + name
+        temporary_file = os.path.join(self.cache_folder, temporary_name)
+        try:
+            if metrics is not None:
+                with metrics.span("pull"):
+                    self._pull(image_url, temporary_name)
+            else:
+                self._pull(image_url, temporary_name)
+
+            digest = self._hash_file(temporary_file)
+            expected_digest = self.digests.get(name)
+            if expected_digest is not None and digest != expected_digest:
+                raise ValueError(
+                    "The image '{image_url}' has digest '{digest}', but digest '{expected_digest}' was expected".format(
+                        image_url=image_url, digest=digest, expected_digest=expected_digest
+                    )
+                )
+
+            size = os.path.getsize(temporary_file)
+            os.replace(temporary_file, image_file)
+        finally:
+            if os.path.exists(temporary_file):
+                os.remove(temporary_file)
+
+        self._write_metadata(name, {"image_url": image_url, "sha256": digest, "size": size})
+        if metrics is not None:
+            metrics.count("bytes_downloaded", size)
+
+    def _pull(self, image_url: str, name: str) -> None:
+        from spython.main import Client
+
+        Client.pull(image=image_url, pull_folder=self.cache_folder, ext="sif", name=name)
+
+    ######
+    # Eviction
+    ######
+
+    def _evict(self, keep: str) -> None:
+        if self.max_size is None:
+            return
+
+        entries = []
+        for i_name in self.images:
+            try:
+                last_used = os.stat(self._metadata_file(i_name)).st_mtime
+                size = os.path.getsize(os.path.join(self.cache_folder, i_name))
+            except OSError:
+                continue
+            entries.append((last_used, i_name, size))
+
+        total_size = sum(i_entry[2] for i_entry in entries)
+        for _, i_name, i_size in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            if i_name == keep:
+                continue
+            # Images that are being downloaded or checked by another process are skipped
+            with self._lock(i_name, blocking=False) as locked:
+                if not locked:
+                    continue
+                self._remove_image(i_name)
+            total_size -= i_size
+
+    ######
+    # Helper functions
+    ######
+
+    @contextlib.contextmanager
+    def _lock(self, name: str, blocking: bool = True) -> Iterator[bool]:
+        lock_file = os.path.join(self.cache_folder, "." + name + self.LOCK_EXTENSION)
+        with open(lock_file, "a") as lock:
+            if fcntl is None:
+                yield True
+                return
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _is_valid(self, name: str) -> bool:
+        image_file = os.path.join(self.cache_folder, name)
+        metadata = self._read_metadata(name)
+        if metadata is None:
+            if not os.path.isfile(image_file):
+                return False
+            # An image downloaded before the cache was used, record its digest
+            metadata = {
+                "image_url": None,
+                "sha256": self._hash_file(image_file),
+                "size": os.path.getsize(image_file),
+            }
+            self._write_metadata(name, metadata)
+
+        try:
+            size = os.path.getsize(image_file)
+        except OSError:
+            return False
+        if size != metadata["size"]:
+            return False
+
+        expected_digest = self.digests.get(name)
+        return expected_digest is None or metadata["sha256"] == expected_digest
+
+    def _metadata_file(self, name: str) -> str:
+        return os.path.join(self.cache_folder, name + self.METADATA_EXTENSION)
+
+    def _read_metadata(self, name: str) -> Optional[dict]:
+        try:
+            with open(self._metadata_file(name)) as metadata_file:
+                return json.load(metadata_file)
+        except (OSError, ValueError):
+            return None
+
+    def _write_metadata(self, name: str, metadata: dict) -> None:
+        temporary_file = self._metadata_file(name) + self.TEMPORARY_PREFIX + uuid.uuid4().hex
+        with open(temporary_file, "w") as metadata_file:
+            json.dump(metadata, metadata_file)
+        os.replace(temporary_file, self._metadata_file(name))
+
+    def _remove_image(self, name: str) -> None:
+        for i_file in [os.path.join(self.cache_folder, name), self._metadata_file(name)]:
+            try:
+                os.remove(i_file)
+            except OSError:
+                pass
+
+    @staticmethod
+    def _hash_file(file_path: str) -> str:
+        file_hash = hashlib.sha256()
+        with open(file_path, "rb") as input_file:
+            for i_chunk in iter(lambda: input_file.read(1024 * 1024), b""):
+                file_hash.update(i_chunk)
+        return file_hash.hexdigest()
@@ -0,0 +1,74 @@
+import contextlib
+import time
+
+from typing import Dict
+from typing import Iterator
+
+
+class DCM2NIIX_METRICS:
+    def __init__(self, name: str) -> None:
+        """
+        Timings and counters measured during a single operation.
+
+        Timings are in seconds and are accumulated per stage, so that a stage that is entered
+        multiple times reports its total time.
+
+        Args:
+            name (str): Name of the operation that was measured, e.g. "convert" or "download".
+        """
+        self.name = name
+        self.timings: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {}
+
+    @contextlib.contextmanager
+    def span(self, stage: str) -> Iterator[None]:
+        """
+        Time the code within the context as a stage.
+
+        For example::
+
+            with metrics.span("parse"):
+                output_info.parse_output(output)
+
+        Args:
+            stage (str): Name of the stage.
+        """
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - start_time)
+
+    def add_time(self, stage: str, seconds: float) -> None:
+        """
+        Add time to a stage.
+
+        Args:
+            stage (str): Name of the stage.
+            seconds (float): Time spent in the stage.
+        """
+        self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+
+    def count(self, counter: str, value: int = 1) -> None:
+        """
+        Increase a counter.
+
+        Args:
+            counter (str): Name of the counter.
+            value (int, optional): Value to add. Defaults to 1.
+        """
+        self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def to_dict(self) -> dict:
+        """
+        Convert the metrics to a dictionary that can be stored as JSON.
+
+        Returns:
+            dict: The metrics.
+        """
+        return {"name": self.name, "timings": dict(self.timings), "counters": dict(self.counters)}
+
+    def __repr__(self) -> str:
+        return "DCM2NIIX_METRICS(name={name!r}, timings={timings!r}, counters={counters!r})".format(
+            name=self.name, timings=self.timings, counters=self.counters
+        )
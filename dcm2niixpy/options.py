@@ -0,0 +1,103 @@
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+
+
+class DCM2NIIX_OPTION:
+    def __init__(
+        self,
+        key: str,
+        setting_name: str = None,
+        settings_conversion: Dict[object, str] = None,
+        valid_settings: List[object] = None,
+        valid_setting_types: List[type] = None,
+        read: Callable[[str], object] = None,
+        optional: bool = False,
+        doc: str = None,
+    ) -> None:
+        """
+        A dcm2niix option, that is exposed as a property of DCM2NIIX.
+
+        The options are declared once, when the DCM2NIIX class is created, so that setting an
+        option does not build its conversion and validation tables every time. Setting an
+        option checks the type of the setting if ``valid_setting_types`` is given, converts it
+        with ``settings_conversion`` and checks the result against ``valid_settings``, in that
+        order.
+
+        Args:
+            key (str): Key of the option in ``DCM2NIIX.options``, the dcm2niix argument for most options.
+            setting_name (str, optional): Name of the setting in error messages. Defaults to None.
+            settings_conversion (Dict[object, str], optional): Conversion from the settings that can be passed to the dcm2niix values. Defaults to None, for no conversion.
+            valid_settings (List[object], optional): The valid values after conversion. Defaults to None, for no validation.
+            valid_setting_types (List[type], optional): The valid types of the settings that can be passed. Defaults to None, for no type check.
+            read (Callable[[str], object], optional): Conversion of the stored value when the option is read. Defaults to None, for no conversion.
+            optional (bool, optional): Whether the option has no default, in which case None is returned when it is not set. Defaults to False.
+            doc (str, optional): Docstring of the property. Defaults to None.
+        """
+        self.key = key
+        self.setting_name = setting_name
+        self.settings_conversion = settings_conversion
+        self.valid_settings = valid_settings
+        self.valid_setting_types = valid_setting_types
+        self.read = read
+        self.optional = optional
+        self.name: Optional[str] = None
+        self.__doc__ = doc
+
+    def __set_name__(self, owner: type, name: str) -> None:
+        self.name = name
+
+    def __get__(self, instance, owner: type = None):
+        if instance is None:
+            return self
+        if self.optional and self.key not in instance.options:
+            return None
+        value = instance.options[self.key]
+        if self.read is not None:
+            return self.read(value)
+        return value
+
+    def __set__(self, instance, setting) -> None:
+        instance._set_option(self.key, self.validate(instance, setting))
+
+    def validate(self, instance, setting) -> object:
+        """
+        Check a setting of the option and convert it to the dcm2niix value, without storing it.
+
+        Args:
+            instance (DCM2NIIX): The object the setting is for, of which the checks are used.
+            setting: The setting.
+
+        Returns:
+            object: The value of the option.
+        """
+        # The checks of DCM2NIIX are only called to raise their errors
+        if self.valid_setting_types is not None and type(setting) not in self.valid_setting_types:
+            instance._check_valid_setting_type(
+                self.setting_name, self.valid_setting_types, type(setting)
+            )
+        if self.settings_conversion is not None and setting in self.settings_conversion:
+            setting = self.settings_conversion[setting]
+        if self.valid_settings is not None and setting not in self.valid_settings:
+            instance._check_valid_setting(self.setting_name, self.valid_settings, setting)
+        return setting
+
+    def __repr__(self) -> str:
+        return "DCM2NIIX_OPTION(name={name!r}, key={key!r})".format(name=self.name, key=self.key)
+
+
+YES_NO = {"y": True, "n": False}
+
+
+def read_yes_no(value: str) -> object:
+    """
+    Read a y/n option as a bool.
+
+    Args:
+        value (str): The stored value.
+
+    Returns:
+        object: True for "y", False for "n", otherwise the value itself.
+    """
+    return YES_NO.get(value, value)
@@ -0,0 +1,253 @@
+import contextlib
+import os
+import threading
+
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Set
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    # Process limits are not available on Windows, the memory limit is then not applied natively
+    resource = None
+
+
+class DCM2NIIX_LIMITS:
+    def __init__(
+        self,
+        cpus: float = None,
+        cpu_shares: int = None,
+        cpuset_cpus: str = None,
+        memory: int = None,
+        blkio_weight: int = None,
+    ) -> None:
+        """
+        Resource limits of a single conversion.
+
+        For docker and singularity the limits are passed to the container runtime, which applies
+        them with cgroups. Singularity needs version 3.9 or newer, and cgroups that can be managed
+        by the user when running without root. For the native backend the memory limit and the
+        CPU set are applied to the dcm2niix process directly, the other limits are ignored.
+
+        Args:
+            cpus (float, optional): Number of CPUs the conversion may use. Defaults to None.
+            cpu_shares (int, optional): Relative CPU weight compared to other containers, docker uses 1024 by default. Defaults to None.
+            cpuset_cpus (str, optional): The CPUs the conversion may run on, e.g. "0-3,6". Defaults to None.
+            memory (int, optional): Maximum memory of the conversion in bytes. Defaults to None.
+            blkio_weight (int, optional): Relative block I/O weight, between 10 and 1000. Defaults to None.
+
+        Raises:
+            ValueError: If a limit has an invalid value.
+        """
+        if cpus is not None and cpus <= 0:
+            raise ValueError("cpus should be larger than 0, not {cpus}".format(cpus=cpus))
+        if cpu_shares is not None and cpu_shares < 2:
+            raise ValueError(
+                "cpu_shares should be at least 2, not {cpu_shares}".format(cpu_shares=cpu_shares)
+            )
+        if memory is not None and memory <= 0:
+            raise ValueError("memory should be larger than 0, not {memory}".format(memory=memory))
+        if blkio_weight is not None and not 10 <= blkio_weight <= 1000:
+            raise ValueError(
+                "blkio_weight should be between 10 and 1000, not {blkio_weight}".format(
+                    blkio_weight=blkio_weight
+                )
+            )
+        if cpuset_cpus is not None:
+            # Raises an error for an invalid CPU set
+            self.parse_cpuset(cpuset_cpus)
+
+        self.cpus = cpus
+        self.cpu_shares = cpu_shares
+        self.cpuset_cpus = cpuset_cpus
+        self.memory = memory
+        self.blkio_weight = blkio_weight
+
+    def container_options(self) -> List[str]:
+        """
+        The options that apply the limits to ``docker run`` or ``singularity run``.
+
+        Returns:
+            List[str]: The command line options.
+        """
+        options = []
+        if self.cpus is not None:
+            options.extend(["--cpus", str(self.cpus)])
+        if self.cpu_shares is not None:
+            options.extend(["--cpu-shares", str(self.cpu_shares)])
+        if self.cpuset_cpus is not None:
+            options.extend(["--cpuset-cpus", self.cpuset_cpus])
+        if self.memory is not None:
+            options.extend(["--memory", str(self.memory)])
+        if self.blkio_weight is not None:
+            options.extend(["--blkio-weight", str(self.blkio_weight)])
+        return options
+
+    def with_defaults(self, default_limits: Optional["DCM2NIIX_LIMITS"]) -> "DCM2NIIX_LIMITS":
+        """
+        Combine the limits with default limits.
+
+        Args:
+            default_limits (Optional[DCM2NIIX_LIMITS]): The default limits, used for every limit that is not set.
+
+        Returns:
+            DCM2NIIX_LIMITS: The combined limits.
+        """
+        if default_limits is None:
+            return self
+        return DCM2NIIX_LIMITS(
+            **{
+                i_name: getattr(self, i_name)
+                if getattr(self, i_name) is not None
+                else getattr(default_limits, i_name)
+                for i_name in ["cpus", "cpu_shares", "cpuset_cpus", "memory", "blkio_weight"]
+            }
+        )
+
+    def apply_to_process(self, pid: int) -> None:
+        """
+        Apply the memory limit and CPU set to a running process.
+
+        The limits are applied after the process is started instead of in the child process
+        before dcm2niix is executed, since that is not safe when conversions are started from
+        multiple threads. dcm2niix only allocates most of its memory after it has read the
+        DICOM headers, so the limits are in place before they matter.
+
+        Args:
+            pid (int): The process ID of dcm2niix.
+        """
+        if self.memory is not None and resource is not None and hasattr(resource, "prlimit"):
+            resource.prlimit(pid, resource.RLIMIT_AS, (self.memory, self.memory))
+        if self.cpuset_cpus is not None and hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(pid, self.parse_cpuset(self.cpuset_cpus))
+
+    @staticmethod
+    def parse_cpuset(cpuset_cpus: str) -> Set[int]:
+        """
+        Parse a CPU set in the format used by docker and cgroups.
+
+        Args:
+            cpuset_cpus (str): The CPU set, e.g. "0-3,6".
+
+        Raises:
+            ValueError: If the CPU set is invalid.
+
+        Returns:
+            Set[int]: The CPU numbers.
+        """
+        cpus = set()
+        try:
+            for i_part in cpuset_cpus.split(","):
+                first, _, last = i_part.strip().partition("-")
+                first_cpu = int(first)
+                last_cpu = int(last) if last else first_cpu
+                if first_cpu < 0 or last_cpu < first_cpu:
+                    raise ValueError
+                cpus.update(range(first_cpu, last_cpu + 1))
+        except ValueError:
+            raise ValueError(
+                "'{cpuset_cpus}' is not a valid CPU set, e.g. '0-3,6'".format(
+                    cpuset_cpus=cpuset_cpus
+                )
+            )
+        return cpus
+
+    def __repr__(self) -> str:
+        return "DCM2NIIX_LIMITS(cpus={cpus!r}, cpu_shares={cpu_shares!r}, cpuset_cpus={cpuset_cpus!r}, memory={memory!r}, blkio_weight={blkio_weight!r})".format(
+            cpus=self.cpus,
+            cpu_shares=self.cpu_shares,
+            cpuset_cpus=self.cpuset_cpus,
+            memory=self.memory,
+            blkio_weight=self.blkio_weight,
+        )
+
+
+class DCM2NIIX_ADMISSION:
+    def __init__(self, max_size: int, max_conversions: int = None) -> None:
+        """
+        Initialize admission control, which limits the conversions that run at the same time by their input size.
+
+        The memory dcm2niix needs grows with the size of the input, so a budget of input bytes
+        keeps the memory use of a node stable: many small conversions run together, while a large
+        4D series waits until enough of the budget is free. A conversion that is larger than the
+        complete budget is admitted when no other conversion is running.
+
+        Args:
+            max_size (int): Total input size in bytes of the conversions that may run at the same time.
+            max_conversions (int, optional): Maximum number of conversions that may run at the same time. Defaults to None, for no limit.
+        """
+        self.max_size = max_size
+        self.max_conversions = max_conversions
+
+        self._admitted_size = 0
+        self._n_admitted = 0
+        self._condition = threading.Condition()
+
+    @contextlib.contextmanager
+    def admit(self, size: int) -> Iterator[None]:
+        """
+        Wait until a conversion of the given input size can run, and run it within the context.
+
+        For example::
+
+            with admission.admit(input_size):
+                output_info = dcm2niix.convert(input_path)
+
+        Args:
+            size (int): Input size of the conversion in bytes.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._fits(size))
+            self._admitted_size += size
+            self._n_admitted += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._admitted_size -= size
+                self._n_admitted -= 1
+                self._condition.notify_all()
+
+    @property
+    def admitted_size(self) -> int:
+        """
+        Total input size of the conversions that are running.
+
+        Returns:
+            int: The size in bytes.
+        """
+        with self._condition:
+            return self._admitted_size
+
+    @staticmethod
+    def input_size(input_path: str) -> int:
+        """
+        Estimate the size of a conversion from its input.
+
+        Args:
+            input_path (str): The DICOM folder.
+
+        Returns:
+            int: Total size of the files in the folder in bytes.
+        """
+        size = 0
+        for i_root, _, i_files in os.walk(input_path):
+            for i_file in i_files:
+                try:
+                    size += os.path.getsize(os.path.join(i_root, i_file))
+                except OSError:
+                    continue
+        return size
+
+    ######
+    # Helper functions
+    ######
+
+    def _fits(self, size: int) -> bool:
+        if self._n_admitted == 0:
+            return True
+        if self.max_conversions is not None and self._n_admitted >= self.max_conversions:
+            return False
+        return self._admitted_size + size <= self.max_size
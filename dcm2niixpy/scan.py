@@ -0,0 +1,361 @@
+import json
+import os
+import shutil
+import struct
+
+from typing import Dict
+from typing import List
+from typing import Optional
+
+
+IMPLICIT_VR_LITTLE_ENDIAN = "1.2.840.10008.1.2"
+EXPLICIT_VR_BIG_ENDIAN = "1.2.840.10008.1.2.2"
+DEFLATED_EXPLICIT_VR_LITTLE_ENDIAN = "1.2.840.10008.1.2.1.99"
+
+# VRs that have a 2 byte reserved field followed by a 4 byte length in explicit VR
+LONG_LENGTH_VRS = {
+    b"OB",
+    b"OD",
+    b"OF",
+    b"OL",
+    b"OV",
+    b"OW",
+    b"SQ",
+    b"SV",
+    b"UC",
+    b"UN",
+    b"UR",
+    b"UT",
+    b"UV",
+}
+
+UNDEFINED_LENGTH = 0xFFFFFFFF
+ITEM_TAG = (0xFFFE, 0xE000)
+ITEM_DELIMITATION_TAG = (0xFFFE, 0xE00D)
+SEQUENCE_DELIMITATION_TAG = (0xFFFE, 0xE0DD)
+
+# The tags that are read from the header, parsing stops after the last one
+HEADER_TAGS = {
+    (0x0002, 0x0010): "transfer_syntax_uid",
+    (0x0008, 0x103E): "series_description",
+    (0x0020, 0x000D): "study_instance_uid",
+    (0x0020, 0x000E): "series_instance_uid",
+    (0x0020, 0x0011): "series_number",
+    (0x0028, 0x0010): "rows",
+    (0x0028, 0x0011): "columns",
+}
+LAST_HEADER_TAG = max(HEADER_TAGS)
+
+
+def read_dicom_header(file_path: str) -> Optional[Dict[str, object]]:
+    """
+    Read the header tags needed to index a DICOM file.
+
+    Only the preamble and the elements up to the last needed tag are read, the pixel data is never
+    touched.
+
+    Args:
+        file_path (str): Path to the file.
+
+    Returns:
+        Optional[Dict[str, object]]: The header tags, or None if the file is not a DICOM file that can be read.
+    """
+    try:
+        with open(file_path, "rb") as dicom_file:
+            dicom_file.seek(128)
+            if dicom_file.read(4) != b"DICM":
+                return None
+            reader = _DICOM_READER(dicom_file)
+            return reader.read_header()
+    except (OSError, struct.error, ValueError):
+        return None
+
+
+class _DICOM_READER:
+    def __init__(self, dicom_file) -> None:
+        self.dicom_file = dicom_file
+        self.explicit_vr = True
+        self.endian = "<"
+        self.header: Dict[str, object] = {}
+
+    def read_header(self) -> Optional[Dict[str, object]]:
+        # The file meta information is always explicit VR little endian
+        while True:
+            position = self.dicom_file.tell()
+            tag = self._read_tag()
+            if tag is None:
+                return self.header
+            if tag[0] != 0x0002:
+                self.dicom_file.seek(position)
+                break
+            self._read_element(tag)
+
+        transfer_syntax = self.header.get("transfer_syntax_uid")
+        if transfer_syntax == DEFLATED_EXPLICIT_VR_LITTLE_ENDIAN:
+            return None
+        if transfer_syntax == IMPLICIT_VR_LITTLE_ENDIAN:
+            self.explicit_vr = False
+        elif transfer_syntax == EXPLICIT_VR_BIG_ENDIAN:
+            self.endian = ">"
+
+        while True:
+            tag = self._read_tag()
+            if tag is None or tag > LAST_HEADER_TAG:
+                return self.header
+            self._read_element(tag)
+
+    def _read_tag(self) -> Optional[tuple]:
+        data = self.dicom_file.read(4)
+        if len(data) < 4:
+            return None
+        return struct.unpack(self.endian + "HH", data)
+
+    def _read_length(self, tag: tuple) -> tuple:
+        if not self.explicit_vr or tag[0] == 0xFFFE:
+            return None, struct.unpack(self.endian + "I", self.dicom_file.read(4))[0]
+
+        vr = self.dicom_file.read(2)
+        if vr in LONG_LENGTH_VRS:
+            self.dicom_file.read(2)
+            return vr, struct.unpack(self.endian + "I", self.dicom_file.read(4))[0]
+        return vr, struct.unpack(self.endian + "H", self.dicom_file.read(2))[0]
+
+    def _read_element(self, tag: tuple) -> None:
+        vr, length = self._read_length(tag)
+        if length == UNDEFINED_LENGTH:
+            self._skip_sequence()
+            return
+
+        name = HEADER_TAGS.get(tag)
+        if name is None:
+            self.dicom_file.seek(length, os.SEEK_CUR)
+            return
+
+        value = self.dicom_file.read(length)
+        if tag in [(0x0028, 0x0010), (0x0028, 0x0011)]:
+            self.header[name] = struct.unpack(self.endian + "H", value[:2])[0]
+        elif tag == (0x0020, 0x0011):
+            series_number = value.decode("ascii", errors="replace").strip(" \x00")
+            self.header[name] = int(series_number) if series_number.lstrip("-").isdigit() else None
+        else:
+            self.header[name] = value.decode("ascii", errors="replace").strip(" \x00")
+
+    def _skip_sequence(self) -> None:
+        # Items of a sequence of undefined length are skipped element by element
+        while True:
+            tag = self._read_tag()
+            if tag is None or tag == SEQUENCE_DELIMITATION_TAG:
+                self.dicom_file.read(4)
+                return
+            length = struct.unpack(self.endian + "I", self.dicom_file.read(4))[0]
+            if tag != ITEM_TAG:
+                raise ValueError("Unexpected tag in sequence")
+            if length != UNDEFINED_LENGTH:
+                self.dicom_file.seek(length, os.SEEK_CUR)
+                continue
+            while True:
+                item_tag = self._read_tag()
+                if item_tag is None:
+                    return
+                if item_tag == ITEM_DELIMITATION_TAG:
+                    self.dicom_file.read(4)
+                    break
+                _, item_length = self._read_length(item_tag)
+                if item_length == UNDEFINED_LENGTH:
+                    self._skip_sequence()
+                else:
+                    self.dicom_file.seek(item_length, os.SEEK_CUR)
+
+
+class DICOM_SERIES:
+    def __init__(
+        self,
+        series_instance_uid: str,
+        study_instance_uid: str = None,
+        series_number: int = None,
+        series_description: str = None,
+        rows: int = None,
+        columns: int = None,
+    ) -> None:
+        """
+        A DICOM series found while scanning.
+
+        Args:
+            series_instance_uid (str): SeriesInstanceUID of the series.
+            study_instance_uid (str, optional): StudyInstanceUID of the series. Defaults to None.
+            series_number (int, optional): SeriesNumber of the series. Defaults to None.
+            series_description (str, optional): SeriesDescription of the series. Defaults to None.
+            rows (int, optional): Number of rows of the images. Defaults to None.
+            columns (int, optional): Number of columns of the images. Defaults to None.
+        """
+        self.series_instance_uid = series_instance_uid
+        self.study_instance_uid = study_instance_uid
+        self.series_number = series_number
+        self.series_description = series_description
+        self.rows = rows
+        self.columns = columns
+        self.files: List[str] = []
+        # The latest modification time of the files, in nanoseconds
+        self.modification_time = 0
+
+    @property
+    def size(self) -> int:
+        """
+        Total size of the files in the series.
+
+        Returns:
+            int: Size in bytes.
+        """
+        return sum(os.path.getsize(i_file) for i_file in self.files)
+
+    def stage(self, staging_folder: str) -> str:
+        """
+        Stage the files of the series in a folder of its own, so that the series can be converted separately.
+
+        Files are hard linked when possible, and copied otherwise.
+
+        Args:
+            staging_folder (str): Folder in which the series folder is created.
+
+        Returns:
+            str: The folder containing only the files of this series.
+        """
+        series_folder = os.path.join(staging_folder, self.series_instance_uid)
+        # Keep the name of the original folder, as it can be used in the output file name
+        files_folder = os.path.join(series_folder, os.path.basename(os.path.dirname(self.files[0])))
+        os.makedirs(files_folder, exist_ok=True)
+        for i_index, i_file in enumerate(self.files):
+            # Prefix with an index, as files in different folders can have the same name
+            staged_file = os.path.join(
+                files_folder,
+                "{index:06d}_{name}".format(index=i_index, name=os.path.basename(i_file)),
+            )
+            if os.path.exists(staged_file):
+                continue
+            try:
+                os.link(i_file, staged_file)
+            except OSError:
+                shutil.copy2(i_file, staged_file)
+        return series_folder
+
+    def __repr__(self) -> str:
+        return "DICOM_SERIES(series_instance_uid={uid!r}, n_files={n_files})".format(
+            uid=self.series_instance_uid, n_files=len(self.files)
+        )
+
+
+class DICOM_INDEX:
+    def __init__(self, index_file: str = None) -> None:
+        """
+        Index of DICOM files by series, made by reading only the DICOM headers.
+
+        When an index file is given the index is loaded from it if it exists, files that have not
+        changed since the previous scan are then not read again.
+
+        Args:
+            index_file (str, optional): JSON file to persist the index in. Defaults to None.
+        """
+        self.index_file = index_file
+        self.files: Dict[str, dict] = {}
+
+        if self.index_file is not None and os.path.exists(self.index_file):
+            with open(self.index_file) as index_file:
+                self.files = json.load(index_file)["files"]
+
+    def scan(self, root: str, max_workers: int = None) -> "DICOM_INDEX":
+        """
+        Scan a folder for DICOM files.
+
+        Files of which the size and modification time have not changed since the last scan are not
+        read again. Files that were removed are removed from the index.
+
+        Args:
+            root (str): Folder to scan, including all subfolders.
+            max_workers (int, optional): Number of files to read at the same time. Defaults to None, in which case a default of the ThreadPoolExecutor is used.
+
+        Returns:
+            DICOM_INDEX: The index itself.
+        """
+        root = os.path.abspath(root)
+        root_prefix = root.rstrip(os.sep) + os.sep
+
+        to_read = []
+        found_files = set()
+        for i_root, _, i_files in os.walk(root):
+            for i_file in i_files:
+                file_path = os.path.join(i_root, i_file)
+                file_stat = os.stat(file_path)
+                found_files.add(file_path)
+
+                entry = self.files.get(file_path)
+                if (
+                    entry is not None
+                    and entry["size"] == file_stat.st_size
+                    and entry["mtime"] == file_stat.st_mtime_ns
+                ):
+                    continue
+                to_read.append((file_path, file_stat.st_size, file_stat.st_mtime_ns))
+
+        for i_file in list(self.files):
+            if i_file.startswith(root_prefix) and i_file not in found_files:
+                del self.files[i_file]
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            headers = executor.map(read_dicom_header, [i_file[0] for i_file in to_read])
+            for (i_file, i_size, i_mtime), i_header in zip(to_read, headers):
+                self.files[i_file] = {"size": i_size, "mtime": i_mtime, "header": i_header}
+
+        return self
+
+    @property
+    def series(self) -> Dict[str, DICOM_SERIES]:
+        """
+        The series in the index.
+
+        Returns:
+            Dict[str, DICOM_SERIES]: The series, by SeriesInstanceUID.
+        """
+        series = {}
+        for i_file in sorted(self.files):
+            header = self.files[i_file]["header"]
+            if header is None or header.get("series_instance_uid") is None:
+                continue
+            series_uid = header["series_instance_uid"]
+            if series_uid not in series:
+                series[series_uid] = DICOM_SERIES(
+                    series_uid,
+                    header.get("study_instance_uid"),
+                    header.get("series_number"),
+                    header.get("series_description"),
+                    header.get("rows"),
+                    header.get("columns"),
+                )
+            series[series_uid].files.append(i_file)
+            series[series_uid].modification_time = max(
+                series[series_uid].modification_time, self.files[i_file]["mtime"]
+            )
+        return series
+
+    def save(self, index_file: str = None) -> None:
+        """
+        Save the index, so that a next scan only has to read new or changed files.
+
+        Args:
+            index_file (str, optional): JSON file to save to. Defaults to None, in which case the index file of the index is used.
+
+        Raises:
+            ValueError: If no index file is given and the index has no index file.
+        """
+        if index_file is None:
+            index_file = self.index_file
+        if index_file is None:
+            raise ValueError(
+                "The index has no index file, pass the file to save the index to as index_file"
+            )
+
+        temporary_file = index_file + ".tmp" + str(os.getpid())
+        with open(temporary_file, "w") as output_file:
+            json.dump({"files": self.files}, output_file)
+        os.replace(temporary_file, index_file)
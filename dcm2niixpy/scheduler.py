@@ -0,0 +1,205 @@
+import json
+import os
+import threading
+import uuid
+
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+
+class DCM2NIIX_SCHEDULER:
+    def __init__(self, history_file: str = None, max_history: int = 1000) -> None:
+        """
+        Initialize a scheduler that orders conversions by their estimated duration.
+
+        The longest conversions are started first, so that a large series does not start last and
+        keep the other workers waiting at the end of a batch. The duration of a conversion is
+        estimated from the number and size of its input files. The durations of previous
+        conversions are used to learn the time per file and per byte, and a conversion of an input
+        that was converted before, and has not changed since, is estimated to take as long as
+        before.
+
+        Args:
+            history_file (str, optional): JSON file in which the durations are kept between runs. Defaults to None, in which case the durations are only kept in memory.
+            max_history (int, optional): Number of most recent durations that are kept. Defaults to 1000.
+        """
+        self.history_file = history_file
+        self.max_history = max_history
+
+        # Used until there are durations to learn from: 1 ms per file and 100 MB per second
+        self.DEFAULT_SECONDS_PER_FILE = 1e-3
+        self.DEFAULT_SECONDS_PER_BYTE = 1e-8
+
+        self._samples: List[dict] = []
+        # The most recent sample of every input, for inputs that are converted again
+        self._last_samples: Dict[str, dict] = {}
+        self._rates: Optional[Tuple[float, float]] = None
+        self._lock = threading.Lock()
+
+        if self.history_file is not None and os.path.isfile(self.history_file):
+            with open(self.history_file) as input_file:
+                self._samples = json.load(input_file)["samples"][-self.max_history :]
+            for i_sample in self._samples:
+                self._last_samples[i_sample["input_path"]] = i_sample
+
+    ######
+    # Estimates
+    ######
+
+    @staticmethod
+    def measure(input_path: str) -> Tuple[int, int]:
+        """
+        Count the files in an input folder and their total size.
+
+        Args:
+            input_path (str): The DICOM folder.
+
+        Returns:
+            Tuple[int, int]: The number of files and their size in bytes.
+        """
+        n_files = 0
+        n_bytes = 0
+        for i_root, _, i_files in os.walk(input_path):
+            for i_file in i_files:
+                try:
+                    n_bytes += os.path.getsize(os.path.join(i_root, i_file))
+                except OSError:
+                    continue
+                n_files += 1
+        return n_files, n_bytes
+
+    def estimate(self, input_path: str, n_files: int = None, n_bytes: int = None) -> float:
+        """
+        Estimate the duration of a conversion.
+
+        Args:
+            input_path (str): The DICOM folder.
+            n_files (int, optional): Number of files in the folder. Defaults to None, in which case the folder is measured.
+            n_bytes (int, optional): Size of the files in the folder in bytes. Defaults to None, in which case the folder is measured.
+
+        Returns:
+            float: The estimated duration in seconds.
+        """
+        if n_files is None or n_bytes is None:
+            n_files, n_bytes = self.measure(input_path)
+
+        with self._lock:
+            last_sample = self._last_samples.get(input_path)
+            if (
+                last_sample is not None
+                and last_sample["n_files"] == n_files
+                and last_sample["n_bytes"] == n_bytes
+            ):
+                return last_sample["duration"]
+
+            if self._rates is None:
+                self._rates = self._fit_rates()
+            seconds_per_file, seconds_per_byte = self._rates
+        return seconds_per_file * n_files + seconds_per_byte * n_bytes
+
+    def order(
+        self, input_paths: List[str], measurements: List[Tuple[int, int]] = None
+    ) -> List[int]:
+        """
+        Order inputs from the longest to the shortest estimated duration.
+
+        Args:
+            input_paths (List[str]): The DICOM folders.
+            measurements (List[Tuple[int, int]], optional): The number of files and size in bytes of every folder, as returned by :py:meth:`measure`. Defaults to None, in which case the folders are measured.
+
+        Returns:
+            List[int]: The indices of the inputs, in the order in which they should be started.
+        """
+        if measurements is None:
+            from concurrent.futures import ThreadPoolExecutor
+
+            # Measuring is mostly waiting for the filesystem, so the folders are measured in parallel
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                measurements = list(executor.map(self.measure, input_paths))
+
+        estimates = [
+            self.estimate(i_input_path, *i_measurement)
+            for i_input_path, i_measurement in zip(input_paths, measurements)
+        ]
+        return sorted(range(len(input_paths)), key=lambda i_index: -estimates[i_index])
+
+    ######
+    # History
+    ######
+
+    def record(self, input_path: str, n_files: int, n_bytes: int, duration: float) -> None:
+        """
+        Record the duration of a conversion, to improve later estimates.
+
+        Args:
+            input_path (str): The DICOM folder.
+            n_files (int): Number of files in the folder.
+            n_bytes (int): Size of the files in the folder in bytes.
+            duration (float): Duration of the conversion in seconds.
+        """
+        sample = {
+            "input_path": input_path,
+            "n_files": n_files,
+            "n_bytes": n_bytes,
+            "duration": duration,
+        }
+        with self._lock:
+            self._samples.append(sample)
+            self._last_samples[input_path] = sample
+            del self._samples[: -self.max_history]
+            self._rates = None
+
+    def save(self) -> None:
+        """Write the recorded durations to the history file, if it is set."""
+        if self.history_file is None:
+            return
+        with self._lock:
+            samples = list(self._samples)
+        temporary_file = self.history_file + ".tmp_" + uuid.uuid4().hex
+        with open(temporary_file, "w") as output_file:
+            json.dump({"samples": samples}, output_file)
+        os.replace(temporary_file, self.history_file)
+
+    @property
+    def rates(self) -> Dict[str, float]:
+        """
+        The learned time per file and per byte.
+
+        Returns:
+            Dict[str, float]: The seconds per file as "seconds_per_file", and the seconds per byte as "seconds_per_byte".
+        """
+        with self._lock:
+            if self._rates is None:
+                self._rates = self._fit_rates()
+            seconds_per_file, seconds_per_byte = self._rates
+        return {"seconds_per_file": seconds_per_file, "seconds_per_byte": seconds_per_byte}
+
+    ######
+    # Helper functions
+    ######
+
+    def _fit_rates(self) -> Tuple[float, float]:
+        # Least squares fit of duration = seconds_per_file * n_files + seconds_per_byte * n_bytes
+        files = [float(i_sample["n_files"]) for i_sample in self._samples]
+        sizes = [float(i_sample["n_bytes"]) for i_sample in self._samples]
+        durations = [float(i_sample["duration"]) for i_sample in self._samples]
+
+        sum_ff = sum(i_files * i_files for i_files in files)
+        sum_fb = sum(i_files * i_size for i_files, i_size in zip(files, sizes))
+        sum_bb = sum(i_size * i_size for i_size in sizes)
+        sum_fd = sum(i_files * i_duration for i_files, i_duration in zip(files, durations))
+        sum_bd = sum(i_size * i_duration for i_size, i_duration in zip(sizes, durations))
+
+        determinant = sum_ff * sum_bb - sum_fb * sum_fb
+        if len(self._samples) >= 2 and determinant > 1e-9 * sum_ff * sum_bb:
+            seconds_per_file = (sum_fd * sum_bb - sum_bd * sum_fb) / determinant
+            seconds_per_byte = (sum_bd * sum_ff - sum_fd * sum_fb) / determinant
+            if seconds_per_file >= 0 and seconds_per_byte >= 0:
+                return seconds_per_file, seconds_per_byte
+
+        # The inputs do not separate the two rates, so the time is attributed to the size only
+        if sum_bb > 0:
+            return 0.0, sum_bd / sum_bb
+        return self.DEFAULT_SECONDS_PER_FILE, self.DEFAULT_SECONDS_PER_BYTE
@@ -0,0 +1,297 @@
+import os
+import subprocess
+import threading
+import uuid
+
+from typing import List
+from typing import Optional
+
+
+class DCM2NIIX_SESSION:
+    def __init__(self, dcm2niix, input_root: str, output_root: str) -> None:
+        """
+        Initialize the session.
+
+        A session keeps a single container running, to which every conversion is sent as an exec.
+        This avoids the container startup for every conversion.
+        For singularity a singularity instance is started, for docker a detached container.
+        The container is started with the ``limits`` of the DCM2NIIX object, which then apply to
+        all conversions in the session together.
+
+        Args:
+            dcm2niix (DCM2NIIX): The DCM2NIIX object for which to run the session.
+            input_root (str): Folder that contains all inputs, bound into the container.
+            output_root (str): Folder that contains all outputs, bound into the container.
+        """
+        self.dcm2niix = dcm2niix
+        self.input_root = os.path.abspath(input_root)
+        self.output_root = os.path.abspath(output_root)
+
+        self.name = "dcm2niixpy-" + uuid.uuid4().hex[:12]
+        self.active = False
+        self._instance = None
+        self._container_id: Optional[str] = None
+        # Conversions in multiple threads can find the container crashed at the same time, it is
+        # restarted once by the first of them. Conversions read the container under the lock, so
+        # that they wait for a restart instead of finding no container.
+        self._restart_lock = threading.RLock()
+        self._generation = 0
+
+    def __enter__(self) -> "DCM2NIIX_SESSION":
+        self.start()
+        self.dcm2niix._session = self
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.dcm2niix._session = None
+        self.stop()
+
+    ######
+    # Container functions
+    ######
+
+    def start(self) -> None:
+        """
+        Start the long-lived container.
+
+        If the container cannot be started the session stays inactive, and conversions fall back
+        to starting a new container for every conversion.
+        """
+        if self.dcm2niix.container_backend == self.dcm2niix.NATIVE_KEYWORD:
+            # There is no container to keep running for the native backend
+            return
+
+        bindings = self.dcm2niix._make_input_output_binding(self.input_root, self.output_root)
+
+        with self._restart_lock:
+            if self.dcm2niix.container_backend == self.dcm2niix.DOCKER_KEYWORD:
+                self._container_id = self._start_docker(bindings)
+            else:
+                self._instance = self._start_singularity(bindings)
+
+            self.active = self.is_alive()
+
+    def stop(self) -> None:
+        """Stop the long-lived container, if it is still running."""
+        with self._restart_lock:
+            if self._container_id is not None:
+                subprocess.run(
+                    [self.dcm2niix.DOCKER_KEYWORD, "rm", "--force", self._container_id],
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                )
+                self._container_id = None
+            if self._instance is not None:
+                self._instance.stop(quiet=True)
+                self._instance = None
+
+            self.active = False
+
+    def is_alive(self) -> bool:
+        """
+        Check whether the long-lived container is still running.
+
+        Returns:
+            bool: True if the container is running.
+        """
+        if self._container_id is not None:
+            result = subprocess.run(
+                [
+                    self.dcm2niix.DOCKER_KEYWORD,
+                    "inspect",
+                    "--format",
+                    "{{.State.Running}}",
+                    self._container_id,
+                ],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                universal_newlines=True,
+            )
+            return result.returncode == 0 and result.stdout.strip() == "true"
+        if self._instance is not None:
+            from spython.main import Client
+
+            instances = Client.instances(name=self.name, return_json=True, quiet=True)
+            return len(instances) > 0
+        return False
+
+    def _start_docker(self, bindings: list) -> Optional[str]:
+        command = [
+            self.dcm2niix.DOCKER_KEYWORD,
+            "run",
+            "--detach",
+            "--rm",
+            "--name",
+            self.name,
+            "--entrypoint",
+            "sleep",
+        ]
+        if self.dcm2niix.limits is not None:
+            command.extend(self.dcm2niix.limits.container_options())
+        for i_binding in bindings:
+            command.extend(["--volume", i_binding])
+        command.extend([self.dcm2niix.container_url, "infinity"])
+
+        result = subprocess.run(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            universal_newlines=True,
+        )
+        if result.returncode != 0:
+            return None
+        return result.stdout.strip()
+
+    def _start_singularity(self, bindings: list):
+        options = []
+        if self.dcm2niix.limits is not None:
+            options.extend(self.dcm2niix.limits.container_options())
+        for i_binding in bindings:
+            options.extend(["--bind", i_binding])
+        from spython.main import Client
+
+        self.dcm2niix._ensure_container_image()
+        return Client.instance(
+            self.dcm2niix._container_image, name=self.name, options=options, quiet=True
+        )
+
+    ######
+    # Conversion functions
+    ######
+
+    def can_convert(self, input_path: str, output_path: str) -> bool:
+        """
+        Check whether a conversion can be sent to the running container.
+
+        Args:
+            input_path (str): The DICOM folder to convert.
+            output_path (str): The output folder.
+
+        Returns:
+            bool: True if the session is active and the paths are within the bound roots.
+        """
+        return (
+            self.active
+            and self._is_within(input_path, self.input_root)
+            and self._is_within(output_path, self.output_root)
+        )
+
+    def run(self, arg_list: list, input_path: str, output_path: str) -> List[str]:
+        """
+        Run dcm2niix in the running container.
+
+        If the container has crashed it is restarted once, if that fails the session becomes
+        inactive and the conversion is run in a new container instead. The session can be used
+        by multiple threads at the same time.
+
+        Args:
+            arg_list (list): The dcm2niix options, without input and output.
+            input_path (str): The DICOM folder to convert.
+            output_path (str): The output folder.
+
+        Raises:
+            subprocess.CalledProcessError: If dcm2niix fails while the container is running.
+
+        Returns:
+            List[str]: The output lines of dcm2niix.
+        """
+        command_line_args = [
+            *arg_list,
+            "-o",
+            self.container_output_path(output_path),
+            to_container_path(input_path, self.input_root, self.dcm2niix.CONTAINER_INPUT_PATH),
+        ]
+
+        generation, active, container_id, instance = self._container()
+        if active:
+            try:
+                return list(self._execute(command_line_args, container_id, instance))
+            except subprocess.CalledProcessError:
+                with self._restart_lock:
+                    # Unless another thread has restarted the container since this conversion
+                    # started, in which case the conversion is tried in the new container
+                    if self._generation == generation:
+                        if self.is_alive():
+                            raise
+                        self.stop()
+                        self.start()
+                        self._generation += 1
+            _, active, container_id, instance = self._container()
+            if active:
+                return list(self._execute(command_line_args, container_id, instance))
+
+        bindings = self.dcm2niix._make_input_output_binding(input_path, output_path)
+        command_line_args = [
+            *arg_list,
+            "-o",
+            self.dcm2niix.CONTAINER_OUTPUT_PATH,
+            self.dcm2niix.CONTAINER_INPUT_PATH,
+        ]
+        return list(self.dcm2niix._run_container(command_line_args, bindings, self.dcm2niix.limits))
+
+    def container_output_path(self, output_path: str) -> str:
+        """
+        Get the path of an output folder inside the running container.
+
+        Args:
+            output_path (str): The output folder on the host.
+
+        Returns:
+            str: The output folder inside the container.
+        """
+        return to_container_path(output_path, self.output_root, self.dcm2niix.CONTAINER_OUTPUT_PATH)
+
+    def _container(self) -> tuple:
+        # Waits while the container is restarted
+        with self._restart_lock:
+            return self._generation, self.active, self._container_id, self._instance
+
+    def _execute(self, command_line_args: list, container_id: Optional[str], instance):
+        command = [self.dcm2niix.CONTAINER_EXECUTABLE, *command_line_args]
+        if container_id is not None:
+            return self._stream_docker_exec(container_id, command)
+        from spython.main import Client
+
+        return Client.execute(instance, command, stream=True, quiet=True)
+
+    def _stream_docker_exec(self, container_id: str, command: list):
+        full_command = [self.dcm2niix.DOCKER_KEYWORD, "exec", container_id, *command]
+        process = subprocess.Popen(
+            full_command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            universal_newlines=True,
+        )
+        for i_line in process.stdout:
+            yield i_line
+        process.stdout.close()
+        return_code = process.wait()
+        if return_code != 0:
+            raise subprocess.CalledProcessError(return_code, full_command)
+
+    ######
+    # Helper functions
+    ######
+
+    @staticmethod
+    def _is_within(path: str, root: str) -> bool:
+        path = os.path.abspath(path)
+        return path == root or path.startswith(root.rstrip(os.sep) + os.sep)
+
+
+def to_container_path(path: str, root: str, container_root: str) -> str:
+    """
+    Translate a path on the host to the path inside a container, in which root is bound.
+
+    Args:
+        path (str): The path on the host, inside root.
+        root (str): The folder on the host that is bound.
+        container_root (str): The folder inside the container at which root is bound.
+
+    Returns:
+        str: The path inside the container.
+    """
+    relative_path = os.path.relpath(os.path.abspath(path), root)
+    if relative_path == os.curdir:
+        return container_root
+    return container_root + "/" + relative_path.replace(os.sep, "/")
@@ -0,0 +1,209 @@
+import contextlib
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+import warnings
+
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+
+class DCM2NIIX_STAGING:
+    def __init__(self, scratch_folder: str, max_size: int = None, max_workers: int = 8) -> None:
+        """
+        Initialize staging of conversions on a fast local scratch folder, e.g. a tmpfs or NVMe drive.
+
+        The input of a conversion is copied to the scratch folder, dcm2niix reads from and writes to
+        the scratch folder, and the outputs are moved to the output folder afterwards. This keeps
+        the many small reads and writes of dcm2niix off network filesystems.
+
+        Args:
+            scratch_folder (str): Folder on the fast local storage.
+            max_size (int, optional): Maximum number of bytes that all conversions that are staged at the same time may use. Defaults to None, for no limit other than the free space.
+            max_workers (int, optional): Number of files to copy at the same time. Defaults to 8.
+        """
+        self.scratch_folder = scratch_folder
+        self.max_size = max_size
+        self.max_workers = max_workers
+
+        # Outputs are estimated to take as much space as the inputs
+        self.SIZE_FACTOR = 2
+
+        self._reserved_size = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(self.scratch_folder, exist_ok=True)
+
+    @contextlib.contextmanager
+    def stage(
+        self, input_path: str, output_path: str, metrics=None, conflict_write_behavior: int = 2
+    ) -> Iterator[Optional[Tuple[str, str]]]:
+        """
+        Stage a conversion on the scratch folder.
+
+        Within the context, the input is available in the scratch folder under the same folder
+        name. When the context exits without error, the files written to the scratch output folder
+        are moved to the output folder. The scratch folders are always removed.
+
+        Unless conflicts are overwritten, the scratch output folder contains an empty placeholder
+        for every file in the output folder, so that dcm2niix skips or renames conflicting files as
+        it would without staging. The placeholders are not moved.
+
+        If the conversion does not fit in the quota or the free space of the scratch folder, a
+        warning is given and None is yielded, in which case the conversion should use the
+        original folders.
+
+        For example::
+
+            with staging.stage("/nfs/dicom/patient_1", "/nfs/nifti/patient_1") as staged_paths:
+                scratch_input_path, scratch_output_path = staged_paths
+
+        Args:
+            input_path (str): The DICOM folder to convert.
+            output_path (str): The output folder.
+            metrics (DCM2NIIX_METRICS, optional): Metrics to record the copying in. Defaults to None.
+            conflict_write_behavior (int, optional): The conflict write behavior of dcm2niix, 0 to skip, 1 to overwrite and 2 to add a suffix. Defaults to 2.
+
+        Yields:
+            Optional[Tuple[str, str]]: The input and output folder in the scratch folder, or None if the conversion could not be staged.
+        """
+        input_files = self._list_files(input_path)
+        required_size = self.SIZE_FACTOR * sum(i_file[1] for i_file in input_files)
+        if not self._reserve(required_size):
+            warnings.warn(
+                "Not enough scratch space to stage '{input_path}' ({size} bytes needed), converting without staging".format(
+                    input_path=input_path, size=required_size
+                )
+            )
+            yield None
+            return
+
+        staging_folder = tempfile.mkdtemp(prefix="dcm2niixpy_", dir=self.scratch_folder)
+        try:
+            # Keep the name of the input folder, as it can be used in the output file name
+            scratch_input_path = os.path.join(
+                staging_folder, "input", os.path.basename(os.path.normpath(input_path))
+            )
+            scratch_output_path = os.path.join(staging_folder, "output")
+            os.makedirs(scratch_input_path)
+            os.makedirs(scratch_output_path)
+
+            placeholders = set()
+            if conflict_write_behavior != 1 and os.path.isdir(output_path):
+                placeholders = {i_file for i_file, _ in self._list_files(output_path)}
+                self._make_placeholders(scratch_output_path, placeholders)
+
+            with self._span(metrics, "stage_in"):
+                self._copy_files(
+                    [
+                        (
+                            os.path.join(input_path, i_file),
+                            os.path.join(scratch_input_path, i_file),
+                        )
+                        for i_file, _ in input_files
+                    ]
+                )
+
+            yield scratch_input_path, scratch_output_path
+
+            with self._span(metrics, "stage_out"):
+                self._move_files(
+                    [
+                        (
+                            os.path.join(scratch_output_path, i_file),
+                            os.path.join(output_path, i_file),
+                        )
+                        for i_file, _ in self._list_files(scratch_output_path)
+                        if i_file not in placeholders
+                    ]
+                )
+        finally:
+            shutil.rmtree(staging_folder, ignore_errors=True)
+            self._release(required_size)
+
+    ######
+    # Quota
+    ######
+
+    def _reserve(self, size: int) -> bool:
+        with self._lock:
+            if self.max_size is not None and self._reserved_size + size > self.max_size:
+                return False
+            if shutil.disk_usage(self.scratch_folder).free < size:
+                return False
+            self._reserved_size += size
+            return True
+
+    def _release(self, size: int) -> None:
+        with self._lock:
+            self._reserved_size -= size
+
+    ######
+    # Copying
+    ######
+
+    def _copy_files(self, files: List[Tuple[str, str]]) -> None:
+        for i_folder in {os.path.dirname(i_destination) for _, i_destination in files}:
+            os.makedirs(i_folder, exist_ok=True)
+        self._map(lambda file_pair: shutil.copyfile(*file_pair), files)
+
+    @staticmethod
+    def _make_placeholders(folder: str, files: set) -> None:
+        for i_file in files:
+            placeholder = os.path.join(folder, i_file)
+            os.makedirs(os.path.dirname(placeholder), exist_ok=True)
+            open(placeholder, "w").close()
+
+    def _move_files(self, files: List[Tuple[str, str]]) -> None:
+        for i_folder in {os.path.dirname(i_destination) for _, i_destination in files}:
+            os.makedirs(i_folder, exist_ok=True)
+        self._map(lambda file_pair: self._move_file(*file_pair), files)
+
+    @staticmethod
+    def _move_file(source_file: str, destination_file: str) -> None:
+        try:
+            os.replace(source_file, destination_file)
+        except OSError:
+            # A different filesystem, copy next to the destination so that the final rename is atomic
+            temporary_file = os.path.join(
+                os.path.dirname(destination_file),
+                ".tmp_" + uuid.uuid4().hex + "_" + os.path.basename(destination_file),
+            )
+            try:
+                shutil.copyfile(source_file, temporary_file)
+                os.replace(temporary_file, destination_file)
+            finally:
+                if os.path.exists(temporary_file):
+                    os.remove(temporary_file)
+
+    def _map(self, function, items: list) -> None:
+        from concurrent.futures import ThreadPoolExecutor
+
+        if len(items) == 0:
+            return
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            # Consume the results, so that errors are raised
+            list(executor.map(function, items))
+
+    ######
+    # Helper functions
+    ######
+
+    @staticmethod
+    def _list_files(folder: str) -> List[Tuple[str, int]]:
+        files = []
+        for i_root, _, i_files in os.walk(folder):
+            for i_file in i_files:
+                file_path = os.path.join(i_root, i_file)
+                files.append((os.path.relpath(file_path, folder), os.path.getsize(file_path)))
+        return files
+
+    @staticmethod
+    def _span(metrics, stage: str):
+        if metrics is None:
+            return contextlib.nullcontext()
+        return metrics.span(stage)
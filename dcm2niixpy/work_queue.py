@@ -0,0 +1,308 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+from typing import Dict
+from typing import List
+from typing import Optional
+
+
+class DCM2NIIX_QUEUE:
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+    def __init__(
+        self, queue_file: str, heartbeat_timeout: float = 300, max_attempts: int = 3
+    ) -> None:
+        """
+        Initialize a work queue of conversions, stored in an SQLite file.
+
+        The queue file can be placed on a shared filesystem, so that workers on multiple nodes
+        claim conversions from the same queue. Items that are claimed by a worker that stops
+        sending heartbeats are given to another worker.
+
+        Args:
+            queue_file (str): The SQLite file of the queue, created if it does not exist.
+            heartbeat_timeout (float, optional): Seconds without heartbeat after which the worker of an item is considered dead. Defaults to 300.
+            max_attempts (int, optional): Maximum number of times an item is claimed, before it is marked as failed. Defaults to 3.
+        """
+        self.queue_file = queue_file
+        self.heartbeat_timeout = heartbeat_timeout
+        self.max_attempts = max_attempts
+
+        with self._connect() as connection:
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS items (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    input_path TEXT NOT NULL,
+                    output_path TEXT,
+                    status TEXT NOT NULL,
+                    worker TEXT,
+                    heartbeat REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    result TEXT,
+                    error TEXT
+                )
+                """
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS items_status ON items (status)")
+
+    def _connect(self) -> "_TRANSACTION":
+        # A new connection per operation, so that the queue can be used from multiple threads
+        connection = sqlite3.connect(self.queue_file, timeout=60, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        return _TRANSACTION(connection)
+
+    ######
+    # Queue functions
+    ######
+
+    def add(self, input_path: str, output_path: str = None) -> int:
+        """
+        Add a conversion to the queue.
+
+        Args:
+            input_path (str): The DICOM folder to convert.
+            output_path (str, optional): The output folder. Defaults to None, in which case the input folder is used.
+
+        Returns:
+            int: The id of the item.
+        """
+        return self.add_many([input_path], [output_path])[0]
+
+    def add_many(self, input_paths: List[str], output_paths: List[str] = None) -> List[int]:
+        """
+        Add multiple conversions to the queue.
+
+        Args:
+            input_paths (List[str]): The DICOM folders to convert.
+            output_paths (List[str], optional): The output folder for every input. Defaults to None, in which case the input folders are used.
+
+        Returns:
+            List[int]: The ids of the items.
+        """
+        if output_paths is None:
+            output_paths = [None] * len(input_paths)
+
+        item_ids = []
+        with self._connect() as connection:
+            for i_input_path, i_output_path in zip(input_paths, output_paths):
+                cursor = connection.execute(
+                    "INSERT INTO items (input_path, output_path, status) VALUES (?, ?, ?)",
+                    (i_input_path, i_output_path, self.PENDING),
+                )
+                item_ids.append(cursor.lastrowid)
+        return item_ids
+
+    def claim(self, worker: str) -> Optional[sqlite3.Row]:
+        """
+        Claim the next pending item.
+
+        Items of workers that have not sent a heartbeat within the timeout are requeued first.
+
+        Args:
+            worker (str): Id of the worker claiming the item.
+
+        Returns:
+            Optional[sqlite3.Row]: The claimed item, or None if no item is pending.
+        """
+        now = time.time()
+        with self._connect() as connection:
+            self._requeue_stale(connection, now)
+            item = connection.execute(
+                "SELECT * FROM items WHERE status = ? ORDER BY id LIMIT 1", (self.PENDING,)
+            ).fetchone()
+            if item is None:
+                return None
+            connection.execute(
+                "UPDATE items SET status = ?, worker = ?, heartbeat = ?, attempts = attempts + 1 WHERE id = ?",
+                (self.RUNNING, worker, now, item["id"]),
+            )
+            return connection.execute("SELECT * FROM items WHERE id = ?", (item["id"],)).fetchone()
+
+    def heartbeat(self, item_id: int, worker: str) -> None:
+        """
+        Signal that the worker is still converting an item.
+
+        Args:
+            item_id (int): Id of the item.
+            worker (str): Id of the worker.
+        """
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE items SET heartbeat = ? WHERE id = ? AND worker = ? AND status = ?",
+                (time.time(), item_id, worker, self.RUNNING),
+            )
+
+    def complete(self, item_id: int, worker: str, output_info) -> None:
+        """
+        Record the result of a successful conversion.
+
+        Args:
+            item_id (int): Id of the item.
+            worker (str): Id of the worker.
+            output_info (DCM2NIIX_OUTPUT): The output of the conversion.
+        """
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE items SET status = ?, result = ?, error = NULL WHERE id = ? AND worker = ?",
+                (self.DONE, json.dumps(output_info.to_dict()), item_id, worker),
+            )
+
+    def fail(self, item_id: int, worker: str, error: Exception) -> None:
+        """
+        Record a failed conversion.
+
+        Args:
+            item_id (int): Id of the item.
+            worker (str): Id of the worker.
+            error (Exception): The error that occurred.
+        """
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE items SET status = ?, error = ? WHERE id = ? AND worker = ?",
+                (self.FAILED, repr(error), item_id, worker),
+            )
+
+    def counts(self) -> Dict[str, int]:
+        """
+        Count the items by status.
+
+        Returns:
+            Dict[str, int]: Number of items for every status.
+        """
+        counts = {self.PENDING: 0, self.RUNNING: 0, self.DONE: 0, self.FAILED: 0}
+        with self._connect() as connection:
+            for i_row in connection.execute(
+                "SELECT status, COUNT(*) AS n_items FROM items GROUP BY status"
+            ):
+                counts[i_row["status"]] = i_row["n_items"]
+        return counts
+
+    def items(self, status: str = None) -> List[sqlite3.Row]:
+        """
+        Get the items in the queue.
+
+        Args:
+            status (str, optional): Only get items with this status. Defaults to None, for all items.
+
+        Returns:
+            List[sqlite3.Row]: The items.
+        """
+        with self._connect() as connection:
+            if status is None:
+                return connection.execute("SELECT * FROM items ORDER BY id").fetchall()
+            return connection.execute(
+                "SELECT * FROM items WHERE status = ? ORDER BY id", (status,)
+            ).fetchall()
+
+    def _requeue_stale(self, connection: sqlite3.Connection, now: float) -> None:
+        stale_heartbeat = now - self.heartbeat_timeout
+        connection.execute(
+            "UPDATE items SET status = ?, error = ? WHERE status = ? AND heartbeat < ? AND attempts >= ?",
+            (self.FAILED, "Worker died", self.RUNNING, stale_heartbeat, self.max_attempts),
+        )
+        connection.execute(
+            "UPDATE items SET status = ?, worker = NULL WHERE status = ? AND heartbeat < ?",
+            (self.PENDING, self.RUNNING, stale_heartbeat),
+        )
+
+
+class _TRANSACTION:
+    def __init__(self, connection: sqlite3.Connection) -> None:
+        self.connection = connection
+
+    def __enter__(self) -> sqlite3.Connection:
+        # Take the write lock immediately, so that two workers can never claim the same item
+        self.connection.execute("BEGIN IMMEDIATE")
+        return self.connection
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.connection.execute("COMMIT")
+        else:
+            self.connection.execute("ROLLBACK")
+        self.connection.close()
+
+
+class DCM2NIIX_WORKER:
+    def __init__(
+        self,
+        dcm2niix,
+        queue: DCM2NIIX_QUEUE,
+        worker_id: str = None,
+        heartbeat_interval: float = 30,
+    ) -> None:
+        """
+        Initialize a worker that converts the items of a queue.
+
+        Multiple workers, on one or more nodes, can process the same queue.
+
+        Args:
+            dcm2niix (DCM2NIIX): The configured DCM2NIIX object used for the conversions.
+            queue (DCM2NIIX_QUEUE): The queue to process.
+            worker_id (str, optional): Id of the worker. Defaults to None, in which case an id based on the hostname and process id is used.
+            heartbeat_interval (float, optional): Seconds between heartbeats while converting. Defaults to 30.
+        """
+        self.dcm2niix = dcm2niix
+        self.queue = queue
+        if worker_id is None:
+            worker_id = "{hostname}:{pid}:{suffix}".format(
+                hostname=socket.gethostname(), pid=os.getpid(), suffix=uuid.uuid4().hex[:8]
+            )
+        self.worker_id = worker_id
+        self.heartbeat_interval = heartbeat_interval
+
+    def run(self, max_items: int = None, wait: bool = False, poll_interval: float = 10) -> int:
+        """
+        Process items from the queue.
+
+        Args:
+            max_items (int, optional): Maximum number of items to process. Defaults to None, for no maximum.
+            wait (bool, optional): Whether to wait for new items when the queue is empty, instead of returning. Defaults to False.
+            poll_interval (float, optional): Seconds between checks of an empty queue when waiting. Defaults to 10.
+
+        Returns:
+            int: The number of processed items.
+        """
+        n_processed = 0
+        while max_items is None or n_processed < max_items:
+            item = self.queue.claim(self.worker_id)
+            if item is None:
+                if not wait:
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            self._process(item)
+            n_processed += 1
+        return n_processed
+
+    def _process(self, item: sqlite3.Row) -> None:
+        stop_heartbeat = threading.Event()
+        heartbeat_thread = threading.Thread(
+            target=self._send_heartbeats, args=(item["id"], stop_heartbeat), daemon=True
+        )
+        heartbeat_thread.start()
+        try:
+            output_info = self.dcm2niix.convert(item["input_path"], item["output_path"])
+            # An item is only done when its images are compressed, when compressed in the background
+            output_info.wait()
+        except Exception as error:
+            self.queue.fail(item["id"], self.worker_id, error)
+        else:
+            self.queue.complete(item["id"], self.worker_id, output_info)
+        finally:
+            stop_heartbeat.set()
+            heartbeat_thread.join()
+
+    def _send_heartbeats(self, item_id: int, stop_heartbeat: threading.Event) -> None:
+        while not stop_heartbeat.wait(self.heartbeat_interval):
+            self.queue.heartbeat(item_id, self.worker_id)
@@ -1,4 +1,7 @@
 import os
+import stat
+import sys
+
 import pytest
 
 
@@ -10,3 +13,67 @@ def testdata_dir():
 @pytest.fixture
 def test_version():
     return "1.0.20211006"
+
+
+@pytest.fixture
+def make_native_executable(tmp_path, test_version):
+    def _make_native_executable(
+        version=test_version, output_lines=None, output_files=None, return_code=0, delay=0
+    ):
+        if output_lines is None:
+            output_lines = ["Convert 1 DICOM as {output}/image (64x64x1x1)"]
+        if output_files is None:
+            output_files = []
+        if not isinstance(output_files, dict):
+            # Without explicit contents, every file contains its own name
+            output_files = {i_file: i_file.encode() for i_file in output_files}
+
+        executable = os.path.join(str(tmp_path), "dcm2niix")
+        with open(executable, "w") as executable_file:
+            executable_file.write(
+                "#!{python}\n"
+                "import sys\n"
+                "import time\n"
+                "if sys.argv[1:] == ['--version']:\n"
+                "    print('v{version}')\n"
+                "    sys.exit(3)\n"
+                "with open({calls_log!r}, 'a') as calls_log:\n"
+                "    calls_log.write(' '.join(sys.argv[1:]) + '\\n')\n"
+                "time.sleep({delay})\n"
+                "output = sys.argv[sys.argv.index('-o') + 1]\n"
+                "for file_name, content in {output_files!r}.items():\n"
+                "    with open(output + '/' + file_name, 'wb') as output_file:\n"
+                "        output_file.write(content)\n"
+                "for line in {output_lines!r}:\n"
+                "    print(line.format(output=output), flush=True)\n"
+                "sys.exit({return_code})\n".format(
+                    python=sys.executable,
+                    version=version,
+                    calls_log=os.path.join(str(tmp_path), "calls.log"),
+                    output_files=output_files,
+                    output_lines=output_lines,
+                    return_code=return_code,
+                    delay=delay,
+                )
+            )
+        os.chmod(executable, os.stat(executable).st_mode | stat.S_IEXEC)
+        return executable
+
+    return _make_native_executable
+
+
+@pytest.fixture
+def read_calls(tmp_path):
+    # The arguments of every call to the executable of make_native_executable
+    def _read_calls():
+        return [i_call.split() for i_call in (tmp_path / "calls.log").read_text().splitlines()]
+
+    return _read_calls
+
+
+@pytest.fixture
+def input_dir(tmp_path):
+    input_dir = tmp_path / "patient_1"
+    input_dir.mkdir()
+    (input_dir / "IM-0.dcm").write_bytes(b"0" * 100)
+    return input_dir
@@ -0,0 +1,103 @@
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+import dcm2niixpy
+
+
+async def _collect_events(dcm2niix, input_path, output_path):
+    return [i_event async for i_event in dcm2niix.aconvert(input_path, output_path)]
+
+
+def test_aconvert_yields_events(test_version, tmp_path, make_native_executable):
+    executable = make_native_executable(
+        output_lines=[
+            "Found 2 DICOM file(s)",
+            "Progress: 50%",
+            "Warning: Unable to determine slice direction: please check whether slices are flipped",
+            "Convert 2 DICOM as {output}/image (64x64x2x1)",
+            "Progress: 100%",
+        ]
+    )
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version, container_backend="native", executable=executable)
+
+    result = asyncio.run(_collect_events(dcm2niix, str(tmp_path), str(tmp_path / "output")))
+
+    assert [i_event.kind for i_event in result] == [
+        "found",
+        "progress",
+        "warning",
+        "converted",
+        "progress",
+        "finished",
+    ]
+    assert result[1].percentage == 50
+    assert result[3].image_shape == [64, 64, 2, 1]
+    assert result[-1].output.no_direction is True
+    assert result[-1].output.output_path == str(tmp_path / "output" / "image.nii")
+
+
+def test_aconvert_failing_conversion(test_version, tmp_path, make_native_executable):
+    executable = make_native_executable(return_code=1)
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version, container_backend="native", executable=executable)
+
+    with pytest.raises(subprocess.CalledProcessError):
+        asyncio.run(_collect_events(dcm2niix, str(tmp_path), str(tmp_path)))
+
+
+def test_docker_command(test_version):
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version)
+    dcm2niix._container_backend = "docker"
+
+    result = dcm2niix._make_command(["-z", "y"], "/data/in", "/data/out")
+
+    assert result == [
+        "docker",
+        "run",
+        "--rm",
+        "--volume",
+        "/data/in:/input",
+        "--volume",
+        "/data/out:/output",
+        dcm2niix.container_url,
+        "-z",
+        "y",
+        "-o",
+        "/output",
+        "/input",
+    ]
+
+
+class THREAD_IMAGE_CACHE:
+    def __init__(self, cache_folder):
+        self.cache_folder = cache_folder
+        self.download_threads = []
+
+    def get(self, url, name, metrics=None):
+        self.download_threads.append(threading.get_ident())
+        path = os.path.join(self.cache_folder, name)
+        with open(path, "w") as image_file:
+            image_file.write(url)
+        return path
+
+
+def test_aconvert_downloads_image_in_thread(test_version, tmp_path, monkeypatch):
+    image_cache = THREAD_IMAGE_CACHE(str(tmp_path))
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version, download=True, image_cache=image_cache)
+    os.remove(dcm2niix._container_image)
+
+    def make_command(self, arg_list, input_path, output_path, limits=None):
+        assert os.path.isfile(self._container_image)
+        return [sys.executable, "-c", "print('Convert 1 DICOM as /output/image (64x64x1x1)')"]
+
+    monkeypatch.setattr(dcm2niixpy.DCM2NIIX, "_make_command", make_command)
+
+    result = asyncio.run(_collect_events(dcm2niix, str(tmp_path), str(tmp_path)))
+
+    assert result[-1].output.output_path == str(tmp_path / "image.nii")
+    assert len(image_cache.download_threads) == 2
+    assert image_cache.download_threads[-1] != threading.get_ident()
@@ -0,0 +1,132 @@
+import os
+import subprocess
+
+import pytest
+
+import dcm2niixpy
+
+
+@pytest.fixture
+def input_dirs(tmp_path):
+    input_dirs = []
+    for i_index in range(5):
+        input_dir = tmp_path / "dicom" / "patient_{index}".format(index=i_index)
+        input_dir.mkdir(parents=True)
+        (input_dir / "IM-0.dcm").write_bytes(b"0" * 100)
+        input_dirs.append(str(input_dir))
+    return input_dirs
+
+
+def test_convert_many_in_batches(
+    test_version, tmp_path, input_dirs, make_native_executable, read_calls
+):
+    executable = make_native_executable()
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version, container_backend="native", executable=executable)
+    output_dirs = [i_input_dir.replace("dicom", "nifti") for i_input_dir in input_dirs]
+
+    # In reverse order, to check that the outputs are returned in the order of the inputs
+    outputs = dcm2niix.convert_many(
+        input_dirs[::-1], output_dirs[::-1], max_workers=2, batch_size=2
+    )
+
+    assert [i_output.error for i_output in outputs] == [None] * 5
+    assert [i_output.series[0].output_path for i_output in outputs] == [
+        os.path.join(i_output_dir, "image.nii") for i_output_dir in output_dirs[::-1]
+    ]
+    assert sorted(i_call[-1] for i_call in read_calls()) == input_dirs
+    assert all(i_output.metrics.timings["total"] >= 0 for i_output in outputs)
+    # The scripts that ran the batches are removed
+    assert sorted(os.listdir(str(tmp_path / "nifti"))) == [
+        os.path.basename(i_output_dir) for i_output_dir in output_dirs
+    ]
+
+
+def test_failure_in_batch(test_version, tmp_path, input_dirs, make_native_executable, read_calls):
+    executable = make_native_executable(return_code=2)
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version, container_backend="native", executable=executable)
+
+    outputs = dcm2niix.convert_many(input_dirs, batch_size=5)
+
+    # A failing conversion does not stop the conversions after it
+    assert len(read_calls()) == 5
+    assert all(isinstance(i_output.error, subprocess.CalledProcessError) for i_output in outputs)
+    assert outputs[3].error.returncode == 2
+    assert outputs[3].error.cmd[-1] == input_dirs[3]
+
+
+def test_invalid_batch_size(test_version, input_dirs):
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version)
+
+    with pytest.raises(ValueError):
+        dcm2niix.convert_many(input_dirs, batch_size=0)
+
+
+def test_batch_script():
+    script = dcm2niixpy.DCM2NIIX._make_batch_script(
+        "marker", [["dcm2niix", "-f", "%p_%s", "-o", "/data/out/a b", "/data/in/a b"]]
+    )
+
+    assert script.splitlines() == [
+        "echo 'marker start 0'",
+        "dcm2niix -f %p_%s -o '/data/out/a b' '/data/in/a b' 2>&1",
+        'echo "marker end 0 $?"',
+    ]
+
+
+def test_batch_in_container(test_version, tmp_path, input_dirs, monkeypatch):
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version)
+    run_scripts = []
+    used_bindings = []
+
+    def run_container_script(self, script_path, bindings, limits=None):
+        # Runs the script as it would be run inside the container
+        run_scripts.append(script_path)
+        used_bindings.extend(bindings)
+        script_folder = bindings[-1].split(":")[0]
+        with open(os.path.join(script_folder, os.path.basename(script_path))) as script_file:
+            script = script_file.read()
+        assert dcm2niix.CONTAINER_INPUT_PATH + "/1 " in script
+        for i_line in script.splitlines():
+            if i_line.startswith("echo "):
+                yield i_line[6:-1].replace("$?", "0") + "\n"
+            else:
+                output_path = i_line.split()[i_line.split().index("-o") + 1]
+                yield "Convert 1 DICOM as {output}/image (64x64x1x1)\n".format(output=output_path)
+
+    monkeypatch.setattr(dcm2niixpy.DCM2NIIX, "_run_container_script", run_container_script)
+
+    outputs = dcm2niix.convert_many(input_dirs, max_workers=1, batch_size=10)
+
+    assert len(run_scripts) == 1
+    assert run_scripts[0].startswith(dcm2niix.CONTAINER_SCRIPT_PATH + "/dcm2niixpy-batch-")
+    # Every folder is bound by itself, instead of their common folder
+    assert used_bindings[:-1] == [
+        "{input_dir}:/input/{index}".format(input_dir=i_input_dir, index=i_index)
+        for i_index, i_input_dir in enumerate(input_dirs)
+    ] + [
+        "{input_dir}:/output/{index}".format(input_dir=i_input_dir, index=i_index)
+        for i_index, i_input_dir in enumerate(input_dirs)
+    ]
+    assert [i_output.series[0].output_path for i_output in outputs] == [
+        os.path.join(i_input_dir, "image.nii") for i_input_dir in input_dirs
+    ]
+    # The script is removed
+    assert not os.path.exists(used_bindings[-1].split(":")[0])
+
+
+def test_batch_script_removed_after_error(test_version, input_dirs, monkeypatch):
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version)
+    script_folders = []
+
+    def run_container_script(self, script_path, bindings, limits=None):
+        script_folders.append(bindings[-1].split(":")[0])
+        raise OSError("The container could not be started")
+
+    monkeypatch.setattr(dcm2niixpy.DCM2NIIX, "_run_container_script", run_container_script)
+
+    outputs = dcm2niix.convert_many(input_dirs, max_workers=1, batch_size=10)
+
+    assert all(isinstance(i_output.error, OSError) for i_output in outputs)
+    assert not os.path.exists(script_folders[0])
+    for i_input_dir in input_dirs:
+        assert os.listdir(i_input_dir) == ["IM-0.dcm"]
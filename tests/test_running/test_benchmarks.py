@@ -0,0 +1,83 @@
+import json
+import os
+
+import pytest
+
+from benchmarks import run_benchmarks
+
+
+def test_fake_dcm2niix_converts(tmp_path, monkeypatch):
+    monkeypatch.setenv("FAKE_DCM2NIIX_SERIES", "2")
+    monkeypatch.setenv("FAKE_DCM2NIIX_SIZE", "10")
+    dcm2niix = run_benchmarks.make_dcm2niix()
+    input_path = run_benchmarks.make_input(str(tmp_path), n_files=4)
+    output_path = tmp_path / "output"
+    output_path.mkdir()
+
+    output_info = dcm2niix.convert(input_path, str(output_path))
+
+    assert output_info.n_dicoms == 4
+    assert len(output_info.series) == 2
+    for i_series in output_info.series:
+        assert i_series.n_slices == 2
+        assert os.path.getsize(i_series.output_path) == 10
+        assert json.loads(open(i_series.sidecar_path).read()) == {}
+
+
+def test_fake_dcm2niix_compresses(tmp_path):
+    dcm2niix = run_benchmarks.make_dcm2niix()
+    dcm2niix.compress = True
+    input_path = run_benchmarks.make_input(str(tmp_path))
+
+    output_info = dcm2niix.convert(input_path, input_path)
+
+    assert output_info.extension == ".nii.gz"
+    assert os.path.isfile(output_info.series[0].output_path)
+
+
+def test_committed_baseline_covers_benchmarks():
+    with open(run_benchmarks.BASELINE_FILE) as baseline_file:
+        baseline = json.load(baseline_file)
+
+    assert sorted(baseline) == sorted(run_benchmarks.BENCHMARKS)
+    for i_benchmark in baseline.values():
+        assert i_benchmark["tolerance"] > 0
+
+
+@pytest.fixture
+def baseline():
+    return run_benchmarks.make_baseline(
+        {"reference": 1.0, "argument_building": 1e-6, "output_parsing": 1000.0, "import_time": 1.0},
+        {"reference": 1.0, "argument_building": 0.5, "output_parsing": 0.5, "import_time": 0.5},
+    )
+
+
+def test_no_regressions(baseline):
+    results = {"reference": 1.0, "argument_building": 1.4e-6, "output_parsing": 700.0}
+
+    assert run_benchmarks.find_regressions(results, baseline, 0) == []
+
+
+@pytest.mark.parametrize(
+    "results",
+    [
+        {"reference": 1.0, "argument_building": 1.6e-6},
+        {"reference": 1.0, "output_parsing": 600.0},
+        # Not corrected for the speed of the machine
+        {"reference": 2.0, "import_time": 1.6},
+    ],
+)
+def test_regressions(baseline, results):
+    assert len(run_benchmarks.find_regressions(results, baseline, 0)) == 1
+
+
+def test_slower_machine_is_not_a_regression(baseline):
+    results = {"reference": 2.0, "argument_building": 2.8e-6, "output_parsing": 350.0}
+
+    assert run_benchmarks.find_regressions(results, baseline, 0) == []
+
+
+def test_median_results():
+    runs = [{"reference": 3.0}, {"reference": 1.0}, {"reference": 2.0}]
+
+    assert run_benchmarks.median_results(runs) == {"reference": 2.0}
@@ -0,0 +1,135 @@
+import os
+
+import dcm2niixpy
+
+
+def _n_calls(tmp_path):
+    with open(str(tmp_path / "calls.log")) as calls_log:
+        return len(calls_log.readlines())
+
+
+def _make_dcm2niix(test_version, tmp_path, make_native_executable, **cache_kwargs):
+    executable = make_native_executable(output_files=["image.nii", "image.json"])
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version, container_backend="native", executable=executable)
+    dcm2niix.cache = dcm2niixpy.DCM2NIIX_CACHE(str(tmp_path / "cache"), **cache_kwargs)
+    return dcm2niix
+
+
+def _make_input(tmp_path, name="dicom"):
+    input_dir = tmp_path / name
+    input_dir.mkdir()
+    (input_dir / "IM-0001.dcm").write_text("dicom")
+    output_dir = tmp_path / (name + "_output")
+    output_dir.mkdir()
+    return str(input_dir), str(output_dir)
+
+
+def test_cache_hit_skips_conversion(test_version, tmp_path, make_native_executable):
+    dcm2niix = _make_dcm2niix(test_version, tmp_path, make_native_executable)
+    input_dir, output_dir = _make_input(tmp_path)
+    first_output = dcm2niix.convert(input_dir, output_dir)
+
+    result = dcm2niix.convert(input_dir, output_dir)
+
+    assert _n_calls(tmp_path) == 1
+    assert result.output_path == first_output.output_path
+    assert result.image_shape == [64, 64, 1, 1]
+
+
+def test_cache_miss_on_changed_input(test_version, tmp_path, make_native_executable):
+    dcm2niix = _make_dcm2niix(test_version, tmp_path, make_native_executable)
+    input_dir, output_dir = _make_input(tmp_path)
+    dcm2niix.convert(input_dir, output_dir)
+    with open(os.path.join(input_dir, "IM-0002.dcm"), "w") as dicom_file:
+        dicom_file.write("dicom")
+
+    dcm2niix.convert(input_dir, output_dir)
+
+    assert _n_calls(tmp_path) == 2
+
+
+def test_cache_miss_on_changed_options(test_version, tmp_path, make_native_executable):
+    dcm2niix = _make_dcm2niix(test_version, tmp_path, make_native_executable)
+    input_dir, output_dir = _make_input(tmp_path)
+    dcm2niix.convert(input_dir, output_dir)
+    dcm2niix.compression_level = 9
+
+    dcm2niix.convert(input_dir, output_dir)
+
+    assert _n_calls(tmp_path) == 2
+
+
+def test_cache_restores_removed_outputs(test_version, tmp_path, make_native_executable):
+    dcm2niix = _make_dcm2niix(test_version, tmp_path, make_native_executable)
+    input_dir, output_dir = _make_input(tmp_path)
+    dcm2niix.convert(input_dir, output_dir)
+    os.remove(os.path.join(output_dir, "image.nii"))
+
+    dcm2niix.convert(input_dir, output_dir)
+
+    assert _n_calls(tmp_path) == 1
+    assert os.path.exists(os.path.join(output_dir, "image.nii"))
+
+
+def test_cache_invalidate_input(test_version, tmp_path, make_native_executable):
+    dcm2niix = _make_dcm2niix(test_version, tmp_path, make_native_executable)
+    input_dir, output_dir = _make_input(tmp_path)
+    other_input_dir, other_output_dir = _make_input(tmp_path, "other")
+    dcm2niix.convert(input_dir, output_dir)
+    dcm2niix.convert(other_input_dir, other_output_dir)
+
+    n_removed = dcm2niix.cache.invalidate(input_dir)
+    dcm2niix.convert(input_dir, output_dir)
+    dcm2niix.convert(other_input_dir, other_output_dir)
+
+    assert n_removed == 1
+    assert _n_calls(tmp_path) == 3
+
+
+def test_cache_evicts_least_recently_used(test_version, tmp_path, make_native_executable):
+    dcm2niix = _make_dcm2niix(test_version, tmp_path, make_native_executable, max_size=0)
+    input_dir, output_dir = _make_input(tmp_path)
+
+    dcm2niix.convert(input_dir, output_dir)
+
+    assert dcm2niix.cache.size == 0
+
+
+def test_cache_hit_converting_in_place(test_version, tmp_path, make_native_executable):
+    dcm2niix = _make_dcm2niix(test_version, tmp_path, make_native_executable)
+    input_dir, _ = _make_input(tmp_path)
+
+    for _ in range(3):
+        dcm2niix.convert(input_dir)
+
+    assert _n_calls(tmp_path) == 1
+
+
+def test_cache_stores_only_converted_series(test_version, tmp_path, make_native_executable):
+    dcm2niix = _make_dcm2niix(test_version, tmp_path, make_native_executable)
+    input_dir, output_dir = _make_input(tmp_path)
+    output_info = dcm2niix.convert(input_dir, output_dir)
+    # Written by another conversion into the same output folder
+    with open(os.path.join(output_dir, "other.nii"), "w") as other_file:
+        other_file.write("other")
+
+    dcm2niix.cache.put("key", input_dir, output_dir, output_info)
+
+    manifest = dcm2niix.cache._read_manifest("key")
+    assert sorted(manifest["files"]) == ["image.json", "image.nii"]
+
+
+def test_cache_restores_changed_outputs(test_version, tmp_path, make_native_executable):
+    dcm2niix = _make_dcm2niix(test_version, tmp_path, make_native_executable)
+    input_dir, output_dir = _make_input(tmp_path)
+    dcm2niix.convert(input_dir, output_dir)
+    output_file = os.path.join(output_dir, "image.nii")
+    # Rewritten in place, with the same size
+    with open(output_file, "r+b") as image_file:
+        image_file.write(b"IMAGE")
+
+    dcm2niix.convert(input_dir, output_dir)
+
+    assert _n_calls(tmp_path) == 1
+    with open(output_file, "rb") as image_file:
+        assert image_file.read() == b"image.nii"
@@ -0,0 +1,176 @@
+import json
+import os
+
+import pytest
+
+from dcm2niixpy import cli
+from dcm2niixpy.dcm2niix import DCM2NIIX
+
+
+@pytest.fixture
+def input_root(tmp_path):
+    input_root = tmp_path / "dicom"
+    for i_name in ["patient_1", "patient_2", "patient_3"]:
+        (input_root / i_name).mkdir(parents=True)
+        (input_root / i_name / "IM-0.dcm").write_bytes(b"0" * 100)
+    return input_root
+
+
+def run_cli(executable, *arguments):
+    return cli.main(
+        [
+            "--dcm2niix-version",
+            "1.0.20211006",
+            "--backend",
+            "native",
+            "--executable",
+            executable,
+            *arguments,
+        ]
+    )
+
+
+def test_input_root(tmp_path, input_root, make_native_executable):
+    executable = make_native_executable()
+    output_root = tmp_path / "nifti"
+
+    exit_code = run_cli(
+        executable,
+        "--input-root",
+        str(input_root),
+        "--output-root",
+        str(output_root),
+        "--jobs",
+        "2",
+    )
+
+    assert exit_code == 0
+    calls = sorted((tmp_path / "calls.log").read_text().splitlines())
+    assert len(calls) == 3
+    assert calls[0].endswith(
+        "-o {output} {input}".format(
+            output=output_root / "patient_1", input=input_root / "patient_1"
+        )
+    )
+    assert sorted(i_path.name for i_path in output_root.iterdir()) == [
+        "patient_1",
+        "patient_2",
+        "patient_3",
+    ]
+
+
+@pytest.mark.parametrize("extension", [".csv", ".jsonl"])
+def test_manifest(tmp_path, input_root, make_native_executable, extension):
+    executable = make_native_executable()
+    manifest_file = tmp_path / ("manifest" + extension)
+    conversions = [
+        {"input_path": str(input_root / "patient_1"), "output_path": str(tmp_path / "out_1")},
+        {"input_path": str(input_root / "patient_2"), "output_path": ""},
+    ]
+    if extension == ".csv":
+        manifest_file.write_text(
+            "input_path,output_path\n"
+            + "".join(
+                "{input_path},{output_path}\n".format(**i_conversion)
+                for i_conversion in conversions
+            )
+        )
+    else:
+        manifest_file.write_text(
+            "".join(json.dumps(i_conversion) + "\n" for i_conversion in conversions)
+        )
+
+    assert cli.read_manifest(str(manifest_file)) == [
+        (str(input_root / "patient_1"), str(tmp_path / "out_1")),
+        (str(input_root / "patient_2"), None),
+    ]
+    assert run_cli(executable, "--manifest", str(manifest_file)) == 0
+    assert (tmp_path / "out_1").is_dir()
+
+
+def test_options_are_passed(tmp_path, input_root, make_native_executable):
+    executable = make_native_executable()
+
+    run_cli(executable, "--input-root", str(input_root), "--compress", "n", "--terse")
+
+    call = (tmp_path / "calls.log").read_text().splitlines()[0].split()
+    assert call[call.index("-z") + 1] == "n"
+    assert "--terse" in call
+
+
+def test_invalid_option(input_root, make_native_executable):
+    executable = make_native_executable()
+
+    with pytest.raises(SystemExit):
+        run_cli(executable, "--input-root", str(input_root), "--compress", "maybe")
+
+
+def test_resume_from_journal(tmp_path, input_root, make_native_executable):
+    journal_file = tmp_path / "journal.jsonl"
+    # A run that was interrupted while writing the journal
+    journal_file.write_text(
+        json.dumps(
+            {"input_path": str(input_root / "patient_1"), "status": "converted", "error": None}
+        )
+        + "\n"
+        + json.dumps({"input_path": str(input_root / "patient_2"), "status": "failed"})
+        + "\n"
+        + '{"input_path": "'
+    )
+    executable = make_native_executable()
+
+    exit_code = run_cli(executable, "--input-root", str(input_root), "--journal", str(journal_file))
+
+    assert exit_code == 0
+    calls = (tmp_path / "calls.log").read_text().splitlines()
+    assert sorted(i_call.split()[-1] for i_call in calls) == [
+        str(input_root / "patient_2"),
+        str(input_root / "patient_3"),
+    ]
+    results = cli.read_journal(str(journal_file))
+    assert [
+        results[str(input_root / i_name)]["status"] for i_name in ["patient_2", "patient_3"]
+    ] == [
+        "converted",
+        "converted",
+    ]
+    assert results[str(input_root / "patient_3")]["output"]["series"][0]["output_path"].endswith(
+        "image.nii"
+    )
+
+
+def test_failed_conversion(tmp_path, input_root, make_native_executable):
+    executable = make_native_executable(return_code=1)
+    journal_file = tmp_path / "journal.jsonl"
+
+    exit_code = run_cli(executable, "--input-root", str(input_root), "--journal", str(journal_file))
+
+    assert exit_code == 1
+    results = cli.read_journal(str(journal_file))
+    assert {i_result["status"] for i_result in results.values()} == {"failed"}
+    assert results[str(input_root / "patient_1")]["error"].startswith("CalledProcessError")
+
+
+def test_interrupted_run_journals_started_conversions(
+    test_version, tmp_path, make_native_executable, read_calls
+):
+    executable = make_native_executable(output_files=["image.nii"], delay=0.2)
+    dcm2niix = DCM2NIIX(test_version, container_backend="native", executable=executable)
+    conversions = []
+    for i_index in range(12):
+        input_path = tmp_path / "dicom" / "patient_{index}".format(index=i_index)
+        input_path.mkdir(parents=True)
+        conversions.append((str(input_path), None))
+    journal_file = tmp_path / "journal.jsonl"
+
+    results = cli.run_conversions(dcm2niix, conversions, str(journal_file), jobs=4)
+    next(results)
+    with pytest.raises(KeyboardInterrupt):
+        results.throw(KeyboardInterrupt)
+
+    converted = sorted(i_call[-1] for i_call in read_calls())
+    # Conversions that had not started are cancelled
+    assert len(converted) < len(conversions)
+    assert sorted(cli.read_journal(str(journal_file))) == converted
+    for i_result in cli.read_journal(str(journal_file)).values():
+        assert os.path.isfile(i_result["output"]["series"][0]["output_path"])
@@ -0,0 +1,110 @@
+import gzip
+import os
+
+import pytest
+
+import dcm2niixpy
+
+
+@pytest.mark.parametrize("content", [b"", b"image", os.urandom(10000) + bytes(50000)])
+def test_compress_file(tmp_path, content):
+    compressor = dcm2niixpy.DCM2NIIX_COMPRESSOR(max_workers=2, block_size=4096)
+    input_file = tmp_path / "image.nii"
+    input_file.write_bytes(content)
+
+    compressed_size = compressor.compress_file(str(input_file))
+    compressor.shutdown()
+
+    compressed_file = tmp_path / "image.nii.gz"
+    assert not input_file.exists()
+    assert compressed_size == os.path.getsize(str(compressed_file))
+    assert gzip.decompress(compressed_file.read_bytes()) == content
+    assert os.listdir(str(tmp_path)) == ["image.nii.gz"]
+
+
+def test_convert_with_compressor(test_version, tmp_path, make_native_executable):
+    executable = make_native_executable(
+        output_lines=[
+            "Convert 1 DICOM as {output}/image_1 (64x64x1x1)",
+            "Convert 1 DICOM as {output}/image_2 (64x64x1x1)",
+        ],
+        output_files=["image_1.nii", "image_2.nii"],
+    )
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version, container_backend="native", executable=executable)
+    dcm2niix.compress = True
+    dcm2niix.compression_level = 9
+    dcm2niix.compressor = dcm2niixpy.DCM2NIIX_COMPRESSOR(max_workers=2)
+    output_dir = tmp_path / "output"
+    output_dir.mkdir()
+
+    result = dcm2niix.convert(str(tmp_path), str(output_dir)).wait()
+
+    call = (tmp_path / "calls.log").read_text().split()
+    assert call[call.index("-z") + 1] == "n"
+    assert sorted(os.listdir(str(output_dir))) == ["image_1.nii.gz", "image_2.nii.gz"]
+    assert result.output_path == os.path.join(str(output_dir), "image_2.nii.gz")
+    for i_series in result.series:
+        assert i_series.compressed_size == os.path.getsize(i_series.output_path)
+        with gzip.open(i_series.output_path) as image_file:
+            assert image_file.read() == os.path.basename(i_series.output_path)[:-3].encode()
+    assert result.compression_time is not None
+    assert "compression" in result.metrics.timings
+
+
+def test_convert_many_waits_for_compressor(test_version, tmp_path, make_native_executable):
+    executable = make_native_executable(output_files=["image.nii"])
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version, container_backend="native", executable=executable)
+    dcm2niix.compress = True
+    dcm2niix.compressor = dcm2niixpy.DCM2NIIX_COMPRESSOR()
+    output_dirs = [tmp_path / "output_1", tmp_path / "output_2"]
+    for i_output_dir in output_dirs:
+        i_output_dir.mkdir()
+
+    results = dcm2niix.convert_many(
+        [str(tmp_path), str(tmp_path)], [str(i_output_dir) for i_output_dir in output_dirs]
+    )
+
+    for i_result, i_output_dir in zip(results, output_dirs):
+        assert i_result.error is None
+        assert os.listdir(str(i_output_dir)) == ["image.nii.gz"]
+        assert i_result.series[0].compressed_size is not None
+
+
+def test_metrics_include_compression(test_version, tmp_path, make_native_executable):
+    executable = make_native_executable(output_files={"image.nii": bytes(100000)})
+    collected = []
+    dcm2niix = dcm2niixpy.DCM2NIIX(
+        test_version,
+        container_backend="native",
+        executable=executable,
+        metrics_sinks=[collected.append],
+    )
+    dcm2niix.compress = True
+    dcm2niix.compressor = dcm2niixpy.DCM2NIIX_COMPRESSOR()
+    output_dir = tmp_path / "output"
+    output_dir.mkdir()
+
+    result = dcm2niix.convert(str(tmp_path), str(output_dir)).wait()
+
+    assert collected == [result.metrics]
+    assert "compression" in result.metrics.timings
+    assert result.metrics.timings["total"] >= result.metrics.timings["compression"]
+    assert result.metrics.counters["bytes_out"] == os.path.getsize(str(output_dir / "image.nii.gz"))
+
+
+def test_compressor_leaves_nrrd_to_dcm2niix(test_version, tmp_path, make_native_executable):
+    executable = make_native_executable(output_files=["image.nrrd"])
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version, container_backend="native", executable=executable)
+    dcm2niix.compress = True
+    dcm2niix.export_as_nrrd = True
+    dcm2niix.compressor = dcm2niixpy.DCM2NIIX_COMPRESSOR()
+    output_dir = tmp_path / "output"
+    output_dir.mkdir()
+
+    result = dcm2niix.convert(str(tmp_path), str(output_dir)).wait()
+
+    call = (tmp_path / "calls.log").read_text().split()
+    assert call[call.index("-z") + 1] == "y"
+    assert result.output_path == os.path.join(str(output_dir), "image.nrrd")
+    assert result.series[0].compressed_size is None
+    assert os.listdir(str(output_dir)) == ["image.nrrd"]
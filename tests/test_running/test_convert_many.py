@@ -0,0 +1,73 @@
+import pytest
+
+import dcm2niixpy
+
+
+def _fake_convert(self, input_path, output_path=None, options=None):
+    if input_path == "broken":
+        raise RuntimeError("Conversion failed")
+
+    output_info = dcm2niixpy.DCM2NIIX_OUTPUT()
+    output_info.output_path = input_path if output_path is None else output_path
+    return output_info
+
+
+def test_convert_many_keeps_input_order(test_version, monkeypatch):
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version)
+    monkeypatch.setattr(dcm2niixpy.DCM2NIIX, "convert", _fake_convert)
+    input_paths = ["study_{index}".format(index=index) for index in range(20)]
+
+    result = dcm2niix.convert_many(input_paths, max_workers=4)
+
+    assert [i_output.output_path for i_output in result] == input_paths
+
+
+def test_convert_many_with_output_paths(test_version, monkeypatch):
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version)
+    monkeypatch.setattr(dcm2niixpy.DCM2NIIX, "convert", _fake_convert)
+
+    result = dcm2niix.convert_many(["study_0", "study_1"], ["out_0", "out_1"])
+
+    assert [i_output.output_path for i_output in result] == ["out_0", "out_1"]
+
+
+def test_convert_many_isolates_failures(test_version, monkeypatch):
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version)
+    monkeypatch.setattr(dcm2niixpy.DCM2NIIX, "convert", _fake_convert)
+
+    result = dcm2niix.convert_many(["study_0", "broken", "study_2"])
+
+    assert result[0].error is None
+    assert isinstance(result[1].error, RuntimeError)
+    assert result[2].error is None
+
+
+def test_convert_many_mismatched_output_paths(test_version):
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version)
+    raised_error_msg = r"you passed 1 output paths for 2 input paths"
+
+    with pytest.raises(ValueError, match=raised_error_msg):
+        dcm2niix.convert_many(["study_0", "study_1"], ["out_0"])
+
+
+def test_convert_many_with_options(test_version, monkeypatch):
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version)
+    used_options = []
+
+    def convert(self, input_path, output_path=None, options=None):
+        used_options.append(options)
+        return _fake_convert(self, input_path, output_path)
+
+    monkeypatch.setattr(dcm2niixpy.DCM2NIIX, "convert", convert)
+
+    dcm2niix.convert_many(["study_0", "study_1"], options={"conflict_write_behavior": 1})
+
+    assert used_options == [{"conflict_write_behavior": 1}] * 2
+
+
+@pytest.mark.parametrize("options", [{"convert": "y"}, {"output_directory": "out"}])
+def test_convert_many_invalid_options(test_version, options):
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version)
+
+    with pytest.raises(ValueError):
+        dcm2niix.convert_many(["study_0"], options=options)
@@ -49,3 +49,25 @@ def test_with_no_options(test_version):
 
     assert isinstance(result, list)
     assert result == default_options
+
+
+def test_arguments_follow_option_changes(test_version):
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version)
+    dcm2niix._convert_options_to_arg_list()
+
+    dcm2niix.compress = True
+    dcm2niix.compression_level = 9
+    dcm2niix.terse = True
+    result = dcm2niix._convert_options_to_arg_list()
+
+    assert result[0] == "-9"
+    assert result[result.index("-z") + 1] == "y"
+    assert result[-1] == "--terse"
+
+
+def test_returned_arguments_can_be_changed(test_version):
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version)
+
+    dcm2niix._convert_options_to_arg_list().append("--extra")
+
+    assert "--extra" not in dcm2niix._convert_options_to_arg_list()
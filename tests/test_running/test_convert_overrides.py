@@ -0,0 +1,70 @@
+import os
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import dcm2niixpy
+
+
+def test_options_for_single_conversion(
+    test_version, tmp_path, input_dir, make_native_executable, read_calls
+):
+    executable = make_native_executable()
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version, container_backend="native", executable=executable)
+
+    result = dcm2niix.convert(str(input_dir), options={"filename": "%p_%s", "compress": True})
+
+    call = read_calls()[0]
+    assert call[call.index("-f") + 1] == "%p_%s"
+    assert call[call.index("-z") + 1] == "y"
+    assert result.extension == ".nii.gz"
+    assert dcm2niix.filename == "%f_%p_%t_%s"
+    assert dcm2niix.compress == "n"
+
+
+def test_output_directory_option(
+    test_version, tmp_path, input_dir, make_native_executable, read_calls
+):
+    executable = make_native_executable()
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version, container_backend="native", executable=executable)
+    output_dir = tmp_path / "output" / "patient_1"
+
+    dcm2niix.convert(str(input_dir), options={"output_directory": str(output_dir)})
+
+    assert output_dir.is_dir()
+    assert read_calls()[0][-2:] == [str(output_dir), str(input_dir)]
+    with pytest.raises(ValueError):
+        dcm2niix.convert(str(input_dir), str(tmp_path), options={"output_directory": "/other"})
+
+
+def test_invalid_options(test_version, make_native_executable, input_dir):
+    executable = make_native_executable()
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version, container_backend="native", executable=executable)
+
+    with pytest.raises(ValueError, match="Compression setting should be one of"):
+        dcm2niix.convert(str(input_dir), options={"compress": "maybe"})
+    with pytest.raises(ValueError, match="'convert' is not an option"):
+        dcm2niix.convert(str(input_dir), options={"convert": "y"})
+
+
+def test_shared_object_with_different_options(
+    test_version, tmp_path, input_dir, make_native_executable, read_calls
+):
+    executable = make_native_executable()
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version, container_backend="native", executable=executable)
+    output_dirs = [str(tmp_path / "output_{index}".format(index=i_index)) for i_index in range(32)]
+
+    def convert(output_dir):
+        dcm2niix.convert(
+            str(input_dir),
+            options={"output_directory": output_dir, "filename": os.path.basename(output_dir)},
+        )
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(convert, output_dirs))
+
+    calls = read_calls()
+    assert len(calls) == len(output_dirs)
+    for i_call in calls:
+        assert os.path.basename(i_call[-2]) == i_call[i_call.index("-f") + 1]
@@ -0,0 +1,89 @@
+import json
+import os
+import struct
+
+import pytest
+
+import dcm2niixpy
+
+
+numpy = pytest.importorskip("numpy")
+
+
+def make_nifti(data, endian="<", sform=True):
+    header = bytearray(348)
+    struct.pack_into(endian + "i", header, 0, 348)
+    dim = [data.ndim, *data.shape] + [1] * (7 - data.ndim)
+    struct.pack_into(endian + "8h", header, 40, *dim)
+    struct.pack_into(endian + "hh", header, 70, 16, 32)
+    struct.pack_into(endian + "8f", header, 76, 1, 2, 3, 4, 1, 1, 1, 1)
+    struct.pack_into(endian + "f", header, 108, 352)
+    struct.pack_into(endian + "hh", header, 252, 1, 1 if sform else 0)
+    struct.pack_into(endian + "3f", header, 256, 0, 0, 1)
+    struct.pack_into(endian + "3f", header, 268, 10, 20, 30)
+    struct.pack_into(endian + "4f", header, 280, -2, 0, 0, 10)
+    struct.pack_into(endian + "4f", header, 296, 0, -3, 0, 20)
+    struct.pack_into(endian + "4f", header, 312, 0, 0, 4, 30)
+    header[344:348] = b"n+1\x00"
+    return bytes(header) + bytes(4) + data.astype(endian + "f4").tobytes(order="F")
+
+
+@pytest.mark.parametrize("endian", ["<", ">"])
+def test_image(tmp_path, endian):
+    data = numpy.arange(24, dtype="f4").reshape((3, 4, 2))
+    image_path = tmp_path / "image.nii"
+    image_path.write_bytes(make_nifti(data, endian))
+    sidecar_path = tmp_path / "image.json"
+    sidecar_path.write_text(json.dumps({"SeriesDescription": "T1"}))
+
+    image = dcm2niixpy.DCM2NIIX_IMAGE(str(image_path), str(sidecar_path))
+
+    assert image.shape == (3, 4, 2)
+    assert isinstance(image.data, numpy.memmap)
+    numpy.testing.assert_array_equal(image.data, data)
+    numpy.testing.assert_array_equal(
+        image.affine, [[-2, 0, 0, 10], [0, -3, 0, 20], [0, 0, 4, 30], [0, 0, 0, 1]]
+    )
+    assert image.sidecar == {"SeriesDescription": "T1"}
+
+
+def test_image_qform(tmp_path):
+    image_path = tmp_path / "image.nii"
+    image_path.write_bytes(make_nifti(numpy.zeros((2, 2, 2)), sform=False))
+
+    image = dcm2niixpy.DCM2NIIX_IMAGE(str(image_path))
+
+    # A rotation of 180 degrees around z
+    numpy.testing.assert_allclose(
+        image.affine, [[-2, 0, 0, 10], [0, -3, 0, 20], [0, 0, 4, 30], [0, 0, 0, 1]], atol=1e-6
+    )
+    assert image.sidecar is None
+
+
+def test_image_not_nifti(tmp_path):
+    image_path = tmp_path / "image.nii"
+    image_path.write_bytes(bytes(400))
+
+    with pytest.raises(ValueError, match="is not a NIfTI-1 file"):
+        dcm2niixpy.DCM2NIIX_IMAGE(str(image_path)).header
+
+
+def test_convert_in_memory(test_version, tmp_path, make_native_executable):
+    data = numpy.arange(8, dtype="f4").reshape((2, 2, 2))
+    executable = make_native_executable(
+        output_lines=["Convert 2 DICOM as {output}/image (2x2x2x1)"],
+        output_files={"image.nii": make_nifti(data), "image.json": b'{"EchoTime": 0.01}'},
+    )
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version, container_backend="native", executable=executable)
+    dcm2niix.compress = True
+
+    with dcm2niix.convert_in_memory(str(tmp_path), str(tmp_path)) as result:
+        image = result.series[0].image
+        numpy.testing.assert_array_equal(image.data, data)
+        assert image.sidecar == {"EchoTime": 0.01}
+        output_dir = os.path.dirname(result.output_path)
+
+    call = (tmp_path / "calls.log").read_text().split()
+    assert call[call.index("-z") + 1] == "n"
+    assert result.output_path.endswith("image.nii")
+    assert not os.path.exists(output_dir)
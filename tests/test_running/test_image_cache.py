@@ -0,0 +1,107 @@
+import hashlib
+import os
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import dcm2niixpy
+
+
+class FAKE_PULL:
+    def __init__(self, content=b"image"):
+        self.content = content
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, image_cache, image_url, name):
+        with self.lock:
+            self.calls.append((image_url, name))
+        with open(os.path.join(image_cache.cache_folder, name), "wb") as image_file:
+            image_file.write(self.content)
+
+
+@pytest.fixture
+def fake_pull(monkeypatch):
+    fake_pull = FAKE_PULL()
+    monkeypatch.setattr(
+        dcm2niixpy.DCM2NIIX_IMAGE_CACHE,
+        "_pull",
+        lambda image_cache, image_url, name: fake_pull(image_cache, image_url, name),
+    )
+    return fake_pull
+
+
+def test_concurrent_get_pulls_once(tmp_path, fake_pull):
+    image_cache = dcm2niixpy.DCM2NIIX_IMAGE_CACHE(str(tmp_path))
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        image_files = list(
+            executor.map(lambda _: image_cache.get("docker://image:1", "image_1.sif"), range(32))
+        )
+
+    assert len(fake_pull.calls) == 1
+    assert set(image_files) == {os.path.join(str(tmp_path), "image_1.sif")}
+    assert image_cache.images == ["image_1.sif"]
+    assert image_cache.verify("image_1.sif")
+    assert not any(i_file.startswith(".tmp_") for i_file in os.listdir(str(tmp_path)))
+
+
+def test_get_digest_mismatch(tmp_path, fake_pull):
+    image_cache = dcm2niixpy.DCM2NIIX_IMAGE_CACHE(
+        str(tmp_path), digests={"image_1.sif": hashlib.sha256(b"other").hexdigest()}
+    )
+
+    with pytest.raises(ValueError, match=r"but digest '[0-9a-f]+' was expected"):
+        image_cache.get("docker://image:1", "image_1.sif")
+
+    assert image_cache.images == []
+    assert not os.path.exists(os.path.join(str(tmp_path), "image_1.sif"))
+
+
+def test_get_repulls_truncated_image(tmp_path, fake_pull):
+    image_cache = dcm2niixpy.DCM2NIIX_IMAGE_CACHE(str(tmp_path))
+    image_file = image_cache.get("docker://image:1", "image_1.sif")
+    with open(image_file, "wb") as truncated_file:
+        truncated_file.write(b"im")
+
+    image_cache.get("docker://image:1", "image_1.sif")
+
+    assert len(fake_pull.calls) == 2
+    assert image_cache.verify("image_1.sif")
+
+
+def test_adopts_existing_image(tmp_path, fake_pull):
+    (tmp_path / "image_1.sif").write_bytes(b"downloaded before")
+    image_cache = dcm2niixpy.DCM2NIIX_IMAGE_CACHE(str(tmp_path))
+
+    image_cache.get("docker://image:1", "image_1.sif")
+
+    assert fake_pull.calls == []
+    assert image_cache.verify("image_1.sif")
+
+
+def test_evicts_least_recently_used(tmp_path, fake_pull):
+    image_cache = dcm2niixpy.DCM2NIIX_IMAGE_CACHE(str(tmp_path), max_size=10)
+
+    image_cache.get("docker://image:1", "image_1.sif")
+    os.utime(str(tmp_path / "image_1.sif.json"), (0, 0))
+    image_cache.get("docker://image:2", "image_2.sif")
+    image_cache.get("docker://image:3", "image_3.sif")
+
+    assert image_cache.images == ["image_2.sif", "image_3.sif"]
+    assert image_cache.size == 10
+
+
+def test_download_uses_image_cache(test_version, tmp_path, fake_pull):
+    image_cache = dcm2niixpy.DCM2NIIX_IMAGE_CACHE(str(tmp_path / "images"))
+
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version, download=True, image_cache=image_cache)
+    dcm2niixpy.DCM2NIIX(test_version, download=True, image_cache=image_cache)
+
+    assert len(fake_pull.calls) == 1
+    assert dcm2niix._container_image == os.path.join(
+        str(tmp_path / "images"), "dcm2niix_{version}.sif".format(version=test_version)
+    )
+    assert dcm2niix.download_metrics.counters["bytes_downloaded"] == len(fake_pull.content)
@@ -0,0 +1,148 @@
+import os
+import stat
+import subprocess
+import sys
+
+import pytest
+
+import dcm2niixpy
+
+
+def test_iter_convert(test_version, tmp_path, make_native_executable):
+    executable = make_native_executable(
+        output_lines=[
+            "Found 2 DICOM file(s)",
+            "Convert 1 DICOM as {output}/image_1 (64x64x1x1)",
+            "Convert 1 DICOM as {output}/image_2 (64x64x1x1)",
+            "Conversion required 0.1 seconds",
+        ]
+    )
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version, container_backend="native", executable=executable)
+    output_dir = tmp_path / "output"
+    output_dir.mkdir()
+
+    series = list(dcm2niix.iter_convert(str(tmp_path), str(output_dir)))
+
+    assert [i_series.output_path for i_series in series] == [
+        os.path.join(str(output_dir), "image_1.nii"),
+        os.path.join(str(output_dir), "image_2.nii"),
+    ]
+    assert series[0].sidecar_path == os.path.join(str(output_dir), "image_1.json")
+
+
+def test_iter_convert_streams(test_version, tmp_path):
+    # The second series is only converted once the first series has been received
+    executable = tmp_path / "dcm2niix"
+    executable.write_text(
+        "#!{python}\n"
+        "import os, sys, time\n"
+        "if sys.argv[1:] == ['--version']:\n"
+        "    print('v{version}')\n"
+        "    sys.exit(3)\n"
+        "output = sys.argv[sys.argv.index('-o') + 1]\n"
+        "print('Convert 1 DICOM as ' + output + '/image_1 (64x64x1x1)', flush=True)\n"
+        "print('Waiting', flush=True)\n"
+        "for _ in range(500):\n"
+        "    if os.path.exists(os.path.join(output, 'received')):\n"
+        "        break\n"
+        "    time.sleep(0.01)\n"
+        "else:\n"
+        "    sys.exit(1)\n"
+        "print('Convert 1 DICOM as ' + output + '/image_2 (64x64x1x1)', flush=True)\n".format(
+            python=sys.executable, version=test_version
+        )
+    )
+    os.chmod(str(executable), os.stat(str(executable)).st_mode | stat.S_IEXEC)
+    dcm2niix = dcm2niixpy.DCM2NIIX(
+        test_version, container_backend="native", executable=str(executable)
+    )
+
+    file_names = []
+    for i_series in dcm2niix.iter_convert(str(tmp_path), str(tmp_path)):
+        file_names.append(i_series.file_name)
+        (tmp_path / "received").touch()
+
+    assert file_names == ["image_1.nii", "image_2.nii"]
+
+
+def test_iter_convert_error(test_version, tmp_path, make_native_executable):
+    executable = make_native_executable(return_code=1)
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version, container_backend="native", executable=executable)
+
+    with pytest.raises(subprocess.CalledProcessError):
+        list(dcm2niix.iter_convert(str(tmp_path), str(tmp_path)))
+
+
+def test_iter_convert_stopped_early(test_version, tmp_path):
+    executable = tmp_path / "dcm2niix"
+    executable.write_text(
+        "#!{python}\n"
+        "import os, sys, time\n"
+        "if sys.argv[1:] == ['--version']:\n"
+        "    print('v{version}')\n"
+        "    sys.exit(3)\n"
+        "output = sys.argv[sys.argv.index('-o') + 1]\n"
+        "with open(os.path.join(output, 'pid'), 'w') as pid_file:\n"
+        "    pid_file.write(str(os.getpid()))\n"
+        "print('Convert 1 DICOM as ' + output + '/image_1 (64x64x1x1)', flush=True)\n"
+        "print('Convert 1 DICOM as ' + output + '/image_2 (64x64x1x1)', flush=True)\n"
+        "time.sleep(60)\n".format(python=sys.executable, version=test_version)
+    )
+    os.chmod(str(executable), os.stat(str(executable)).st_mode | stat.S_IEXEC)
+    dcm2niix = dcm2niixpy.DCM2NIIX(
+        test_version, container_backend="native", executable=str(executable)
+    )
+
+    series = dcm2niix.iter_convert(str(tmp_path), str(tmp_path))
+    next(series)
+    series.close()
+
+    with pytest.raises(ProcessLookupError):
+        os.kill(int((tmp_path / "pid").read_text()), 0)
+
+
+def test_iter_convert_limits(test_version, tmp_path, make_native_executable, monkeypatch):
+    executable = make_native_executable()
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version, container_backend="native", executable=executable)
+    dcm2niix.limits = dcm2niixpy.DCM2NIIX_LIMITS(memory=2**40)
+    used_limits = []
+    stream_command = dcm2niixpy.DCM2NIIX._stream_command
+
+    def record_limits(command, limits=None):
+        used_limits.append(limits)
+        return stream_command(command, limits)
+
+    monkeypatch.setattr(dcm2niixpy.DCM2NIIX, "_stream_command", staticmethod(record_limits))
+
+    list(dcm2niix.iter_convert(str(tmp_path), str(tmp_path)))
+
+    assert used_limits == [dcm2niix.limits]
+
+
+def test_iter_convert_stops_container(test_version, tmp_path, monkeypatch):
+    # Stands in for the container runtime, which is stopped with the conversion
+    container = tmp_path / "container"
+    container.write_text(
+        "#!{python}\n"
+        "import os, time\n"
+        "with open({pid_file!r}, 'w') as pid_file:\n"
+        "    pid_file.write(str(os.getpid()))\n"
+        "print('Convert 1 DICOM as /output/image_1 (64x64x1x1)', flush=True)\n"
+        "print('Convert 1 DICOM as /output/image_2 (64x64x1x1)', flush=True)\n"
+        "time.sleep(60)\n".format(python=sys.executable, pid_file=str(tmp_path / "pid"))
+    )
+    os.chmod(str(container), os.stat(str(container)).st_mode | stat.S_IEXEC)
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version)
+    monkeypatch.setattr(
+        dcm2niixpy.DCM2NIIX,
+        "_make_command",
+        lambda self, arg_list, input_path, output_path, limits=None: [str(container)],
+    )
+
+    series = dcm2niix.iter_convert(str(tmp_path), str(tmp_path))
+    first_series = next(series)
+    series.close()
+
+    assert first_series.output_path == str(tmp_path / "image_1.nii")
+    with pytest.raises(ProcessLookupError):
+        os.kill(int((tmp_path / "pid").read_text()), 0)
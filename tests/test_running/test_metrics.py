@@ -0,0 +1,98 @@
+import os
+
+import pytest
+
+import dcm2niixpy
+
+
+def test_convert_metrics(test_version, tmp_path, make_native_executable):
+    executable = make_native_executable(
+        output_lines=[
+            "Found 3 DICOM file(s)",
+            "Warning: Slice thickness varies",
+            "Convert 3 DICOM as {output}/image (64x64x3x1)",
+        ],
+        output_files=["image.nii"],
+    )
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version, container_backend="native", executable=executable)
+    output_dir = tmp_path / "output"
+    output_dir.mkdir()
+
+    result = dcm2niix.convert(str(tmp_path), str(output_dir))
+
+    assert result.metrics.name == "convert"
+    assert set(result.metrics.timings) == {"startup", "dcm2niix", "parse", "total"}
+    assert result.metrics.timings["total"] >= result.metrics.timings["parse"]
+    assert result.metrics.counters["n_dicoms"] == 3
+    assert result.metrics.counters["n_series"] == 1
+    assert result.metrics.counters["n_warnings"] == 1
+    assert result.metrics.counters["bytes_out"] == os.path.getsize(str(output_dir / "image.nii"))
+    assert "bytes_in" not in result.metrics.counters
+
+
+def test_metrics_sinks(test_version, tmp_path, make_native_executable):
+    executable = make_native_executable()
+    collected = []
+    dcm2niix = dcm2niixpy.DCM2NIIX(
+        test_version,
+        container_backend="native",
+        executable=executable,
+        metrics_sinks=[collected.append],
+    )
+    input_dir = tmp_path / "input"
+    input_dir.mkdir()
+    (input_dir / "IM-0001.dcm").write_bytes(b"0" * 100)
+
+    result = dcm2niix.convert(str(input_dir), str(tmp_path / "output"))
+
+    assert collected == [result.metrics]
+    assert result.metrics.counters["bytes_in"] == 100
+
+
+def test_cached_conversion_metrics(test_version, tmp_path, make_native_executable):
+    executable = make_native_executable(output_files=["image.nii"])
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version, container_backend="native", executable=executable)
+    dcm2niix.cache = dcm2niixpy.DCM2NIIX_CACHE(str(tmp_path / "cache"))
+    input_dir = tmp_path / "input"
+    input_dir.mkdir()
+    output_dir = tmp_path / "output"
+    output_dir.mkdir()
+    output_dir = str(output_dir)
+
+    dcm2niix.convert(str(input_dir), output_dir)
+    result = dcm2niix.convert(str(input_dir), output_dir)
+
+    assert result.metrics.counters["cache_hits"] == 1
+    assert "dcm2niix" not in result.metrics.timings
+    assert "cache_lookup" in result.metrics.timings
+
+
+def test_parse_output_metrics():
+    metrics = dcm2niixpy.DCM2NIIX_METRICS("parse")
+    output_info = dcm2niixpy.DCM2NIIX_OUTPUT()
+
+    output_info.parse_output(
+        ["Found 1 DICOM file(s)", "Convert 1 DICOM as /out/a (2x2x1x1)"], metrics
+    )
+
+    assert set(metrics.timings) == {"startup", "dcm2niix", "parse"}
+    assert metrics.to_dict()["name"] == "parse"
+
+
+def test_failing_metrics_sink(test_version, tmp_path, make_native_executable):
+    executable = make_native_executable()
+
+    def failing_sink(metrics):
+        raise ConnectionError("Sink is down")
+
+    dcm2niix = dcm2niixpy.DCM2NIIX(
+        test_version,
+        container_backend="native",
+        executable=executable,
+        metrics_sinks=[failing_sink],
+    )
+
+    with pytest.warns(UserWarning, match="Sink is down"):
+        result = dcm2niix.convert(str(tmp_path))
+
+    assert len(result.series) == 1
@@ -0,0 +1,101 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import dcm2niixpy
+
+
+def test_native_backend_missing_executable(test_version, tmp_path):
+    raised_error_msg = r"could not be found"
+
+    with pytest.raises(OSError, match=raised_error_msg):
+        dcm2niixpy.DCM2NIIX(
+            test_version,
+            container_backend="native",
+            executable=str(tmp_path / "dcm2niix"),
+        )
+
+
+def test_native_backend_version_mismatch(test_version, make_native_executable):
+    executable = make_native_executable(version="1.0.20200331")
+    raised_error_msg = r"has version '1.0.20200331', but version '{version}' was requested".format(
+        version=test_version
+    )
+
+    with pytest.raises(ValueError, match=raised_error_msg):
+        dcm2niixpy.DCM2NIIX(test_version, container_backend="native", executable=executable)
+
+
+def test_native_backend_uses_host_paths(test_version, tmp_path, make_native_executable):
+    executable = make_native_executable()
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version, container_backend="native", executable=executable)
+    output_dir = tmp_path / "output"
+
+    result = dcm2niix.convert(str(tmp_path), str(output_dir))
+
+    assert dcm2niix.container_backend == "native"
+    assert result.file_name == "image.nii"
+    assert result.output_path == os.path.join(str(output_dir), "image.nii")
+
+
+def test_native_backend_probed_once(test_version, make_native_executable):
+    executable = make_native_executable()
+    misses = dcm2niixpy.dcm2niix._native_version.cache_info().misses
+
+    for _ in range(3):
+        dcm2niixpy.DCM2NIIX(test_version, container_backend="native", executable=executable)
+
+    assert dcm2niixpy.dcm2niix._native_version.cache_info().misses == misses + 1
+
+
+def test_import_does_not_import_backends():
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, dcm2niixpy; print(sorted({'spython', 'asyncio'} & set(sys.modules)))",
+        ],
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+
+    assert result.stdout.strip() == "[]"
+
+
+def test_import_does_not_import_optional_features():
+    optional_modules = [
+        "dcm2niixpy.cache",
+        "dcm2niixpy.compression",
+        "dcm2niixpy.image",
+        "dcm2niixpy.scan",
+        "dcm2niixpy.scheduler",
+        "dcm2niixpy.staging",
+        "dcm2niixpy.work_queue",
+        "sqlite3",
+    ]
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, dcm2niixpy; print(sorted({modules} & set(sys.modules)))".format(
+                modules=set(optional_modules)
+            ),
+        ],
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+
+    assert result.stdout.strip() == "[]"
+
+
+def test_optional_features_are_imported_when_used():
+    from dcm2niixpy.work_queue import DCM2NIIX_QUEUE
+
+    assert dcm2niixpy.DCM2NIIX_QUEUE is DCM2NIIX_QUEUE
+    assert "DICOM_INDEX" in dir(dcm2niixpy)
+    with pytest.raises(AttributeError):
+        dcm2niixpy.DCM2NIIX_MISSING
@@ -0,0 +1,149 @@
+import dcm2niixpy
+
+
+MULTI_SERIES_OUTPUT = [
+    "Chris Rorden's dcm2niiX version v1.0.20211006  (JP2:OpenJPEG) GCC9.3.0 x86-64 (64-bit Linux)\n",
+    "Found 40 DICOM file(s)\n",
+    "Convert 20 DICOM as /output/patient/T1_3 (256x256x20x1)\n",
+    "Warning: Unable to determine slice direction: please check whether slices are flipped\n",
+    "Convert 20 DICOM as /output/patient/T2_4 (256x256x20x1)\n",
+    "Conversion required 1.234 seconds (0.5 for core code).\n",
+]
+
+
+def test_parse_all_series():
+    output_info = dcm2niixpy.DCM2NIIX_OUTPUT()
+
+    output_info.parse_output(MULTI_SERIES_OUTPUT)
+
+    assert len(output_info.series) == 2
+    assert [i_series.file_name for i_series in output_info.series] == [
+        "T1_3.nii.gz",
+        "T2_4.nii.gz",
+    ]
+    assert output_info.series[0].n_slices == 20
+    assert output_info.series[0].image_shape == [256, 256, 20, 1]
+    assert output_info.series[0].sidecar_path == "/output/patient/T1_3.json"
+
+
+def test_parse_warnings_per_series():
+    output_info = dcm2niixpy.DCM2NIIX_OUTPUT()
+
+    output_info.parse_output(MULTI_SERIES_OUTPUT)
+
+    assert output_info.series[0].warnings == []
+    assert output_info.series[1].warnings == [
+        "Unable to determine slice direction: please check whether slices are flipped"
+    ]
+    assert output_info.no_direction is True
+
+
+def test_parse_last_series_attributes():
+    output_info = dcm2niixpy.DCM2NIIX_OUTPUT()
+
+    output_info.parse_output(MULTI_SERIES_OUTPUT)
+
+    assert output_info.file_name == "T2_4.nii.gz"
+    assert output_info.n_slices == "20"
+
+
+def test_parse_uncompressed_without_sidecar():
+    output_info = dcm2niixpy.DCM2NIIX_OUTPUT(extension=".nii", sidecar_extension=None)
+
+    output_info.parse_output(MULTI_SERIES_OUTPUT)
+
+    assert output_info.series[0].file_name == "T1_3.nii"
+    assert output_info.series[0].extension == ".nii"
+    assert output_info.series[0].sidecar_path is None
+
+
+def test_parse_other_messages():
+    output_info = dcm2niixpy.DCM2NIIX_OUTPUT()
+
+    output_info.parse_output(
+        [
+            "Found 40 DICOM file(s)",
+            "Ignoring derived image",
+            "Error: Unable to open /input/broken.dcm",
+            "Conversion required 1.234 seconds (0.5 for core code).",
+        ]
+    )
+
+    assert output_info.n_dicoms == 40
+    assert output_info.skipped == ["derived image"]
+    assert output_info.errors == ["Unable to open /input/broken.dcm"]
+    assert output_info.conversion_time == 1.234
+
+
+def test_parse_path_with_spaces():
+    output_info = dcm2niixpy.DCM2NIIX_OUTPUT()
+
+    event = output_info.parse_line("Convert 1 DICOM as /output/my series (64x64x1x1)")
+
+    assert event.kind == "converted"
+    assert output_info.file_name == "my series.nii.gz"
+
+
+def test_set_output_folder():
+    output_info = dcm2niixpy.DCM2NIIX_OUTPUT()
+    output_info.parse_output(MULTI_SERIES_OUTPUT)
+
+    output_info.set_output_folder("/output", "/data/nifti")
+
+    assert output_info.series[0].output_path == "/data/nifti/patient/T1_3.nii.gz"
+    assert output_info.series[0].sidecar_path == "/data/nifti/patient/T1_3.json"
+    assert output_info.output_path == "/data/nifti/patient/T2_4.nii.gz"
+
+
+def test_output_extension_from_options(test_version):
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version)
+    dcm2niix.compress = True
+    dcm2niix.bids_sidecar = False
+
+    output_info = dcm2niix._make_output_info()  # act
+
+    assert output_info.extension == ".nii.gz"
+    assert output_info.sidecar_extension is None
+
+
+def test_output_extension_of_uncompressed_3d(test_version):
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version)
+    dcm2niix.compress = 3
+
+    output_info = dcm2niix._make_output_info()  # act
+
+    assert output_info.extension == ".nii"
+
+
+def test_parse_sidecar_only(test_version):
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version)
+    dcm2niix.bids_sidecar = "o"
+    output_info = dcm2niix._make_output_info()
+
+    output_info.parse_line("Convert 1 DICOM as /output/T1 (64x64x1x1)")  # act
+    output_info.set_output_folder("/output", "/data/nifti")
+
+    assert output_info.extension is None
+    assert output_info.output_path is None
+    assert output_info.series[0].file_name is None
+    assert output_info.series[0].sidecar_path == "/data/nifti/T1.json"
+
+
+def test_output_dict_round_trip():
+    output_info = dcm2niixpy.DCM2NIIX_OUTPUT()
+    output_info.parse_output(
+        MULTI_SERIES_OUTPUT
+        + ["Error: Unable to read file\n", "Skipping derived image /dicom/IM-0003.dcm\n"]
+    )
+
+    result = dcm2niixpy.DCM2NIIX_OUTPUT.from_dict(output_info.to_dict())
+
+    assert result.to_dict() == output_info.to_dict()
+    assert result.n_dicoms == 40
+    assert result.conversion_time == 1.234
+    assert result.errors == ["Unable to read file"]
+    assert result.skipped == ["derived image /dicom/IM-0003.dcm"]
+    assert [i_series.output_path for i_series in result.series] == [
+        "/output/patient/T1_3.nii.gz",
+        "/output/patient/T2_4.nii.gz",
+    ]
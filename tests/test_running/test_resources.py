@@ -0,0 +1,171 @@
+import os
+import stat
+import sys
+import threading
+import time
+
+import pytest
+
+import dcm2niixpy
+
+
+@pytest.fixture
+def limits_executable(tmp_path):
+    # Reports the limits of its own process, after the limits have been applied
+    executable = os.path.join(str(tmp_path), "dcm2niix")
+    with open(executable, "w") as executable_file:
+        executable_file.write(
+            "#!{python}\n"
+            "import os, resource, sys, time\n"
+            "if sys.argv[1:] == ['--version']:\n"
+            "    print('v1.0.20211006')\n"
+            "    sys.exit(3)\n"
+            "time.sleep(0.5)\n"
+            "print('memory', resource.getrlimit(resource.RLIMIT_AS)[0])\n"
+            "print('cpus', sorted(os.sched_getaffinity(0)))\n".format(python=sys.executable)
+        )
+    os.chmod(executable, os.stat(executable).st_mode | stat.S_IEXEC)
+    return executable
+
+
+def test_container_options():
+    limits = dcm2niixpy.DCM2NIIX_LIMITS(
+        cpus=1.5, cpu_shares=512, cpuset_cpus="0-1", memory=2**30, blkio_weight=100
+    )
+
+    assert limits.container_options() == [
+        "--cpus",
+        "1.5",
+        "--cpu-shares",
+        "512",
+        "--cpuset-cpus",
+        "0-1",
+        "--memory",
+        str(2**30),
+        "--blkio-weight",
+        "100",
+    ]
+    assert dcm2niixpy.DCM2NIIX_LIMITS().container_options() == []
+
+
+@pytest.mark.parametrize(
+    "settings",
+    [{"cpus": 0}, {"cpu_shares": 1}, {"memory": -1}, {"blkio_weight": 5}, {"cpuset_cpus": "3-1"}],
+)
+def test_invalid_limits(settings):
+    with pytest.raises(ValueError):
+        dcm2niixpy.DCM2NIIX_LIMITS(**settings)
+
+
+def test_parse_cpuset():
+    assert dcm2niixpy.DCM2NIIX_LIMITS.parse_cpuset("0-2,5") == {0, 1, 2, 5}
+
+
+def test_limits_with_defaults():
+    default_limits = dcm2niixpy.DCM2NIIX_LIMITS(cpus=2, memory=2**30)
+
+    limits = dcm2niixpy.DCM2NIIX_LIMITS(memory=2**31).with_defaults(default_limits)
+
+    assert limits.cpus == 2
+    assert limits.memory == 2**31
+
+
+def test_docker_command_with_limits(test_version):
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version)
+    dcm2niix._container_backend = "docker"
+    limits = dcm2niixpy.DCM2NIIX_LIMITS(memory=1000)
+
+    result = dcm2niix._make_command([], "/data/in", "/data/out", limits)
+
+    assert result[:5] == ["docker", "run", "--rm", "--memory", "1000"]
+
+
+@pytest.mark.skipif(not hasattr(os, "sched_setaffinity"), reason="Requires Linux")
+def test_native_limits(test_version, tmp_path, input_dir, limits_executable):
+    dcm2niix = dcm2niixpy.DCM2NIIX(
+        test_version, container_backend="native", executable=limits_executable
+    )
+    cpu = min(os.sched_getaffinity(0))
+    dcm2niix.limits = dcm2niixpy.DCM2NIIX_LIMITS(cpuset_cpus="0-64", memory=2**40)
+    limits = dcm2niixpy.DCM2NIIX_LIMITS(cpuset_cpus=str(cpu))
+
+    output = list(
+        dcm2niix._start_dcm2niix(
+            [], str(input_dir), str(tmp_path), None, limits.with_defaults(dcm2niix.limits)
+        )[0]
+    )
+
+    assert output == ["memory {memory}\n".format(memory=2**40), "cpus [{cpu}]\n".format(cpu=cpu)]
+
+
+def test_admission_limits_concurrent_size():
+    admission = dcm2niixpy.DCM2NIIX_ADMISSION(max_size=100)
+    lock = threading.Lock()
+    running = []
+    max_running_size = [0]
+
+    def run(size):
+        with admission.admit(size):
+            with lock:
+                running.append(size)
+                max_running_size[0] = max(max_running_size[0], sum(running))
+            time.sleep(0.02)
+            with lock:
+                running.remove(size)
+
+    threads = [threading.Thread(target=run, args=(i_size,)) for i_size in [40, 40, 40, 60, 30] * 4]
+    for i_thread in threads:
+        i_thread.start()
+    for i_thread in threads:
+        i_thread.join()
+
+    assert max_running_size[0] <= 100
+    assert admission.admitted_size == 0
+
+
+def test_admission_of_large_conversion():
+    admission = dcm2niixpy.DCM2NIIX_ADMISSION(max_size=100)
+    admitted = threading.Event()
+
+    with admission.admit(50):
+
+        def run():
+            with admission.admit(500):
+                admitted.set()
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        # The large conversion waits until it can run alone
+        assert not admitted.wait(0.1)
+    thread.join(1)
+
+    assert admitted.is_set()
+
+
+def test_admission_max_conversions():
+    admission = dcm2niixpy.DCM2NIIX_ADMISSION(max_size=100, max_conversions=1)
+    admitted = threading.Event()
+
+    def run():
+        with admission.admit(1):
+            admitted.set()
+
+    with admission.admit(1):
+        thread = threading.Thread(target=run)
+        thread.start()
+        assert not admitted.wait(0.1)
+    thread.join(1)
+
+    assert admitted.is_set()
+
+
+def test_convert_with_admission(test_version, tmp_path, input_dir, make_native_executable):
+    executable = make_native_executable()
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version, container_backend="native", executable=executable)
+    dcm2niix.admission = dcm2niixpy.DCM2NIIX_ADMISSION(max_size=1000)
+
+    result = dcm2niix.convert(str(input_dir), str(tmp_path))
+
+    assert len(result.series) == 1
+    assert "admission_wait" in result.metrics.timings
+    assert dcm2niix.admission.admitted_size == 0
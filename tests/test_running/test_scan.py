@@ -0,0 +1,187 @@
+import json
+import os
+import shutil
+import stat
+import sys
+import time
+
+import pytest
+
+import dcm2niixpy
+
+from dcm2niixpy.scan import read_dicom_header
+
+
+def test_read_dicom_header(testdata_dir):
+    dicom_file = os.path.join(testdata_dir, "BRAIN_MR", "IM-0001-0001.dcm")
+
+    result = read_dicom_header(dicom_file)
+
+    assert result["series_instance_uid"] == (
+        "1.3.6.1.4.1.5962.99.1.1647423216.1757746261.1397511827184.7.0"
+    )
+    assert result["series_number"] == 12
+    assert result["rows"] == 256
+    assert result["columns"] == 192
+
+
+def test_read_non_dicom_header(testdata_dir):
+    result = read_dicom_header(os.path.join(testdata_dir, "sources.txt"))
+
+    assert result is None
+
+
+def test_scan_series(testdata_dir):
+    index = dcm2niixpy.DICOM_INDEX()
+
+    series = index.scan(os.path.join(testdata_dir, "BRAIN_MR")).series
+
+    assert len(series) == 1
+    assert len(list(series.values())[0].files) == 192
+
+
+def test_scan_is_incremental(testdata_dir, tmp_path, monkeypatch):
+    dicom_dir = tmp_path / "dicom"
+    shutil.copytree(os.path.join(testdata_dir, "BRAIN_MR"), str(dicom_dir))
+    index_file = str(tmp_path / "index.json")
+    dcm2niixpy.DICOM_INDEX(index_file).scan(str(dicom_dir)).save()
+    os.remove(str(dicom_dir / "IM-0001-0001.dcm"))
+    read_files = []
+    monkeypatch.setattr(
+        "dcm2niixpy.scan.read_dicom_header", lambda file_path: read_files.append(file_path)
+    )
+
+    index = dcm2niixpy.DICOM_INDEX(index_file).scan(str(dicom_dir))
+
+    assert read_files == []
+    assert len(index.files) == 191
+
+
+def test_save_without_index_file():
+    index = dcm2niixpy.DICOM_INDEX()
+
+    with pytest.raises(ValueError, match="has no index file"):
+        index.save()
+
+
+def test_stage_series(testdata_dir, tmp_path):
+    series = list(
+        dcm2niixpy.DICOM_INDEX().scan(os.path.join(testdata_dir, "BRAIN_MR")).series.values()
+    )[0]
+
+    result = series.stage(str(tmp_path))
+
+    assert os.listdir(result) == ["BRAIN_MR"]
+    assert len(os.listdir(os.path.join(result, "BRAIN_MR"))) == 192
+
+
+def test_convert_index(test_version, testdata_dir, tmp_path, make_native_executable):
+    executable = make_native_executable()
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version, container_backend="native", executable=executable)
+    index = dcm2niixpy.DICOM_INDEX().scan(os.path.join(testdata_dir, "BRAIN_MR"))
+    output_dir = str(tmp_path / "output")
+
+    result = dcm2niix.convert_index(index, output_dir)
+
+    assert list(result) == list(index.series)
+    assert list(result.values())[0].output_path == os.path.join(output_dir, "image.nii")
+    assert os.listdir(output_dir) == []
+
+
+def test_convert_index_skip_up_to_date(
+    test_version, testdata_dir, tmp_path, make_native_executable
+):
+    series_uid = "1.3.6.1.4.1.5962.99.1.1647423216.1757746261.1397511827184.7.0"
+    executable = make_native_executable(
+        output_files={
+            "image.nii": b"image",
+            "image.json": json.dumps({"SeriesInstanceUID": series_uid}).encode(),
+        }
+    )
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version, container_backend="native", executable=executable)
+    dcm2niix.anonymize_bids_sidecar = False
+    dicom_dir = tmp_path / "dicom"
+    shutil.copytree(os.path.join(testdata_dir, "BRAIN_MR"), str(dicom_dir))
+    output_dir = str(tmp_path / "output")
+    calls_log = tmp_path / "calls.log"
+
+    dcm2niix.convert_index(dcm2niixpy.DICOM_INDEX().scan(str(dicom_dir)), output_dir)
+    result = dcm2niix.convert_index(
+        dcm2niixpy.DICOM_INDEX().scan(str(dicom_dir)), output_dir, skip_up_to_date=True
+    )
+
+    assert len(calls_log.read_text().splitlines()) == 1
+    assert result[series_uid].up_to_date
+    assert result[series_uid].output_path == os.path.join(output_dir, "image.nii")
+    assert result[series_uid].series[0].sidecar_path == os.path.join(output_dir, "image.json")
+
+    sidecar_time = os.stat(os.path.join(output_dir, "image.json")).st_mtime
+    os.utime(str(dicom_dir / "IM-0001-0001.dcm"), (sidecar_time + 10, sidecar_time + 10))
+    result = dcm2niix.convert_index(
+        dcm2niixpy.DICOM_INDEX().scan(str(dicom_dir)), output_dir, skip_up_to_date=True
+    )
+
+    assert len(calls_log.read_text().splitlines()) == 2
+    assert not result[series_uid].up_to_date
+
+
+def test_convert_index_skip_up_to_date_anonymized(
+    test_version, testdata_dir, tmp_path, make_native_executable
+):
+    executable = make_native_executable()
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version, container_backend="native", executable=executable)
+    index = dcm2niixpy.DICOM_INDEX().scan(os.path.join(testdata_dir, "BRAIN_MR"))
+
+    with pytest.warns(UserWarning, match="set bids_sidecar to True and anonymize_bids_sidecar"):
+        result = dcm2niix.convert_index(index, str(tmp_path / "output"), skip_up_to_date=True)
+
+    assert not list(result.values())[0].up_to_date
+
+
+def test_convert_index_reconverted_series_is_up_to_date(test_version, testdata_dir, tmp_path):
+    series_uid = "1.3.6.1.4.1.5962.99.1.1647423216.1757746261.1397511827184.7.0"
+    # Like dcm2niix, adds a suffix to the file name if the output exists, unless overwriting
+    executable = os.path.join(str(tmp_path), "dcm2niix")
+    with open(executable, "w") as executable_file:
+        executable_file.write(
+            "#!{python}\n"
+            "import json, os, sys\n"
+            "if sys.argv[1:] == ['--version']:\n"
+            "    print('v{version}')\n"
+            "    sys.exit(3)\n"
+            "with open({calls_log!r}, 'a') as calls_log:\n"
+            "    calls_log.write(' '.join(sys.argv[1:]) + '\\n')\n"
+            "output = sys.argv[sys.argv.index('-o') + 1]\n"
+            "name = 'image'\n"
+            "if os.path.exists(output + '/image.json') and sys.argv[sys.argv.index('-w') + 1] != '1':\n"
+            "    name = 'imagea'\n"
+            "with open(output + '/' + name + '.nii', 'w') as image_file:\n"
+            "    image_file.write('image')\n"
+            "with open(output + '/' + name + '.json', 'w') as sidecar_file:\n"
+            "    json.dump({{'SeriesInstanceUID': {series_uid!r}}}, sidecar_file)\n"
+            "print('Convert 192 DICOM as ' + output + '/' + name + ' (64x64x1x1)')\n".format(
+                python=sys.executable,
+                version=test_version,
+                calls_log=str(tmp_path / "calls.log"),
+                series_uid=series_uid,
+            )
+        )
+    os.chmod(executable, os.stat(executable).st_mode | stat.S_IEXEC)
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version, container_backend="native", executable=executable)
+    dcm2niix.anonymize_bids_sidecar = False
+    dicom_dir = str(tmp_path / "dicom")
+    shutil.copytree(os.path.join(testdata_dir, "BRAIN_MR"), dicom_dir)
+    output_dir = str(tmp_path / "output")
+    dcm2niix.convert_index(dcm2niixpy.DICOM_INDEX().scan(dicom_dir), output_dir)
+    # The series changed after it was converted
+    os.utime(os.path.join(output_dir, "image.json"), (time.time() - 1000, time.time() - 1000))
+    os.utime(os.path.join(dicom_dir, "IM-0001-0001.dcm"), (time.time() - 500, time.time() - 500))
+
+    for _ in range(2):
+        result = dcm2niix.convert_index(
+            dcm2niixpy.DICOM_INDEX().scan(dicom_dir), output_dir, skip_up_to_date=True
+        )
+
+    assert len((tmp_path / "calls.log").read_text().splitlines()) == 2
+    assert result[series_uid].up_to_date
+    assert sorted(os.listdir(output_dir)) == ["image.json", "image.nii"]
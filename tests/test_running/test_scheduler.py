@@ -0,0 +1,80 @@
+import os
+
+import pytest
+
+import dcm2niixpy
+
+
+@pytest.fixture
+def input_dirs(tmp_path):
+    input_dirs = []
+    for i_name, i_n_files in [("small", 1), ("large", 20), ("medium", 5)]:
+        input_dir = tmp_path / i_name
+        input_dir.mkdir()
+        for i_file in range(i_n_files):
+            (input_dir / "IM-{index}.dcm".format(index=i_file)).write_bytes(b"0" * 1000)
+        input_dirs.append(str(input_dir))
+    return input_dirs
+
+
+def test_measure(input_dirs):
+    assert dcm2niixpy.DCM2NIIX_SCHEDULER.measure(input_dirs[1]) == (20, 20000)
+
+
+def test_order_longest_first(input_dirs):
+    scheduler = dcm2niixpy.DCM2NIIX_SCHEDULER()
+
+    assert scheduler.order(input_dirs) == [1, 2, 0]
+
+
+def test_estimate_learns_rates():
+    scheduler = dcm2niixpy.DCM2NIIX_SCHEDULER()
+    # 0.1 s per file and 1 s per MB
+    for i_n_files, i_n_bytes in [(10, 10**6), (100, 10**6), (10, 10**7)]:
+        scheduler.record("/other", i_n_files, i_n_bytes, 0.1 * i_n_files + i_n_bytes / 10**6)
+
+    assert scheduler.estimate("/new", 50, 5 * 10**6) == pytest.approx(10.0)
+    assert scheduler.rates["seconds_per_file"] == pytest.approx(0.1)
+
+
+def test_estimate_of_converted_input():
+    scheduler = dcm2niixpy.DCM2NIIX_SCHEDULER()
+    scheduler.record("/data/fmri", 1000, 10**9, 300.0)
+
+    assert scheduler.estimate("/data/fmri", 1000, 10**9) == 300.0
+    # A changed input is estimated from the rates instead
+    assert scheduler.estimate("/data/fmri", 2000, 2 * 10**9) == pytest.approx(600.0)
+
+
+def test_history_is_saved(tmp_path):
+    history_file = str(tmp_path / "history.json")
+    scheduler = dcm2niixpy.DCM2NIIX_SCHEDULER(history_file, max_history=2)
+    for i_duration in [1.0, 2.0, 3.0]:
+        scheduler.record("/data/{duration}".format(duration=i_duration), 1, 1, i_duration)
+    scheduler.save()
+
+    loaded_scheduler = dcm2niixpy.DCM2NIIX_SCHEDULER(history_file)
+
+    assert loaded_scheduler.estimate("/data/3.0", 1, 1) == 3.0
+    assert len(loaded_scheduler._samples) == 2
+
+
+def test_convert_many_scheduled(test_version, tmp_path, input_dirs, make_native_executable):
+    executable = make_native_executable()
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version, container_backend="native", executable=executable)
+    history_file = str(tmp_path / "history.json")
+    dcm2niix.scheduler = dcm2niixpy.DCM2NIIX_SCHEDULER(history_file)
+
+    outputs = dcm2niix.convert_many(input_dirs, input_dirs, max_workers=1)
+
+    calls = (tmp_path / "calls.log").read_text().splitlines()
+    assert [os.path.basename(i_call.split()[-1]) for i_call in calls] == [
+        "large",
+        "medium",
+        "small",
+    ]
+    assert [i_output.error for i_output in outputs] == [None, None, None]
+    assert [i_output.series[0].output_path for i_output in outputs] == [
+        os.path.join(i_input_dir, "image.nii") for i_input_dir in input_dirs
+    ]
+    assert len(dcm2niixpy.DCM2NIIX_SCHEDULER(history_file)._samples) == 3
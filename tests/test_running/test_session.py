@@ -0,0 +1,192 @@
+import os
+import subprocess
+
+import pytest
+
+import dcm2niixpy
+
+from dcm2niixpy.session import to_container_path
+
+
+def test_session_output_root_defaults_to_input_root(test_version, tmp_path):
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version)
+
+    session = dcm2niix.session(str(tmp_path))  # act
+
+    assert session.output_root == str(tmp_path)
+
+
+def test_session_inactive_cannot_convert(test_version, tmp_path):
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version)
+    session = dcm2niix.session(str(tmp_path))
+
+    result = session.can_convert(str(tmp_path / "input"), str(tmp_path / "output"))
+
+    assert result is False
+
+
+def test_session_can_convert_within_roots(test_version, tmp_path):
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version)
+    session = dcm2niix.session(str(tmp_path / "dicom"), str(tmp_path / "nifti"))
+    session.active = True
+
+    assert session.can_convert(str(tmp_path / "dicom" / "a"), str(tmp_path / "nifti" / "a"))
+    assert not session.can_convert(str(tmp_path / "other"), str(tmp_path / "nifti" / "a"))
+    assert not session.can_convert(str(tmp_path / "dicom_2"), str(tmp_path / "nifti"))
+
+
+def test_session_container_paths(test_version, tmp_path):
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version)
+    session = dcm2niix.session(str(tmp_path))
+    input_path = os.path.join(str(tmp_path), "patient", "series")
+
+    result = to_container_path(input_path, session.input_root, "/input")
+
+    assert result == "/input/patient/series"
+    assert to_container_path(str(tmp_path), session.input_root, "/input") == "/input"
+
+
+class FAKE_INSTANCE:
+    def __init__(self, name):
+        self.name = name
+        self.stopped = False
+
+    def stop(self, quiet=False):
+        self.stopped = True
+
+
+@pytest.fixture
+def session(test_version, tmp_path):
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version)
+    session = dcm2niix.session(str(tmp_path / "dicom"), str(tmp_path / "nifti"))
+    session._instance = FAKE_INSTANCE("running")
+    session.active = True
+    session.executed = []
+    session.started = 0
+    # The container that is running, None if it has crashed
+    session.running_instance = "running"
+
+    def execute(command_line_args, container_id, instance):
+        session.executed.append((instance.name, command_line_args))
+        if instance.name != session.running_instance:
+            raise subprocess.CalledProcessError(1, command_line_args)
+        return iter(["Converted\n"])
+
+    def start_singularity(bindings):
+        session.started += 1
+        return FAKE_INSTANCE("restarted")
+
+    session._execute = execute
+    session._start_singularity = start_singularity
+    session.is_alive = lambda: (
+        session._instance is not None and session._instance.name == session.running_instance
+    )
+    return session
+
+
+@pytest.fixture
+def run_container(monkeypatch):
+    container_runs = []
+
+    def run_container(self, command_line_args, bindings, limits=None):
+        container_runs.append((command_line_args, bindings))
+        return iter(["Converted in new container\n"])
+
+    monkeypatch.setattr(dcm2niixpy.DCM2NIIX, "_run_container", run_container)
+    return container_runs
+
+
+def test_session_run_executes_in_container(session, tmp_path, run_container):
+    result = session.run(
+        ["-z", "y"], str(tmp_path / "dicom" / "patient"), str(tmp_path / "nifti" / "patient")
+    )
+
+    assert result == ["Converted\n"]
+    assert session.executed == [("running", ["-z", "y", "-o", "/output/patient", "/input/patient"])]
+    assert run_container == []
+
+
+def test_session_run_error_in_running_container(session, tmp_path, run_container):
+    session.running_instance = "other"
+    session.is_alive = lambda: True
+
+    with pytest.raises(subprocess.CalledProcessError):
+        session.run([], str(tmp_path / "dicom"), str(tmp_path / "nifti"))
+
+    assert session.started == 0
+    assert run_container == []
+
+
+def test_session_run_restarts_crashed_container(session, tmp_path, run_container):
+    crashed_instance = session._instance
+    session.running_instance = "restarted"
+
+    result = session.run([], str(tmp_path / "dicom"), str(tmp_path / "nifti"))
+
+    assert result == ["Converted\n"]
+    assert [i_instance for i_instance, _ in session.executed] == ["running", "restarted"]
+    assert crashed_instance.stopped
+    assert session.started == 1
+    assert session.active
+    assert run_container == []
+
+
+def test_session_run_falls_back_to_new_container(session, tmp_path, run_container):
+    # The restarted container crashes as well
+    session.running_instance = None
+    input_path = str(tmp_path / "dicom" / "patient")
+    output_path = str(tmp_path / "nifti" / "patient")
+
+    result = session.run(["-z", "y"], input_path, output_path)
+
+    assert result == ["Converted in new container\n"]
+    assert session.started == 1
+    assert not session.active
+    assert run_container == [
+        (
+            ["-z", "y", "-o", "/output", "/input"],
+            [input_path + ":/input", output_path + ":/output"],
+        )
+    ]
+
+
+def test_session_run_inactive(session, tmp_path, run_container):
+    session.active = False
+
+    result = session.run([], str(tmp_path / "dicom"), str(tmp_path / "nifti"))
+
+    assert result == ["Converted in new container\n"]
+    assert session.executed == []
+
+
+def test_session_context(session):
+    dcm2niix = session.dcm2niix
+    session._instance = None
+    session.running_instance = "restarted"
+
+    with session as started_session:
+        assert started_session is session
+        assert dcm2niix._session is session
+        assert session.active
+        instance = session._instance
+
+    assert dcm2niix._session is None
+    assert instance.stopped
+    assert session._instance is None
+    assert not session.active
+
+
+def test_convert_in_session(session, tmp_path, run_container):
+    session._instance = None
+    session.running_instance = "restarted"
+    session._execute = lambda command_line_args, container_id, instance: iter(
+        ["Convert 1 DICOM as /output/patient/image (64x64x1x1)\n"]
+    )
+
+    with session:
+        result = session.dcm2niix.convert(
+            str(tmp_path / "dicom" / "patient"), str(tmp_path / "nifti" / "patient")
+        )
+
+    assert result.output_path == str(tmp_path / "nifti" / "patient" / "image.nii")
+    assert run_container == []
@@ -0,0 +1,115 @@
+import os
+import stat
+import subprocess
+import sys
+
+import pytest
+
+import dcm2niixpy
+
+
+def test_staged_conversion(test_version, tmp_path, input_dir, make_native_executable, read_calls):
+    executable = make_native_executable(output_files=["image.nii", "image.json"])
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version, container_backend="native", executable=executable)
+    scratch_dir = tmp_path / "scratch"
+    dcm2niix.staging = dcm2niixpy.DCM2NIIX_STAGING(str(scratch_dir))
+    output_dir = tmp_path / "output"
+
+    result = dcm2niix.convert(str(input_dir), str(output_dir))
+
+    call = read_calls()[0]
+    assert call[-1].startswith(str(scratch_dir))
+    assert os.path.basename(call[-1]) == "patient_1"
+    assert call[-2].startswith(str(scratch_dir))
+    assert sorted(os.listdir(str(output_dir))) == ["image.json", "image.nii"]
+    assert result.output_path == os.path.join(str(output_dir), "image.nii")
+    assert result.series[0].sidecar_path == os.path.join(str(output_dir), "image.json")
+    assert "stage_in" in result.metrics.timings
+    assert os.listdir(str(scratch_dir)) == []
+
+
+def test_staging_quota_exceeded(
+    test_version, tmp_path, input_dir, make_native_executable, read_calls
+):
+    executable = make_native_executable(output_files=["image.nii"])
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version, container_backend="native", executable=executable)
+    dcm2niix.staging = dcm2niixpy.DCM2NIIX_STAGING(str(tmp_path / "scratch"), max_size=50)
+    output_dir = tmp_path / "output"
+    output_dir.mkdir()
+
+    with pytest.warns(UserWarning, match="converting without staging"):
+        result = dcm2niix.convert(str(input_dir), str(output_dir))
+
+    call = read_calls()[0]
+    assert call[-1] == str(input_dir)
+    assert result.output_path == os.path.join(str(output_dir), "image.nii")
+    assert dcm2niix.staging._reserved_size == 0
+
+
+def test_staging_failed_conversion(test_version, tmp_path, input_dir, make_native_executable):
+    executable = make_native_executable(output_files=["image.nii"], return_code=1)
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version, container_backend="native", executable=executable)
+    scratch_dir = tmp_path / "scratch"
+    dcm2niix.staging = dcm2niixpy.DCM2NIIX_STAGING(str(scratch_dir))
+    output_dir = tmp_path / "output"
+
+    with pytest.raises(subprocess.CalledProcessError):
+        dcm2niix.convert(str(input_dir), str(output_dir))
+
+    assert not output_dir.exists()
+    assert os.listdir(str(scratch_dir)) == []
+    assert dcm2niix.staging._reserved_size == 0
+
+
+@pytest.mark.parametrize(
+    ("conflict_write_behavior", "output_files", "new_file"),
+    [
+        (0, {"image.nii": "old"}, None),
+        (1, {"image.nii": "new"}, "image.nii"),
+        (2, {"image.nii": "old", "imagea.nii": "new"}, "imagea.nii"),
+    ],
+)
+def test_staging_conflict_write_behavior(
+    test_version, tmp_path, input_dir, conflict_write_behavior, output_files, new_file
+):
+    # Like dcm2niix, skips, overwrites or renames an image that exists
+    executable = os.path.join(str(tmp_path), "dcm2niix")
+    with open(executable, "w") as executable_file:
+        executable_file.write(
+            "#!{python}\n"
+            "import os, sys\n"
+            "if sys.argv[1:] == ['--version']:\n"
+            "    print('v{version}')\n"
+            "    sys.exit(3)\n"
+            "output = sys.argv[sys.argv.index('-o') + 1]\n"
+            "behavior = sys.argv[sys.argv.index('-w') + 1]\n"
+            "name = 'image'\n"
+            "if os.path.exists(output + '/image.nii') and behavior == '0':\n"
+            "    print('Skipping existing file name ' + output + '/image.nii')\n"
+            "    sys.exit(0)\n"
+            "if os.path.exists(output + '/image.nii') and behavior == '2':\n"
+            "    name = 'imagea'\n"
+            "with open(output + '/' + name + '.nii', 'w') as image_file:\n"
+            "    image_file.write('new')\n"
+            "print('Convert 1 DICOM as ' + output + '/' + name + ' (64x64x1x1)')\n".format(
+                python=sys.executable, version=test_version
+            )
+        )
+    os.chmod(executable, os.stat(executable).st_mode | stat.S_IEXEC)
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version, container_backend="native", executable=executable)
+    dcm2niix.bids_sidecar = False
+    dcm2niix.conflict_write_behavior = conflict_write_behavior
+    scratch_dir = tmp_path / "scratch"
+    dcm2niix.staging = dcm2niixpy.DCM2NIIX_STAGING(str(scratch_dir))
+    output_dir = tmp_path / "output"
+    output_dir.mkdir()
+    (output_dir / "image.nii").write_text("old")
+
+    result = dcm2niix.convert(str(input_dir), str(output_dir))
+
+    assert {i_file.name: i_file.read_text() for i_file in output_dir.iterdir()} == output_files
+    if new_file is None:
+        assert result.series == []
+    else:
+        assert result.output_path == os.path.join(str(output_dir), new_file)
+    assert os.listdir(str(scratch_dir)) == []
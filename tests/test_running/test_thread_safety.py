@@ -0,0 +1,150 @@
+import os
+import subprocess
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import dcm2niixpy
+
+
+def test_options_are_replaced(test_version):
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version)
+    options = dcm2niix.options
+
+    dcm2niix.filename = "%p_%s"
+
+    assert options["-f"] == "%f_%p_%t_%s"
+    assert dcm2niix.options["-f"] == "%p_%s"
+    arg_list = dcm2niix._convert_options_to_arg_list(options=options)
+    assert arg_list[arg_list.index("-f") + 1] == "%f_%p_%t_%s"
+
+
+def test_concurrent_conversions(
+    test_version, tmp_path, input_dir, make_native_executable, read_calls
+):
+    executable = make_native_executable()
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version, container_backend="native", executable=executable)
+    output_dirs = [str(tmp_path / "output_{index}".format(index=i_index)) for i_index in range(300)]
+    stop = threading.Event()
+
+    def change_options():
+        compress = False
+        while not stop.is_set():
+            compress = not compress
+            dcm2niix.compress = compress
+            dcm2niix.comments_in_aux = "compressed" if compress else "uncompressed"
+
+    def convert(output_dir):
+        return dcm2niix.convert(str(input_dir), options={"output_directory": output_dir})
+
+    changer = threading.Thread(target=change_options)
+    changer.start()
+    try:
+        with ThreadPoolExecutor(max_workers=32) as executor:
+            results = list(executor.map(convert, output_dirs))
+    finally:
+        stop.set()
+        changer.join()
+
+    calls = {i_call[i_call.index("-o") + 1]: i_call for i_call in read_calls()}
+    assert sorted(calls) == sorted(output_dirs)
+    for i_output_dir, i_result in zip(output_dirs, results):
+        call = calls[i_output_dir]
+        compressed = call[call.index("-z") + 1] == "y"
+        # The output is parsed with the options that dcm2niix was run with
+        assert i_result.extension == (".nii.gz" if compressed else ".nii")
+        assert [i_series.output_path for i_series in i_result.series] == [
+            os.path.join(i_output_dir, "image" + i_result.extension)
+        ]
+
+
+class SLOW_IMAGE_CACHE:
+    def __init__(self, cache_folder):
+        self.cache_folder = cache_folder
+        self.n_downloads = 0
+
+    def get(self, url, name, metrics=None):
+        self.n_downloads += 1
+        time.sleep(0.05)
+        path = os.path.join(self.cache_folder, name)
+        with open(path, "w") as image_file:
+            image_file.write(url)
+        return path
+
+
+def test_removed_image_is_downloaded_once(test_version, tmp_path):
+    image_cache = SLOW_IMAGE_CACHE(str(tmp_path))
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version, download=True, image_cache=image_cache)
+    os.remove(dcm2niix._container_image)
+
+    threads = [threading.Thread(target=dcm2niix._ensure_container_image) for _ in range(16)]
+    for i_thread in threads:
+        i_thread.start()
+    for i_thread in threads:
+        i_thread.join()
+
+    assert image_cache.n_downloads == 2
+    assert os.path.isfile(dcm2niix._container_image)
+
+
+class FAKE_INSTANCE:
+    def __init__(self, name):
+        self.name = name
+
+    def stop(self, quiet=False):
+        pass
+
+
+def test_conversion_during_session_restart(test_version, tmp_path):
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version)
+    session = dcm2niix.session(str(tmp_path))
+    session._instance = FAKE_INSTANCE("crashed")
+    session.active = True
+    restarting = threading.Event()
+    restart = threading.Event()
+    executed_instances = []
+
+    def start_singularity(bindings):
+        restarting.set()
+        restart.wait(5)
+        return FAKE_INSTANCE("restarted")
+
+    def execute(command_line_args, container_id, instance):
+        executed_instances.append(instance.name)
+        if instance.name == "crashed":
+            raise subprocess.CalledProcessError(1, command_line_args)
+        return ["Converted\n"]
+
+    session._start_singularity = start_singularity
+    session._execute = execute
+    session.is_alive = lambda: session._instance is not None and session._instance.name != "crashed"
+    input_path = str(tmp_path / "patient_1")
+    results = []
+
+    def run():
+        results.append(session.run([], input_path, input_path))
+
+    restarting_thread = threading.Thread(target=run)
+    restarting_thread.start()
+    assert restarting.wait(5)
+    # Starts while the container is restarted, and waits for it
+    converting_thread = threading.Thread(target=run)
+    converting_thread.start()
+    time.sleep(0.1)
+    restart.set()
+    restarting_thread.join(5)
+    converting_thread.join(5)
+
+    assert results == [["Converted\n"], ["Converted\n"]]
+    assert executed_instances == ["crashed", "restarted", "restarted"]
+    assert session._generation == 1
+
+
+def test_attributes_are_fixed(test_version):
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version)
+
+    with pytest.raises(AttributeError):
+        dcm2niix.unknown_option = True
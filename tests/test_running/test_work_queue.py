@@ -0,0 +1,94 @@
+import json
+import sqlite3
+import time
+
+import dcm2niixpy
+
+
+def _make_worker(test_version, make_native_executable, queue, return_code=0):
+    executable = make_native_executable(return_code=return_code)
+    dcm2niix = dcm2niixpy.DCM2NIIX(test_version, container_backend="native", executable=executable)
+    return dcm2niixpy.DCM2NIIX_WORKER(dcm2niix, queue, worker_id="worker")
+
+
+def test_queue_claims_in_order(tmp_path):
+    queue = dcm2niixpy.DCM2NIIX_QUEUE(str(tmp_path / "queue.sqlite"))
+    queue.add_many(["study_0", "study_1"])
+
+    first_item = queue.claim("worker_0")
+    second_item = queue.claim("worker_1")
+    third_item = queue.claim("worker_2")
+
+    assert first_item["input_path"] == "study_0"
+    assert second_item["input_path"] == "study_1"
+    assert third_item is None
+
+
+def test_worker_processes_queue(test_version, tmp_path, make_native_executable):
+    queue = dcm2niixpy.DCM2NIIX_QUEUE(str(tmp_path / "queue.sqlite"))
+    queue.add_many([str(tmp_path), str(tmp_path)])
+    worker = _make_worker(test_version, make_native_executable, queue)
+
+    n_processed = worker.run()
+
+    assert n_processed == 2
+    assert queue.counts() == {"pending": 0, "running": 0, "done": 2, "failed": 0}
+    assert json.loads(queue.items("done")[0]["result"])["file_name"] == "image.nii"
+
+
+def test_worker_records_failures(test_version, tmp_path, make_native_executable):
+    queue = dcm2niixpy.DCM2NIIX_QUEUE(str(tmp_path / "queue.sqlite"))
+    queue.add(str(tmp_path))
+    worker = _make_worker(test_version, make_native_executable, queue, return_code=1)
+
+    worker.run()
+
+    assert queue.counts()["failed"] == 1
+    assert "CalledProcessError" in queue.items("failed")[0]["error"]
+
+
+def test_worker_records_compression_failures(test_version, tmp_path, make_native_executable):
+    queue = dcm2niixpy.DCM2NIIX_QUEUE(str(tmp_path / "queue.sqlite"))
+    queue.add(str(tmp_path))
+    # dcm2niix reports an image that it did not write, so compressing it fails
+    worker = _make_worker(test_version, make_native_executable, queue)
+    worker.dcm2niix.compress = True
+    worker.dcm2niix.compressor = dcm2niixpy.DCM2NIIX_COMPRESSOR()
+
+    worker.run()
+
+    assert queue.counts()["failed"] == 1
+    assert "FileNotFoundError" in queue.items("failed")[0]["error"]
+
+
+def test_queue_requeues_items_of_dead_worker(tmp_path):
+    queue = dcm2niixpy.DCM2NIIX_QUEUE(str(tmp_path / "queue.sqlite"), heartbeat_timeout=10)
+    item_id = queue.add("study_0")
+    queue.claim("dead_worker")
+    with sqlite3.connect(queue.queue_file) as connection:
+        connection.execute(
+            "UPDATE items SET heartbeat = ? WHERE id = ?", (time.time() - 60, item_id)
+        )
+
+    result = queue.claim("live_worker")
+
+    assert result["id"] == item_id
+    assert result["worker"] == "live_worker"
+    assert result["attempts"] == 2
+
+
+def test_queue_fails_after_max_attempts(tmp_path):
+    queue = dcm2niixpy.DCM2NIIX_QUEUE(
+        str(tmp_path / "queue.sqlite"), heartbeat_timeout=10, max_attempts=1
+    )
+    item_id = queue.add("study_0")
+    queue.claim("dead_worker")
+    with sqlite3.connect(queue.queue_file) as connection:
+        connection.execute(
+            "UPDATE items SET heartbeat = ? WHERE id = ?", (time.time() - 60, item_id)
+        )
+
+    result = queue.claim("live_worker")
+
+    assert result is None
+    assert queue.counts()["failed"] == 1